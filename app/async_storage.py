@@ -0,0 +1,152 @@
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, TypeVar, Union
+from app.models import User, UserCreate, Course, CourseCreate, CourseUpdate, Enrollment, EnrollmentCreate, WaitlistEntry, EnrollmentStats
+from app.metrics import metrics
+from app.storage import Storage, StorageError
+
+T = TypeVar("T")
+
+INLINE = "inline"
+THREADPOOL = "threadpool"
+
+def _timed(fn: Callable[..., T], *args, **kwargs) -> T:
+    # Time spent in the storage method itself, excluding executor queueing
+    start = time.perf_counter()
+    failed = True
+    try:
+        result = fn(*args, **kwargs)
+        failed = False
+        return result
+    finally:
+        metrics.observe_storage(getattr(fn, "__name__", type(fn).__name__), time.perf_counter() - start, failed)
+
+def _untimed(fn: Callable[..., T], *args, **kwargs) -> T:
+    return fn(*args, **kwargs)
+
+class AsyncStorage:
+    """
+    Awaitable view of a Storage, used by the `async def` route handlers.
+
+    In `inline` mode calls run directly on the event loop. That is right for
+    the in-memory store: its locks are held for microseconds and never across
+    an `await`, so a handler cannot suspend while holding one and there is
+    nothing to gain from a thread hop. In `threadpool` mode each call runs on
+    a dedicated executor with `workers` threads, which is what a `blocking`
+    backend such as SQLite needs; sizing it to the connection pool means
+    excess requests wait as cheap coroutines instead of parked threads.
+    """
+
+    def __init__(self, storage: Storage, mode: str, workers: int, timed: bool = True):
+        self.storage = storage
+        self.mode = mode
+        # Record each call's duration in app.metrics
+        self._run = _timed if timed else _untimed
+        self._executor = (
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix="storage") if mode == THREADPOOL else None
+        )
+
+    async def _call(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        if self._executor is None:
+            return self._run(fn, *args, **kwargs)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(self._run, fn, *args, **kwargs))
+
+    async def table_sizes(self) -> Dict[str, int]:
+        return await self._call(self.storage.table_sizes)
+
+    # Users
+
+    async def get_user(self, user_id: int) -> Optional[User]:
+        return await self._call(self.storage.get_user, user_id)
+
+    async def get_user_by_email(self, email: str) -> Optional[User]:
+        return await self._call(self.storage.get_user_by_email, email)
+
+    async def list_users(self, after_id: int = 0, limit: Optional[int] = None) -> List[User]:
+        return await self._call(self.storage.list_users, after_id, limit)
+
+    async def create_user(self, user_data: UserCreate) -> User:
+        return await self._call(self.storage.create_user, user_data)
+
+    async def create_users(self, items: List[UserCreate], atomic: bool = True) -> List[Union[User, StorageError]]:
+        return await self._call(self.storage.create_users, items, atomic)
+
+    async def search_users(
+        self, name_prefix: Optional[str] = None, email_prefix: Optional[str] = None,
+        after_id: int = 0, limit: Optional[int] = None,
+    ) -> List[User]:
+        return await self._call(self.storage.search_users, name_prefix, email_prefix, after_id, limit)
+
+    # Courses
+
+    async def get_course(self, course_id: int) -> Optional[Course]:
+        return await self._call(self.storage.get_course, course_id)
+
+    async def get_course_by_code(self, code: str) -> Optional[Course]:
+        return await self._call(self.storage.get_course_by_code, code)
+
+    async def list_courses(self, after_id: int = 0, limit: Optional[int] = None) -> List[Course]:
+        return await self._call(self.storage.list_courses, after_id, limit)
+
+    async def create_course(self, course_data: CourseCreate) -> Course:
+        return await self._call(self.storage.create_course, course_data)
+
+    async def create_courses(self, items: List[CourseCreate], atomic: bool = True) -> List[Union[Course, StorageError]]:
+        return await self._call(self.storage.create_courses, items, atomic)
+
+    async def search_courses(
+        self, query: Optional[str] = None, code_prefix: Optional[str] = None,
+        after_id: int = 0, limit: Optional[int] = None,
+    ) -> List[Course]:
+        return await self._call(self.storage.search_courses, query, code_prefix, after_id, limit)
+
+    async def update_course(self, course_id: int, course_data: CourseUpdate) -> Course:
+        return await self._call(self.storage.update_course, course_id, course_data)
+
+    async def delete_course(self, course_id: int) -> Course:
+        return await self._call(self.storage.delete_course, course_id)
+
+    # Enrollments
+
+    async def get_enrollment(self, enrollment_id: int) -> Optional[Enrollment]:
+        return await self._call(self.storage.get_enrollment, enrollment_id)
+
+    async def get_student_enrollments(self, student_id: int, after_id: int = 0, limit: Optional[int] = None) -> List[Enrollment]:
+        return await self._call(self.storage.get_student_enrollments, student_id, after_id, limit)
+
+    async def get_course_enrollments(self, course_id: int, after_id: int = 0, limit: Optional[int] = None) -> List[Enrollment]:
+        return await self._call(self.storage.get_course_enrollments, course_id, after_id, limit)
+
+    async def list_enrollments(self, after_id: int = 0, limit: Optional[int] = None) -> List[Enrollment]:
+        return await self._call(self.storage.list_enrollments, after_id, limit)
+
+    async def is_enrolled(self, user_id: int, course_id: int) -> bool:
+        return await self._call(self.storage.is_enrolled, user_id, course_id)
+
+    async def create_enrollment(self, enrollment_data: EnrollmentCreate, waitlist: bool = False) -> Union[Enrollment, WaitlistEntry]:
+        return await self._call(self.storage.create_enrollment, enrollment_data, waitlist)
+
+    async def create_enrollments(self, items: List[EnrollmentCreate], atomic: bool = True) -> List[Union[Enrollment, StorageError]]:
+        return await self._call(self.storage.create_enrollments, items, atomic)
+
+    async def delete_enrollment(self, enrollment_id: int) -> Enrollment:
+        return await self._call(self.storage.delete_enrollment, enrollment_id)
+
+    # Waitlist
+
+    async def get_waitlist_entry(self, entry_id: int) -> Optional[WaitlistEntry]:
+        return await self._call(self.storage.get_waitlist_entry, entry_id)
+
+    async def get_course_waitlist(self, course_id: int) -> List[WaitlistEntry]:
+        return await self._call(self.storage.get_course_waitlist, course_id)
+
+    async def delete_waitlist_entry(self, entry_id: int) -> WaitlistEntry:
+        return await self._call(self.storage.delete_waitlist_entry, entry_id)
+
+    # Statistics
+
+    async def enrollment_stats(self, top: int = 10, verify: bool = False) -> EnrollmentStats:
+        return await self._call(self.storage.enrollment_stats, top, verify)
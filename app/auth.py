@@ -0,0 +1,127 @@
+import base64
+import hashlib
+import hmac
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+class InvalidTokenError(Exception):
+    """The bearer token is malformed, has a bad signature, or has expired."""
+
+class Principal:
+    """A verified caller: the user's id and their role as currently stored."""
+    __slots__ = ("id", "role")
+
+    def __init__(self, id: int, role: str):
+        self.id = id
+        self.role = role
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+def issue_token(secret: str, user_id: int, ttl: float, now: Optional[float] = None) -> Tuple[str, int]:
+    """
+    Sign a token for `user_id`, valid for `ttl` seconds; returns it with its
+    expiry (unix time). The format is `payload.signature`, both base64url,
+    where the payload is `{"sub": user_id, "exp": expiry}` and the signature
+    is its HMAC-SHA256, so any process holding the secret can verify it.
+    """
+    expires = int((time.time() if now is None else now) + ttl)
+    payload = _b64encode(json.dumps({"sub": user_id, "exp": expires}, separators=(",", ":")).encode())
+    signature = hmac.new(secret.encode(), payload.encode(), hashlib.sha256).digest()
+    return f"{payload}.{_b64encode(signature)}", expires
+
+def verify_token(secret: str, token: str, now: Optional[float] = None) -> Tuple[int, int]:
+    """Check a token's signature and expiry; returns (user id, expiry)."""
+    payload, _, signature = token.partition(".")
+    try:
+        expected = hmac.new(secret.encode(), payload.encode(), hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, _b64decode(signature)):
+            raise InvalidTokenError("bad signature")
+        claims = json.loads(_b64decode(payload))
+        user_id, expires = int(claims["sub"]), int(claims["exp"])
+    except (ValueError, KeyError, TypeError):
+        raise InvalidTokenError("malformed token")
+    if expires <= (time.time() if now is None else now):
+        raise InvalidTokenError("token expired")
+    return user_id, expires
+
+class PrincipalCache:
+    """
+    Bounded LRU of verified tokens -> Principal, so a repeat caller costs one
+    dict probe instead of an HMAC check plus a user lookup.
+
+    An entry lives for `ttl` seconds, or until its token expires if that is
+    sooner. Entries are indexed by user so invalidate_user() can drop every
+    cached token of a user whose row changed (e.g. an ID reused after a
+    reset).
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[Principal, float]]" = OrderedDict()
+        self._tokens_by_user: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            principal, expires = entry
+            if expires <= time.monotonic():
+                self._discard(token)
+                return None
+            self._entries.move_to_end(token)
+            return principal
+
+    def put(self, token: str, principal: Principal, token_expires: float) -> None:
+        if self.max_entries <= 0:
+            return
+        # Token expiry is wall-clock time, cache expiry is monotonic
+        lifetime = min(self.ttl, token_expires - time.time())
+        with self._lock:
+            self._discard(token)
+            self._entries[token] = (principal, time.monotonic() + lifetime)
+            self._tokens_by_user.setdefault(principal.id, set()).add(token)
+            while len(self._entries) > self.max_entries:
+                self._discard(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            for token in list(self._tokens_by_user.get(user_id, ())):
+                self._discard(token)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _discard(self, token: str) -> None:
+        entry = self._entries.pop(token, None)
+        if entry is not None:
+            tokens = self._tokens_by_user[entry[0].id]
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[entry[0].id]
+
+if __name__ == "__main__":
+    import argparse
+    from app.config import settings
+
+    parser = argparse.ArgumentParser(description="Print a bearer token for a user, signed with APP_AUTH_SECRET.")
+    parser.add_argument("user_id", type=int)
+    parser.add_argument("--ttl", type=float, default=settings.auth_token_ttl, help="lifetime in seconds")
+    args = parser.parse_args()
+    if not settings.auth_secret:
+        parser.error("APP_AUTH_SECRET is not set")
+    print(issue_token(settings.auth_secret, args.user_id, args.ttl)[0])
@@ -0,0 +1,53 @@
+from typing import Callable, List, Union
+from fastapi import Query, Response
+from pydantic import BaseModel
+from app.models import BatchMode, BatchItemResult, BatchItemStatus, BatchResult
+from app.storage import StorageError, NotFoundError, DuplicateError, CourseFullError, AbortedError
+
+MAX_BATCH_SIZE = 5000
+
+ABORTED_DETAIL = "Not created: another item in the atomic batch failed"
+
+async def batch_mode(
+    mode: BatchMode = Query(
+        BatchMode.atomic,
+        description="atomic: commit all items or none; partial: commit every valid item",
+    )
+) -> BatchMode:
+    return mode
+
+def _status(error: StorageError) -> BatchItemStatus:
+    if isinstance(error, DuplicateError):
+        return BatchItemStatus.duplicate
+    if isinstance(error, NotFoundError):
+        return BatchItemStatus.not_found
+    if isinstance(error, CourseFullError):
+        return BatchItemStatus.full
+    raise error
+
+def batch_result(
+    response: Response,
+    mode: BatchMode,
+    outcomes: List[Union[BaseModel, StorageError, BatchItemResult]],
+    describe: Callable[[StorageError], str],
+) -> BatchResult:
+    """
+    Build the per-item report from a storage batch call. `outcomes` holds the
+    created row, the StorageError, or a ready-made result (e.g. forbidden) for
+    each item. An atomic batch that was rolled back is answered with 409.
+    """
+    results = []
+    for index, outcome in enumerate(outcomes):
+        if isinstance(outcome, BatchItemResult):
+            results.append(outcome)
+        elif isinstance(outcome, AbortedError):
+            results.append(BatchItemResult(index=index, status=BatchItemStatus.aborted, detail=ABORTED_DETAIL))
+        elif isinstance(outcome, StorageError):
+            results.append(BatchItemResult(index=index, status=_status(outcome), detail=describe(outcome)))
+        else:
+            results.append(BatchItemResult(index=index, status=BatchItemStatus.created, id=outcome.id))
+    created = sum(r.status == BatchItemStatus.created for r in results)
+    committed = mode == BatchMode.partial or created == len(results)
+    if not committed:
+        response.status_code = 409
+    return BatchResult(committed=committed, created=created, results=results)
@@ -0,0 +1,156 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional, Set, Type, Union
+from fastapi import Request, Response
+from pydantic import BaseModel
+from app.config import settings
+from app.responses import encode_json
+
+class CachedResponse:
+    __slots__ = ("body", "etag", "headers", "tags")
+
+    def __init__(self, body: bytes, etag: str, headers: Dict[str, str], tags: Set[str]):
+        self.body = body
+        self.etag = etag
+        self.headers = headers
+        self.tags = tags
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+def _not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = {tag.strip() for tag in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+class ResponseCache:
+    """
+    Bounded LRU of fully encoded JSON responses, keyed by path and query.
+
+    Each entry carries tags naming the data it was built from (e.g.
+    `courses` for list pages, `course:7` for one course); writers call
+    `invalidate()` with the tags they touched. Responses carry an ETag, and a
+    request whose If-None-Match matches it gets an empty 304.
+
+    A response computed while an invalidation was running could be stale,
+    so `store()` only caches it if no invalidation happened since the
+    `version` captured before the data was read.
+
+    Writers in other processes cannot call `invalidate()`: with a shared
+    backend, `watch()` a version that changes with every such write and the
+    cache is cleared whenever a lookup finds it moved.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._keys_by_tag: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.version = 0
+        self._source: Optional[Callable[[], int]] = None
+        self._source_version = 0
+
+    @staticmethod
+    def key(request: Request) -> str:
+        # Sorted so ?limit=2&cursor=3 and ?cursor=3&limit=2 share an entry
+        return request.url.path + "?" + "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+
+    def lookup(self, request: Request) -> Optional[Response]:
+        """Answer the request from the cache, or return None on a miss."""
+        if self.max_entries <= 0:
+            return None
+        if self._source is not None:
+            self._follow_source()
+        key = self.key(request)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+        return self._respond(request, entry)
+
+    def store(
+        self,
+        request: Request,
+        version: int,
+        content: Union[Response, BaseModel, list],
+        model: Type[BaseModel],
+        tags: Iterable[str],
+        response: Optional[Response] = None,
+    ) -> Response:
+        """
+        Encode a handler result (models, or a Response from the projection /
+        fast paths) once, cache it under `tags`, and return it with an ETag.
+        Headers set on `response` are kept.
+        """
+        if isinstance(content, Response):
+            body = bytes(content.body)
+            headers = {k: v for k, v in content.headers.items() if k not in ("content-length", "content-type")}
+        else:
+            body = encode_json(content, model)
+            headers = {k: v for k, v in response.headers.items() if k != "content-length"} if response else {}
+        entry = CachedResponse(body, _etag(body), headers, set(tags))
+
+        if self.max_entries > 0:
+            key = self.key(request)
+            with self._lock:
+                if version == self.version:
+                    self._discard(key)
+                    self._entries[key] = entry
+                    for tag in entry.tags:
+                        self._keys_by_tag.setdefault(tag, set()).add(key)
+                    while len(self._entries) > self.max_entries:
+                        self._discard(next(iter(self._entries)))
+        return self._respond(request, entry)
+
+    def watch(self, source: Callable[[], int]) -> None:
+        """Clear the cache whenever `source()` changes (checked on every lookup)."""
+        self._source_version = source()
+        self._source = source
+
+    def _follow_source(self) -> None:
+        current = self._source()
+        if current != self._source_version:
+            self._source_version = current
+            self.clear()
+
+    def invalidate(self, *tags: str) -> None:
+        with self._lock:
+            self.version += 1
+            for tag in tags:
+                for key in list(self._keys_by_tag.get(tag, ())):
+                    self._discard(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+            self._keys_by_tag.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _discard(self, key: str) -> None:
+        # Caller holds the lock
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry.tags:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+
+    @staticmethod
+    def _respond(request: Request, entry: CachedResponse) -> Response:
+        headers = dict(entry.headers, ETag=entry.etag)
+        if _not_modified(request, entry.etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+# Public course catalog: GET /courses and GET /courses/{course_id}
+catalog_cache = ResponseCache(settings.catalog_cache_size)
@@ -0,0 +1,71 @@
+import os
+from typing import Literal, Optional
+from pydantic import BaseModel
+
+class Settings(BaseModel):
+    """
+    Runtime configuration, read from `APP_*` environment variables,
+    e.g. `APP_STORAGE_BACKEND=sqlite APP_SQLITE_PATH=/var/lib/enrollment.db`.
+    """
+    storage_backend: Literal["memory", "sqlite"] = "memory"
+    # Server processes sharing the data; defaults to WEB_CONCURRENCY, which
+    # uvicorn (and gunicorn) also read for their worker count. More than one
+    # needs the SQLite backend: a memory store is private to its process.
+    workers: int = 1
+    sqlite_path: str = "enrollment.db"
+    sqlite_pool_size: int = 8
+    # Encode stored rows straight to JSON instead of re-validating them
+    # against response_model (see app/responses.py)
+    fast_responses: bool = False
+    # Encoded GET /courses responses kept in memory; 0 disables the cache
+    catalog_cache_size: int = 1024
+    # How the async handlers call storage: "inline" on the event loop,
+    # "threadpool" on worker threads, or "auto" (threads only for backends
+    # that block, i.e. SQLite and the memory store with APP_WAL_SYNC=commit)
+    storage_executor: Literal["auto", "inline", "threadpool"] = "auto"
+    # Worker threads in threadpool mode when not bounded by the SQLite pool
+    storage_threads: int = 40
+    # Record per-route request metrics for GET /metrics (see app/metrics.py)
+    metrics: bool = True
+    # HMAC key for bearer tokens (see app/auth.py); unset disables tokens
+    auth_secret: Optional[str] = None
+    # Trust X-User-Role / X-User-Id when a request has no bearer token.
+    # Convenient for development, but anyone can claim any role, so unset
+    # means "only while no auth_secret is configured" (see trusts_headers)
+    auth_allow_headers: Optional[bool] = None
+    # Default lifetime of issued tokens, in seconds
+    auth_token_ttl: float = 3600
+    # Verified tokens remembered, and for how long (seconds)
+    auth_cache_size: int = 10000
+    auth_cache_ttl: float = 60
+    # Responses kept for replay to requests carrying an Idempotency-Key,
+    # and for how long (seconds); see app/idempotency.py
+    idempotency_cache_size: int = 10000
+    idempotency_ttl: float = 86400
+    # Directory for the memory backend's write-ahead log and snapshots
+    # (see app/durable_db.py); unset keeps the memory store volatile
+    wal_dir: Optional[str] = None
+    # "commit": a write returns once it is fsynced (batched across writers);
+    # "interval": fsync every wal_sync_interval_ms, a crash can lose that window
+    wal_sync: Literal["commit", "interval"] = "commit"
+    wal_sync_interval_ms: int = 10
+    # Snapshot and start a new log once the current segment reaches this size
+    wal_snapshot_bytes: int = 64 * 1024 * 1024
+
+    def trusts_headers(self) -> bool:
+        if self.auth_allow_headers is None:
+            return not self.auth_secret
+        return self.auth_allow_headers
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        values = {}
+        for name in cls.model_fields:
+            env_value = os.environ.get(f"APP_{name.upper()}")
+            if env_value is not None:
+                values[name] = env_value
+        if "workers" not in values and os.environ.get("WEB_CONCURRENCY"):
+            values["workers"] = os.environ["WEB_CONCURRENCY"]
+        return cls(**values)
+
+settings = Settings.from_env()
@@ -1,34 +1,805 @@
-from typing import List, Optional, Dict
-from app.models import User, Course, Enrollment
+import bisect
+import heapq
+import itertools
+import multiprocessing
+import os
+import tempfile
+import threading
+from collections import Counter
+from contextlib import ExitStack
+from operator import attrgetter
+from typing import Callable, Iterable, Iterator, List, Optional, Dict, Set, Tuple, TypeVar, Union
+from app.config import Settings, settings
+from app.models import User, UserCreate, Course, CourseCreate, CourseUpdate, Enrollment, EnrollmentCreate, WaitlistEntry, Role, EnrollmentStats
+from app.storage import Storage, StorageError, NotFoundError, DuplicateError, CourseFullError, AbortedError
+from app.async_storage import AsyncStorage, INLINE, THREADPOOL
+from app.search import PrefixIndex, TokenIndex
+from app.stats import EnrollmentCounters, recomputed_stats
+
+try:
+    import fcntl
+except ImportError:  # Windows: sibling workers are not detected
+    fcntl = None
+
+# Compact row records. A stored row is a plain __slots__ object (no per-instance
+# __dict__ or fields-set), several times smaller than the equivalent Pydantic
+# model; models are only built when a row leaves the store. Rows are never
+# mutated after insert.
+
+class UserRow:
+    __slots__ = ("id", "name", "email", "role")
+
+    def __init__(self, id: int, name: str, email: str, role: Role):
+        self.id = id
+        self.name = name
+        self.email = email
+        self.role = role
+
+    def to_model(self) -> User:
+        return User.model_construct(id=self.id, name=self.name, email=self.email, role=self.role)
+
+class CourseRow:
+    __slots__ = ("id", "title", "code", "capacity")
+
+    def __init__(self, id: int, title: str, code: str, capacity: Optional[int]):
+        self.id = id
+        self.title = title
+        self.code = code
+        self.capacity = capacity
+
+    def to_model(self) -> Course:
+        return Course.model_construct(id=self.id, title=self.title, code=self.code, capacity=self.capacity)
+
+class EnrollmentRow:
+    __slots__ = ("id", "user_id", "course_id")
+
+    def __init__(self, id: int, user_id: int, course_id: int):
+        self.id = id
+        self.user_id = user_id
+        self.course_id = course_id
+
+    def to_model(self) -> Enrollment:
+        return Enrollment.model_construct(id=self.id, user_id=self.user_id, course_id=self.course_id)
+
+class WaitlistRow:
+    __slots__ = ("id", "user_id", "course_id")
+
+    def __init__(self, id: int, user_id: int, course_id: int):
+        self.id = id
+        self.user_id = user_id
+        self.course_id = course_id
+
+    def to_model(self, position: int) -> WaitlistEntry:
+        return WaitlistEntry.model_construct(
+            id=self.id, user_id=self.user_id, course_id=self.course_id, position=position
+        )
+
+def _model(row):
+    return row.to_model() if row is not None else None
+
+class Sequence:
+    """
+    Monotonic per-table ID allocator. IDs are never handed out twice, even
+    after the row holding one is deleted.
+    """
+
+    def __init__(self, start: int = 1):
+        self._next = start
+        self._lock = threading.Lock()
+
+    def next(self) -> int:
+        with self._lock:
+            value = self._next
+            self._next += 1
+            return value
+
+    def peek(self) -> int:
+        return self._next
+
+    def advance_past(self, value: int) -> None:
+        """Make sure `value` is never handed out (used when loading stored rows)."""
+        with self._lock:
+            self._next = max(self._next, value + 1)
+
+class KeyOrder:
+    """
+    Sorted list of a table's live primary keys, so keyset pagination can seek
+    to "first id after the cursor" with a binary search. IDs are allocated in
+    increasing order, so adds are almost always appends.
+
+    Keys live in blocks of at most 2 * BLOCK ids, each with its largest id in
+    `_maxes` (as in app.search.PrefixIndex): a removal shifts one block
+    instead of the whole table, so deleting a course with k enrollments
+    costs O(k) block edits rather than O(k * n).
+    """
+
+    BLOCK = 1024
+
+    def __init__(self):
+        self._blocks: List[List[int]] = []
+        self._maxes: List[int] = []
+        self._lock = threading.Lock()
+
+    def add(self, key: int) -> None:
+        with self._lock:
+            if not self._maxes or key > self._maxes[-1]:
+                self._append(key)
+                return
+            b = bisect.bisect_left(self._maxes, key)
+            block = self._blocks[b]
+            bisect.insort(block, key)
+            if len(block) > 2 * self.BLOCK:
+                self._blocks[b:b + 1] = [block[:self.BLOCK], block[self.BLOCK:]]
+                self._maxes[b:b + 1] = [block[self.BLOCK - 1], block[-1]]
+
+    def extend(self, keys: List[int]) -> None:
+        """Add already sorted keys that are all above the current ones."""
+        with self._lock:
+            for key in keys:
+                self._append(key)
+
+    def _append(self, key: int) -> None:
+        # Caller holds the lock; `key` is above every stored key
+        if not self._blocks or len(self._blocks[-1]) >= 2 * self.BLOCK:
+            self._blocks.append([key])
+            self._maxes.append(key)
+        else:
+            self._blocks[-1].append(key)
+            self._maxes[-1] = key
+
+    def remove(self, key: int) -> None:
+        with self._lock:
+            b = bisect.bisect_left(self._maxes, key)
+            if b == len(self._maxes):
+                return
+            block = self._blocks[b]
+            i = bisect.bisect_left(block, key)
+            if i < len(block) and block[i] == key:
+                del block[i]
+                if block:
+                    self._maxes[b] = block[-1]
+                else:
+                    del self._blocks[b], self._maxes[b]
+
+    def rank(self, key: int) -> int:
+        """1-based position of `key` among the stored keys, or 0 if it is absent."""
+        with self._lock:
+            b = bisect.bisect_left(self._maxes, key)
+            if b == len(self._maxes):
+                return 0
+            block = self._blocks[b]
+            i = bisect.bisect_left(block, key)
+            if i == len(block) or block[i] != key:
+                return 0
+            return sum(map(len, itertools.islice(self._blocks, b))) + i + 1
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(map(len, self._blocks))
+
+    def after(self, after_id: int, count: Optional[int]) -> List[int]:
+        with self._lock:
+            b = bisect.bisect_right(self._maxes, after_id)
+            if b == len(self._blocks):
+                return []
+            first = self._blocks[b]
+            found = first[bisect.bisect_right(first, after_id):]
+            for block in itertools.islice(self._blocks, b + 1, None):
+                if count is not None and len(found) >= count:
+                    break
+                found.extend(block)
+            return found if count is None else found[:count]
+
+Row = TypeVar("Row")
+
+def _page(keys: Iterable[int], table: Dict[int, Row], after_id: int, limit: Optional[int]) -> list:
+    """Resolve the first `limit` ids above `after_id` from already sorted `keys` into models."""
+    keys = keys if isinstance(keys, list) else list(keys)
+    start = bisect.bisect_right(keys, after_id)
+    stop = None if limit is None else start + limit
+    rows = [table.get(i) for i in keys[start:stop]]
+    # Rows deleted since the keys were read are skipped
+    return [r.to_model() for r in rows if r is not None]
+
+def _first_ids(ids: Iterable[int], after_id: int, limit: Optional[int]) -> List[int]:
+    """The `limit` smallest ids above `after_id`, sorted, without sorting them all."""
+    above = [i for i in ids if i > after_id]
+    if limit is None or limit >= len(above):
+        return sorted(above)
+    return heapq.nsmallest(limit, above)
+
+def _intersect(*id_sets: Optional[Set[int]]) -> Optional[Set[int]]:
+    """Ids in every given set; None if no filter was given at all."""
+    given = [ids for ids in id_sets if ids is not None]
+    if not given:
+        return None
+    return set.intersection(*given)
+
+def _commit_batch(
+    items: list, errors: List[Optional[StorageError]], atomic: bool, insert: Callable
+) -> list:
+    """Insert the items that passed validation, or none of them if `atomic` and any failed."""
+    if atomic and any(e is not None for e in errors):
+        return [e if e is not None else AbortedError() for e in errors]
+    return [e if e is not None else insert(item) for item, e in zip(items, errors)]
+
+# Enrollment writes lock only the stripe of the course they touch, so
+# enrollments into different courses don't queue behind each other.
+_ENROLLMENT_LOCK_STRIPES = 64
+
+class InMemoryDB(Storage):
+    """
+    Tables are dicts keyed by primary key, with a secondary dict per unique
+    column (email, course code, the (user_id, course_id) pair) so every lookup
+    is a single hash probe instead of a scan over the whole table. Enrollments
+    are also indexed by user and by course, so per-student and per-course
+    reads cost O(result size).
+
+    Writes go through the create/update/delete methods, which allocate IDs and
+    check uniqueness atomically. Users and courses each have one lock;
+    enrollments and waitlists use striped per-course locks. Lock order is
+    courses lock, then an enrollment stripe.
+
+    A course's seat count is the size of its per-course enrollment index,
+    read and changed only under the course's stripe, so capacity checks are
+    exact without a global lock: a rush on one hot course queues on that
+    course's stripe only.
+
+    Rows are stored as compact __slots__ records and turned into Pydantic
+    models only on the way out. They are never mutated in place (updates
+    store a new record), so a copied list of row references is a consistent
+    snapshot.
+    """
 
-class InMemoryDB:
     def __init__(self):
-        self.users: List[User] = []
-        self.courses: List[Course] = []
-        self.enrollments: List[Enrollment] = []
+        self._users_lock = threading.Lock()
+        self._courses_lock = threading.Lock()
+        self._enrollment_locks = [threading.Lock() for _ in range(_ENROLLMENT_LOCK_STRIPES)]
+        self.reset()
+
+    def reset(self) -> None:
+        self.users: Dict[int, UserRow] = {}
+        self.courses: Dict[int, CourseRow] = {}
+        self.enrollments: Dict[int, EnrollmentRow] = {}
+
+        self._user_ids = Sequence()
+        self._course_ids = Sequence()
+        self._enrollment_ids = Sequence()
+
+        # Secondary unique indexes: value -> primary key
+        self._user_ids_by_email: Dict[str, int] = {}
+        self._course_ids_by_code: Dict[str, int] = {}
+        self._enrollment_ids_by_pair: Dict[Tuple[int, int], int] = {}
+
+        # Adjacency indexes: user/course id -> enrollment ids. Dicts are used as
+        # insertion-ordered sets so results keep their enrollment order.
+        self._enrollment_ids_by_user: Dict[int, Dict[int, None]] = {}
+        self._enrollment_ids_by_course: Dict[int, Dict[int, None]] = {}
+
+        # Sorted primary keys per table, for keyset pagination
+        self._user_order = KeyOrder()
+        self._course_order = KeyOrder()
+        self._enrollment_order = KeyOrder()
+
+        # Waitlist: entries by id, plus the queue of entry ids per course.
+        # IDs grow, so id order is queue order, and a KeyOrder answers an
+        # entry's position with a binary search instead of a scan.
+        self.waitlist: Dict[int, WaitlistRow] = {}
+        self._waitlist_ids = Sequence()
+        self._waitlist_ids_by_pair: Dict[Tuple[int, int], int] = {}
+        self._waitlist_queues: Dict[int, KeyOrder] = {}
+
+        # Search indexes, maintained with the tables they cover (see app/search.py)
+        self._user_name_index = PrefixIndex()
+        self._user_email_index = PrefixIndex()
+        self._course_code_index = PrefixIndex()
+        self._course_title_index = TokenIndex()
+
+        # Enrollments per course and per student, for enrollment_stats
+        self._counters = EnrollmentCounters()
+
+    def table_sizes(self) -> Dict[str, int]:
+        return {
+            "users": len(self.users),
+            "courses": len(self.courses),
+            "enrollments": len(self.enrollments),
+            "waitlist": len(self.waitlist),
+        }
+
+    def _enrollment_lock(self, course_id: int) -> threading.Lock:
+        return self._enrollment_locks[course_id % _ENROLLMENT_LOCK_STRIPES]
+
+    def _journal(self, change: str, row) -> None:
+        """
+        Called after every row-level change (e.g. "user", "course_deleted")
+        with the lock guarding it still held, so the order of calls is a valid
+        serialization of all writes. DurableMemoryDB logs them; here they are
+        dropped.
+        """
+
+    @staticmethod
+    def _snapshot(table: Dict[int, Row], locks: List[threading.Lock]) -> Iterator:
+        # Holding every writer lock for the table while copying the references
+        # gives a point-in-time view; the copy costs one pointer per row.
+        with ExitStack() as stack:
+            for lock in locks:
+                stack.enter_context(lock)
+            rows = list(table.values())
+        # Insertion order is already nearly ID order, so this sort is cheap
+        rows.sort(key=attrgetter("id"))
+        return (row.to_model() for row in rows)
+
+    # Users
 
     def get_user(self, user_id: int) -> Optional[User]:
-        return next((u for u in self.users if u.id == user_id), None)
+        return _model(self.users.get(user_id))
 
     def get_user_by_email(self, email: str) -> Optional[User]:
-        return next((u for u in self.users if u.email == email), None)
+        user_id = self._user_ids_by_email.get(email)
+        return _model(self.users.get(user_id)) if user_id is not None else None
+
+    def list_users(self, after_id: int = 0, limit: Optional[int] = None) -> List[User]:
+        return self._page_table(self._user_order, self.users, after_id, limit)
+
+    def create_user(self, user_data: UserCreate) -> User:
+        with self._users_lock:
+            if user_data.email in self._user_ids_by_email:
+                raise DuplicateError("email")
+            return self._insert_user(user_data)
+
+    def create_users(self, items: List[UserCreate], atomic: bool = True) -> List[Union[User, StorageError]]:
+        with self._users_lock:
+            errors: List[Optional[StorageError]] = []
+            seen: Set[str] = set()
+            for item in items:
+                if item.email in self._user_ids_by_email or item.email in seen:
+                    errors.append(DuplicateError("email"))
+                else:
+                    seen.add(item.email)
+                    errors.append(None)
+            return _commit_batch(items, errors, atomic, self._insert_user)
+
+    def _insert_user(self, user_data: UserCreate) -> User:
+        # Caller holds the users lock and has checked the email. The fields
+        # were validated with the request body, so they aren't validated again.
+        user = UserRow(self._user_ids.next(), user_data.name, user_data.email, user_data.role)
+        self._store_user(user)
+        return user.to_model()
+
+    def _store_user(self, user: UserRow) -> None:
+        self.users[user.id] = user
+        self._user_ids_by_email[user.email] = user.id
+        self._user_order.add(user.id)
+        self._user_name_index.add(user.name, user.id)
+        self._user_email_index.add(user.email, user.id)
+        self._journal("user", user)
+
+    def search_users(
+        self, name_prefix: Optional[str] = None, email_prefix: Optional[str] = None,
+        after_id: int = 0, limit: Optional[int] = None,
+    ) -> List[User]:
+        with self._users_lock:
+            ids = _intersect(
+                self._user_name_index.match(name_prefix) if name_prefix is not None else None,
+                self._user_email_index.match(email_prefix) if email_prefix is not None else None,
+            )
+        if ids is None:
+            return self.list_users(after_id, limit)
+        return _page(_first_ids(ids, after_id, limit), self.users, after_id, None)
+
+    def export_users(self) -> Iterator[User]:
+        return self._snapshot(self.users, [self._users_lock])
+
+    # Courses
 
     def get_course(self, course_id: int) -> Optional[Course]:
-        return next((c for c in self.courses if c.id == course_id), None)
-    
+        return _model(self.courses.get(course_id))
+
     def get_course_by_code(self, code: str) -> Optional[Course]:
-        return next((c for c in self.courses if c.code == code), None)
+        course_id = self._course_ids_by_code.get(code)
+        return _model(self.courses.get(course_id)) if course_id is not None else None
+
+    def list_courses(self, after_id: int = 0, limit: Optional[int] = None) -> List[Course]:
+        return self._page_table(self._course_order, self.courses, after_id, limit)
+
+    def create_course(self, course_data: CourseCreate) -> Course:
+        with self._courses_lock:
+            if course_data.code in self._course_ids_by_code:
+                raise DuplicateError("code")
+            return self._insert_course(course_data)
+
+    def create_courses(self, items: List[CourseCreate], atomic: bool = True) -> List[Union[Course, StorageError]]:
+        with self._courses_lock:
+            errors: List[Optional[StorageError]] = []
+            seen: Set[str] = set()
+            for item in items:
+                if item.code in self._course_ids_by_code or item.code in seen:
+                    errors.append(DuplicateError("code"))
+                else:
+                    seen.add(item.code)
+                    errors.append(None)
+            return _commit_batch(items, errors, atomic, self._insert_course)
+
+    def _insert_course(self, course_data: CourseCreate) -> Course:
+        # Caller holds the courses lock and has checked the code
+        course = CourseRow(self._course_ids.next(), course_data.title, course_data.code, course_data.capacity)
+        self._store_course(course)
+        return course.to_model()
+
+    def _store_course(self, course: CourseRow) -> None:
+        self.courses[course.id] = course
+        self._course_ids_by_code[course.code] = course.id
+        self._course_order.add(course.id)
+        self._index_course(course)
+        self._journal("course", course)
+
+    def _index_course(self, course: CourseRow) -> None:
+        self._course_code_index.add(course.code, course.id)
+        self._course_title_index.add(course.title, course.id)
+
+    def _unindex_course(self, course: CourseRow) -> None:
+        self._course_code_index.remove(course.code, course.id)
+        self._course_title_index.remove(course.title, course.id)
+
+    def search_courses(
+        self, query: Optional[str] = None, code_prefix: Optional[str] = None,
+        after_id: int = 0, limit: Optional[int] = None,
+    ) -> List[Course]:
+        with self._courses_lock:
+            ids = _intersect(
+                self._course_title_index.match(query) if query is not None else None,
+                self._course_code_index.match(code_prefix) if code_prefix is not None else None,
+            )
+        if ids is None:
+            return self.list_courses(after_id, limit)
+        return _page(_first_ids(ids, after_id, limit), self.courses, after_id, None)
+
+    def export_courses(self) -> Iterator[Course]:
+        return self._snapshot(self.courses, [self._courses_lock])
+
+    def update_course(self, course_id: int, course_data: CourseUpdate) -> Course:
+        with self._courses_lock:
+            course = self.courses.get(course_id)
+            if course is None:
+                raise NotFoundError("course")
+            if course.code != course_data.code and course_data.code in self._course_ids_by_code:
+                raise DuplicateError("code")
+            # Copy-on-write, so snapshots holding the old row stay consistent
+            capacity = course_data.capacity if "capacity" in course_data.model_fields_set else course.capacity
+            course = CourseRow(course_id, course_data.title, course_data.code, capacity)
+            # Swapped under the stripe so seat checks see the old or the new
+            # capacity, and a raised capacity fills from the waitlist at once
+            with self._enrollment_lock(course_id):
+                self._replace_course(course)
+                self._promote(course_id)
+            return course.to_model()
+
+    def _replace_course(self, course: CourseRow) -> None:
+        # Caller holds the courses lock and the course's stripe, and has
+        # checked that a changed code is free
+        old = self.courses[course.id]
+        if old.code != course.code:
+            del self._course_ids_by_code[old.code]
+            self._course_ids_by_code[course.code] = course.id
+        self.courses[course.id] = course
+        self._unindex_course(old)
+        self._index_course(course)
+        self._journal("course", course)
+
+    def delete_course(self, course_id: int) -> Course:
+        with self._courses_lock, self._enrollment_lock(course_id):
+            course = self.courses.get(course_id)
+            if course is None:
+                raise NotFoundError("course")
+            self._drop_course(course)
+            return course.to_model()
+
+    def _drop_course(self, course: CourseRow) -> None:
+        # Caller holds the courses lock and the course's stripe
+        del self.courses[course.id]
+        del self._course_ids_by_code[course.code]
+        self._course_order.remove(course.id)
+        self._unindex_course(course)
+        # Cascade: only the course's own enrollments are touched
+        for enrollment_id in self._enrollment_ids_by_course.pop(course.id, {}):
+            self._remove_enrollment(enrollment_id)
+        queue = self._waitlist_queues.pop(course.id, None)
+        for entry_id in queue.after(0, None) if queue is not None else ():
+            entry = self.waitlist.pop(entry_id)
+            del self._waitlist_ids_by_pair[(entry.user_id, course.id)]
+        self._journal("course_deleted", course)
+
+    # Enrollments
 
     def get_enrollment(self, enrollment_id: int) -> Optional[Enrollment]:
-        return next((e for e in self.enrollments if e.id == enrollment_id), None)
+        return _model(self.enrollments.get(enrollment_id))
+
+    def get_student_enrollments(self, student_id: int, after_id: int = 0, limit: Optional[int] = None) -> List[Enrollment]:
+        return self._page_bucket(self._enrollment_ids_by_user.get(student_id, {}), after_id, limit)
+
+    def get_course_enrollments(self, course_id: int, after_id: int = 0, limit: Optional[int] = None) -> List[Enrollment]:
+        return self._page_bucket(self._enrollment_ids_by_course.get(course_id, {}), after_id, limit)
+
+    def _page_bucket(self, ids: Dict[int, None], after_id: int, limit: Optional[int]) -> List[Enrollment]:
+        # list() copies the keys in one step, so concurrent writers can't
+        # change the bucket under the iteration. Buckets are nearly sorted
+        # already, which makes the sort linear in the result size.
+        return _page(sorted(list(ids)), self.enrollments, after_id, limit)
 
-    def get_student_enrollments(self, student_id: int) -> List[Enrollment]:
-        return [e for e in self.enrollments if e.user_id == student_id]
+    def list_enrollments(self, after_id: int = 0, limit: Optional[int] = None) -> List[Enrollment]:
+        return self._page_table(self._enrollment_order, self.enrollments, after_id, limit)
 
-    def get_course_enrollments(self, course_id: int) -> List[Enrollment]:
-        return [e for e in self.enrollments if e.course_id == course_id]
+    @staticmethod
+    def _page_table(order: KeyOrder, table: Dict[int, Row], after_id: int, limit: Optional[int]) -> list:
+        # A row deleted after its key was read leaves the page short; keep
+        # reading so a short page always means the end of the table.
+        rows: list = []
+        while True:
+            keys = order.after(after_id, None if limit is None else limit - len(rows))
+            if not keys:
+                return rows
+            rows.extend(_page(keys, table, 0, None))
+            if limit is None or len(rows) >= limit:
+                return rows
+            after_id = keys[-1]
 
     def is_enrolled(self, user_id: int, course_id: int) -> bool:
-        return any(e.user_id == user_id and e.course_id == course_id for e in self.enrollments)
+        return (user_id, course_id) in self._enrollment_ids_by_pair
+
+    def create_enrollment(self, enrollment_data: EnrollmentCreate, waitlist: bool = False) -> Union[Enrollment, WaitlistEntry]:
+        with self._enrollment_lock(enrollment_data.course_id):
+            error = self._check_enrollment(enrollment_data)
+            if isinstance(error, CourseFullError) and waitlist:
+                return self._insert_waitlist_entry(enrollment_data)
+            if error is not None:
+                raise error
+            return self._insert_enrollment(enrollment_data)
+
+    def create_enrollments(self, items: List[EnrollmentCreate], atomic: bool = True) -> List[Union[Enrollment, StorageError]]:
+        # Take every stripe the batch touches, in index order so concurrent
+        # batches can't deadlock.
+        stripes = sorted({item.course_id % _ENROLLMENT_LOCK_STRIPES for item in items})
+        with ExitStack() as stack:
+            for stripe in stripes:
+                stack.enter_context(self._enrollment_locks[stripe])
+            errors: List[Optional[StorageError]] = []
+            seen: Set[Tuple[int, int]] = set()
+            # Seats taken by earlier items of this batch, per course
+            pending: Dict[int, int] = {}
+            for item in items:
+                error = self._check_enrollment(item, pending.get(item.course_id, 0))
+                if (item.user_id, item.course_id) in seen and (error is None or isinstance(error, CourseFullError)):
+                    error = DuplicateError("enrollment")
+                seen.add((item.user_id, item.course_id))
+                if error is None:
+                    pending[item.course_id] = pending.get(item.course_id, 0) + 1
+                errors.append(error)
+            return _commit_batch(items, errors, atomic, self._insert_enrollment)
+
+    def _check_enrollment(self, enrollment_data: EnrollmentCreate, pending: int = 0) -> Optional[StorageError]:
+        # Caller holds the course's stripe. Users are never deleted; courses
+        # are only deleted under that stripe.
+        user_id, course_id = enrollment_data.user_id, enrollment_data.course_id
+        if user_id not in self.users:
+            return NotFoundError("user")
+        course = self.courses.get(course_id)
+        if course is None:
+            return NotFoundError("course")
+        if (user_id, course_id) in self._enrollment_ids_by_pair:
+            return DuplicateError("enrollment")
+        if not self._has_seat(course, pending):
+            return CourseFullError()
+        return None
+
+    def _has_seat(self, course: CourseRow, pending: int = 0) -> bool:
+        # Caller holds the course's stripe
+        if course.capacity is None:
+            return True
+        return len(self._enrollment_ids_by_course.get(course.id, ())) + pending < course.capacity
+
+    def _insert_enrollment(self, enrollment_data: EnrollmentCreate) -> Enrollment:
+        enrollment = EnrollmentRow(self._enrollment_ids.next(), enrollment_data.user_id, enrollment_data.course_id)
+        self._store_enrollment(enrollment)
+        return enrollment.to_model()
+
+    def _store_enrollment(self, enrollment: EnrollmentRow) -> None:
+        # Caller holds the course's stripe
+        user_id, course_id = enrollment.user_id, enrollment.course_id
+        self.enrollments[enrollment.id] = enrollment
+        self._enrollment_ids_by_pair[(user_id, course_id)] = enrollment.id
+        self._enrollment_ids_by_user.setdefault(user_id, {})[enrollment.id] = None
+        self._enrollment_ids_by_course.setdefault(course_id, {})[enrollment.id] = None
+        self._enrollment_order.add(enrollment.id)
+        self._counters.enrolled(user_id, course_id)
+        self._journal("enrollment", enrollment)
+
+    def export_enrollments(self) -> Iterator[Enrollment]:
+        return self._snapshot(self.enrollments, self._enrollment_locks)
+
+    def delete_enrollment(self, enrollment_id: int) -> Enrollment:
+        enrollment = self.enrollments.get(enrollment_id)
+        if enrollment is None:
+            raise NotFoundError("enrollment")
+        with self._enrollment_lock(enrollment.course_id):
+            if enrollment_id not in self.enrollments:
+                raise NotFoundError("enrollment")
+            self._drop_enrollment(enrollment)
+            self._promote(enrollment.course_id)
+            return enrollment.to_model()
+
+    def _drop_enrollment(self, enrollment: EnrollmentRow) -> None:
+        # Caller holds the course's stripe
+        self._remove_enrollment(enrollment.id)
+        bucket = self._enrollment_ids_by_course.get(enrollment.course_id)
+        if bucket is not None:
+            bucket.pop(enrollment.id, None)
+            if not bucket:
+                del self._enrollment_ids_by_course[enrollment.course_id]
+        self._journal("enrollment_deleted", enrollment)
+
+    def _remove_enrollment(self, enrollment_id: int) -> Optional[EnrollmentRow]:
+        # Caller holds the enrollment stripe and maintains the per-course index.
+        enrollment = self.enrollments.pop(enrollment_id, None)
+        if enrollment is None:
+            return None
+        del self._enrollment_ids_by_pair[(enrollment.user_id, enrollment.course_id)]
+        # Per-user buckets are written under different stripes, so they are
+        # never dropped once created; removing one here could lose a
+        # concurrent insert for the same user into another course.
+        self._enrollment_ids_by_user[enrollment.user_id].pop(enrollment_id, None)
+        self._enrollment_order.remove(enrollment_id)
+        self._counters.deregistered(enrollment.user_id, enrollment.course_id)
+        return enrollment
+
+    # Waitlist
+
+    def get_waitlist_entry(self, entry_id: int) -> Optional[WaitlistEntry]:
+        entry = self.waitlist.get(entry_id)
+        if entry is None:
+            return None
+        with self._enrollment_lock(entry.course_id):
+            position = self._position(entry)
+            return entry.to_model(position) if position else None
+
+    def get_course_waitlist(self, course_id: int) -> List[WaitlistEntry]:
+        with self._enrollment_lock(course_id):
+            queue = self._waitlist_queues.get(course_id)
+            entry_ids = queue.after(0, None) if queue is not None else []
+            return [self.waitlist[i].to_model(position) for position, i in enumerate(entry_ids, 1)]
+
+    def delete_waitlist_entry(self, entry_id: int) -> WaitlistEntry:
+        entry = self.waitlist.get(entry_id)
+        if entry is None:
+            raise NotFoundError("waitlist")
+        with self._enrollment_lock(entry.course_id):
+            position = self._position(entry)
+            if not position:
+                raise NotFoundError("waitlist")
+            self._drop_waitlist_entry(entry)
+            return entry.to_model(position)
+
+    def _position(self, entry: WaitlistRow) -> int:
+        # Caller holds the course's stripe; 0 if the entry has left the queue
+        queue = self._waitlist_queues.get(entry.course_id)
+        return queue.rank(entry.id) if queue is not None else 0
+
+    def _insert_waitlist_entry(self, enrollment_data: EnrollmentCreate) -> WaitlistEntry:
+        # Caller holds the course's stripe and has found the course full
+        pair = (enrollment_data.user_id, enrollment_data.course_id)
+        if pair in self._waitlist_ids_by_pair:
+            raise DuplicateError("waitlist")
+        entry = WaitlistRow(self._waitlist_ids.next(), *pair)
+        self._store_waitlist_entry(entry)
+        return entry.to_model(len(self._waitlist_queues[entry.course_id]))
+
+    def _store_waitlist_entry(self, entry: WaitlistRow) -> None:
+        # Caller holds the course's stripe. Entries join the back of the queue.
+        self.waitlist[entry.id] = entry
+        self._waitlist_ids_by_pair[(entry.user_id, entry.course_id)] = entry.id
+        self._waitlist_queues.setdefault(entry.course_id, KeyOrder()).add(entry.id)
+        self._journal("waitlist", entry)
+
+    def _drop_waitlist_entry(self, entry: WaitlistRow) -> None:
+        # Caller holds the course's stripe
+        del self.waitlist[entry.id]
+        del self._waitlist_ids_by_pair[(entry.user_id, entry.course_id)]
+        queue = self._waitlist_queues[entry.course_id]
+        queue.remove(entry.id)
+        if not queue:
+            del self._waitlist_queues[entry.course_id]
+        self._journal("waitlist_deleted", entry)
+
+    def _promote(self, course_id: int) -> None:
+        # Caller holds the course's stripe. Moves students from the front of
+        # the queue into free seats, so a queue only exists while the course is full.
+        while self._waitlist_queues.get(course_id):
+            entry = self.waitlist[self._waitlist_queues[course_id].after(0, 1)[0]]
+            request = EnrollmentCreate.model_construct(user_id=entry.user_id, course_id=course_id)
+            error = self._check_enrollment(request)
+            if isinstance(error, (CourseFullError, NotFoundError)):
+                return
+            # A student who already holds a seat leaves the queue without a second one
+            self._drop_waitlist_entry(entry)
+            if error is None:
+                self._insert_enrollment(request)
+
+    # Statistics
+
+    def enrollment_stats(self, top: int = 10, verify: bool = False) -> EnrollmentStats:
+        if not verify:
+            return self._counters.stats(len(self.courses), top)
+        # Every writer is locked out while the rows and the counters are
+        # copied, so both describe the same moment; the recount runs after
+        with ExitStack() as stack:
+            stack.enter_context(self._courses_lock)
+            for lock in self._enrollment_locks:
+                stack.enter_context(lock)
+            rows = list(self.enrollments.values())
+            courses = len(self.courses)
+            counted_by_course, counted_by_student = self._counters.snapshot()
+        by_course = Counter(map(attrgetter("course_id"), rows))
+        by_student = Counter(map(attrgetter("user_id"), rows))
+        stats = recomputed_stats(by_course, by_student, courses, top)
+        stats.verified = by_course == counted_by_course and by_student == counted_by_student
+        return stats
+
+# Held for the life of the process by the worker that owns the memory store
+_store_claim = None
+
+def claim_private_store() -> None:
+    """
+    Fail if a sibling worker process already serves a memory store.
+
+    `uvicorn --workers N` does not tell its workers how many there are, but
+    spawns them all with multiprocessing from one supervisor, so siblings
+    share a parent: the first takes an exclusive lock named after it and
+    the others fail. Called from the app's startup, where a failure makes
+    uvicorn stop the whole server. A `--reload` supervisor runs one worker
+    at a time and passes the check.
+    """
+    global _store_claim
+    parent = multiprocessing.parent_process()
+    if parent is None or fcntl is None or _store_claim is not None:
+        return
+    claim = open(os.path.join(tempfile.gettempdir(), f"enrollment-memory-store-{parent.pid}.lock"), "w")
+    try:
+        fcntl.flock(claim, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        claim.close()
+        raise ValueError(
+            "Another worker process of this server already serves a memory store; "
+            "several workers need APP_STORAGE_BACKEND=sqlite"
+        )
+    _store_claim = claim
+
+def create_storage(config: Settings) -> Storage:
+    if config.workers > 1 and config.storage_backend != "sqlite":
+        # Each worker would serve (and log, with a WAL) its own copy of the data
+        raise ValueError(
+            f"{config.workers} worker processes need APP_STORAGE_BACKEND=sqlite; "
+            "the memory store cannot be shared between processes"
+        )
+    if config.storage_backend == "sqlite":
+        # Imported lazily so the default in-memory setup never touches sqlite3
+        from app.sqlite_db import SQLiteDB
+        return SQLiteDB(config.sqlite_path, pool_size=config.sqlite_pool_size)
+    if config.wal_dir:
+        from app.durable_db import DurableMemoryDB
+        return DurableMemoryDB(
+            config.wal_dir,
+            sync_commit=config.wal_sync == "commit",
+            sync_interval=config.wal_sync_interval_ms / 1000,
+            snapshot_bytes=config.wal_snapshot_bytes,
+        )
+    return InMemoryDB()
+
+def create_async_storage(storage: Storage, config: Settings) -> AsyncStorage:
+    mode = config.storage_executor
+    if mode == "auto":
+        mode = THREADPOOL if storage.blocking else INLINE
+    # More threads than SQLite connections would only queue inside the pool
+    workers = config.sqlite_pool_size if config.storage_backend == "sqlite" else config.storage_threads
+    return AsyncStorage(storage, mode, workers, timed=config.metrics)
 
-db = InMemoryDB()
+db = create_storage(settings)
+adb = create_async_storage(db, settings)
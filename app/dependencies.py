@@ -0,0 +1,61 @@
+from typing import Optional
+from fastapi import Depends, Header, HTTPException
+from app.auth import InvalidTokenError, Principal, PrincipalCache, verify_token
+from app.config import settings
+from app.db import adb
+from app.models import Role
+
+# Verified bearer tokens, so the hot path skips the HMAC check and user lookup
+principal_cache = PrincipalCache(settings.auth_cache_size, settings.auth_cache_ttl)
+
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(status_code=401, detail=detail, headers={"WWW-Authenticate": "Bearer"})
+
+async def _principal(authorization: str) -> Principal:
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise _unauthorized("Expected a bearer token")
+    principal = principal_cache.get(token)
+    if principal is not None:
+        return principal
+    if not settings.auth_secret:
+        raise _unauthorized("Token authentication is not configured")
+    try:
+        user_id, expires = verify_token(settings.auth_secret, token)
+    except InvalidTokenError as e:
+        raise _unauthorized(f"Invalid token: {e}")
+    user = await adb.get_user(user_id)
+    if user is None:
+        raise _unauthorized("Invalid token: unknown user")
+    # The role always comes from the stored user, never from the token
+    principal = Principal(user.id, user.role)
+    principal_cache.put(token, principal, expires)
+    return principal
+
+async def get_current_user_role(
+    authorization: Optional[str] = Header(None, description="`Bearer <token>`"),
+    x_user_role: Optional[str] = Header(None, description="Role of the user making the request (if APP_AUTH_ALLOW_HEADERS)"),
+):
+    if authorization is not None:
+        return (await _principal(authorization)).role
+    # Without a token, trust the headers only if tokens are off or they are explicitly allowed
+    if settings.trusts_headers() and x_user_role is not None:
+        return x_user_role
+    raise _unauthorized("Not authenticated")
+
+async def get_current_user_info(
+    authorization: Optional[str] = Header(None, description="`Bearer <token>`"),
+    x_user_role: Optional[str] = Header(None, description="Role of the requester (if APP_AUTH_ALLOW_HEADERS)"),
+    x_user_id: Optional[int] = Header(None, description="ID of the requester (if APP_AUTH_ALLOW_HEADERS)"),
+):
+    if authorization is not None:
+        principal = await _principal(authorization)
+        return {"role": principal.role, "id": principal.id}
+    if settings.trusts_headers() and x_user_role is not None and x_user_id is not None:
+        return {"role": x_user_role, "id": x_user_id}
+    raise _unauthorized("Not authenticated")
+
+async def require_admin(role: str = Depends(get_current_user_role)):
+    # Route-level guard for admin-only endpoints: dependencies=[Depends(require_admin)]
+    if role != Role.admin:
+        raise HTTPException(status_code=403, detail="Operation not permitted. Admins only.")
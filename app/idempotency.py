@@ -0,0 +1,247 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Type, Union
+from fastapi import Header, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel
+from app.config import settings
+from app.db import db
+from app.storage import IdempotencyLog
+from app.responses import encode_json
+
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+# Route parameter for the writes that accept a key
+IDEMPOTENCY_KEY = Header(
+    None, alias="Idempotency-Key", max_length=255,
+    description="Client-chosen unique key; a retry with the same key and body replays the first response",
+)
+
+class _Outcome:
+    """What the first request with a key answered: a response or an HTTP error."""
+    __slots__ = ("fingerprint", "status_code", "body", "headers", "error", "expires")
+
+    def __init__(self, fingerprint: str, expires: float, response: Optional[Response] = None,
+                 error: Optional[HTTPException] = None):
+        self.fingerprint = fingerprint
+        self.expires = expires
+        self.error = error
+        if response is not None:
+            self.status_code = response.status_code
+            self.body = response.body
+            self.headers = {k: v for k, v in response.headers.items() if k != "content-length"}
+
+    def dump(self) -> bytes:
+        """Encode for a shared store: a JSON line of metadata, then the body."""
+        if self.error is not None:
+            return json.dumps(
+                {"status": self.error.status_code, "detail": self.error.detail, "headers": self.error.headers}
+            ).encode()
+        return json.dumps({"status": self.status_code, "headers": self.headers}).encode() + b"\n" + bytes(self.body)
+
+    @classmethod
+    def load(cls, fingerprint: str, data: bytes) -> "_Outcome":
+        meta, _, body = data.partition(b"\n")
+        meta = json.loads(meta)
+        if "detail" in meta:
+            return cls(fingerprint, 0, error=HTTPException(meta["status"], meta["detail"], meta["headers"]))
+        return cls(fingerprint, 0, response=Response(content=body, status_code=meta["status"], headers=meta["headers"]))
+
+    def render(self, replayed: bool) -> Response:
+        extra = {REPLAYED_HEADER: "true"} if replayed else {}
+        if self.error is not None:
+            raise HTTPException(self.error.status_code, self.error.detail, {**(self.error.headers or {}), **extra} or None)
+        return Response(content=self.body, status_code=self.status_code, headers={**self.headers, **extra})
+
+class _Pending:
+    __slots__ = ("fingerprint", "done")
+
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        # A concurrent.futures.Future, so waiters on any event loop can await it
+        self.done: Future = Future()
+
+class IdempotencyStore:
+    """
+    Responses to writes that carried an `Idempotency-Key`, so a retried
+    request is answered with the original response instead of running again.
+
+    Keys are scoped by the caller (e.g. route and user id). The first
+    request with a key runs; identical requests arriving while it runs wait
+    for it instead of running too, and later ones replay its outcome,
+    successes and HTTP errors alike, for `ttl` seconds. A key reused with a
+    different request body is rejected with 422. If the first request fails
+    unexpectedly nothing is stored and the next attempt runs afresh.
+
+    Completed outcomes form a bounded LRU; requests still running are never
+    evicted.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, _Outcome]" = OrderedDict()
+        self._pending: Dict[Hashable, _Pending] = {}
+        self._lock = threading.Lock()
+
+    async def run(
+        self,
+        key: Hashable,
+        fingerprint: str,
+        execute: Callable[[], Awaitable[Any]],
+        model: Optional[Type[BaseModel]] = None,
+        status_code: int = 200,
+    ) -> Response:
+        """
+        Answer the request identified by `key`, running `execute` only if no
+        request with that key ran or is running. A model returned by
+        `execute` is encoded as `model` with `status_code`; a Response is
+        kept as is.
+        """
+        if self.max_entries <= 0:
+            return _as_response(await execute(), model, status_code)
+        while True:
+            with self._lock:
+                outcome = self._entries.get(key)
+                if outcome is not None and outcome.expires <= time.monotonic():
+                    del self._entries[key]
+                    outcome = None
+                if outcome is not None:
+                    _check(outcome.fingerprint, fingerprint)
+                    self._entries.move_to_end(key)
+                    return outcome.render(replayed=True)
+                pending = self._pending.get(key)
+                if pending is None:
+                    pending = self._pending[key] = _Pending(fingerprint)
+                    break
+                _check(pending.fingerprint, fingerprint)
+            # Shielded: a waiter giving up must not cancel the shared future
+            outcome = await asyncio.shield(asyncio.wrap_future(pending.done))
+            if outcome is not None:
+                return outcome.render(replayed=True)
+            # The request we waited for failed without an answer; run it ourselves
+
+        outcome = None
+        try:
+            expires = time.monotonic() + self.ttl
+            try:
+                outcome = _Outcome(fingerprint, expires, response=_as_response(await execute(), model, status_code))
+            except HTTPException as e:
+                outcome = _Outcome(fingerprint, expires, error=e)
+        finally:
+            with self._lock:
+                del self._pending[key]
+                if outcome is not None:
+                    self._entries[key] = outcome
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+            pending.done.set_result(outcome)
+        return outcome.render(replayed=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class SharedIdempotencyStore:
+    """
+    IdempotencyStore for a storage shared by several worker processes, so a
+    retry is replayed whichever worker it reaches.
+
+    The first request with a key claims it in the storage (a unique row
+    inserted under the write lock); copies arriving at any worker meanwhile
+    poll every `poll_interval` seconds until its outcome is stored. A claim
+    left behind by a worker that died mid-request lapses after
+    `claim_timeout` seconds. Outcomes are kept for `ttl` seconds; there is no
+    LRU bound.
+    """
+
+    def __init__(self, log: IdempotencyLog, ttl: float, claim_timeout: float = 60, poll_interval: float = 0.02):
+        self.ttl = ttl
+        self.claim_timeout = claim_timeout
+        self.poll_interval = poll_interval
+        self._log = log
+
+    async def run(
+        self,
+        key: tuple,
+        fingerprint: str,
+        execute: Callable[[], Awaitable[Any]],
+        model: Optional[Type[BaseModel]] = None,
+        status_code: int = 200,
+    ) -> Response:
+        """Same contract as IdempotencyStore.run(); `key` is a tuple ending with the Idempotency-Key."""
+        scope, name = json.dumps(key[:-1], default=str), str(key[-1])
+        while True:
+            now = time.time()
+            found = await run_in_threadpool(self._log.claim_request, scope, name, fingerprint, now + self.claim_timeout, now)
+            if found is None:
+                break
+            _check(found[0], fingerprint)
+            if found[1] is not None:
+                return _Outcome.load(fingerprint, found[1]).render(replayed=True)
+            await asyncio.sleep(self.poll_interval)
+
+        outcome = None
+        try:
+            try:
+                outcome = _Outcome(fingerprint, 0, response=_as_response(await execute(), model, status_code))
+            except HTTPException as e:
+                outcome = _Outcome(fingerprint, 0, error=e)
+        finally:
+            if outcome is None:
+                await run_in_threadpool(self._log.release_request, scope, name)
+        await run_in_threadpool(self._log.complete_request, scope, name, outcome.dump(), time.time() + self.ttl)
+        return outcome.render(replayed=False)
+
+    def clear(self) -> None:
+        self._log.clear_requests()
+
+def _check(stored: str, fingerprint: str) -> None:
+    if stored != fingerprint:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+
+def _as_response(result: Union[BaseModel, Response], model: Optional[Type[BaseModel]], status_code: int) -> Response:
+    if isinstance(result, Response):
+        return result
+    return Response(content=encode_json(result, model), status_code=status_code, media_type="application/json")
+
+def fingerprint(*parts: Any) -> str:
+    """Digest of a request's body and parameters; models are compared by their JSON form."""
+    payload = [part.model_dump(mode="json") if isinstance(part, BaseModel) else part for part in parts]
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str).encode()
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+async def idempotent(
+    idempotency_key: Optional[str],
+    scope: tuple,
+    request: tuple,
+    execute: Callable[[], Awaitable[Any]],
+    model: Type[BaseModel],
+    status_code: int,
+):
+    """
+    Run a write handler's body at most once per `Idempotency-Key` within
+    `scope` (who is calling which route); `request` holds what the retry must
+    repeat exactly. Without a key, just run it.
+    """
+    if idempotency_key is None:
+        return await execute()
+    return await idempotency_store.run(
+        scope + (idempotency_key,), fingerprint(*request), execute, model, status_code
+    )
+
+# POST /users, /courses and /enrollments
+idempotency_store: Union[IdempotencyStore, SharedIdempotencyStore]
+if isinstance(db, IdempotencyLog) and settings.idempotency_cache_size > 0:
+    # Other worker processes may receive the retries
+    idempotency_store = SharedIdempotencyStore(db, settings.idempotency_ttl)
+else:
+    idempotency_store = IdempotencyStore(settings.idempotency_cache_size, settings.idempotency_ttl)
@@ -1,15 +1,39 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.routers import users, courses, enrollments
+from app.config import settings
+from app.cache import catalog_cache
+from app.db import db, claim_private_store
+from app.metrics import MetricsMiddleware
+from app.routers import users, courses, enrollments, exports, monitoring
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if not db.shared:
+        # Refuses to serve a second private copy of the data under `--workers`
+        claim_private_store()
+    yield
+    # Flushes the write-ahead log / closes SQLite connections
+    db.close()
 
 app = FastAPI(
     title="Course Enrollment Management API",
     description="API for managing students, courses, and enrollments with role-based access control.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 app.include_router(users.router, tags=["Users"])
 app.include_router(courses.router, tags=["Courses"])
 app.include_router(enrollments.router, tags=["Enrollments"])
+app.include_router(exports.router, tags=["Exports"])
+app.include_router(monitoring.router, tags=["Monitoring"])
+
+if settings.metrics:
+    app.add_middleware(MetricsMiddleware)
+
+if db.shared:
+    # Other worker processes write to the same database
+    catalog_cache.watch(db.catalog_version)
 
 @app.get("/")
 def read_root():
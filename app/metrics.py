@@ -0,0 +1,150 @@
+import bisect
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Histogram bucket upper bounds in seconds (+Inf is implicit). Storage calls
+# on the memory backend take single-digit microseconds, hence the low end.
+LATENCY_BUCKETS = (
+    0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+)
+
+# Route label for requests that matched no route, so scanners hitting random
+# paths cannot blow up the number of series
+UNMATCHED = "<unmatched>"
+
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+class Histogram:
+    __slots__ = ("counts", "sum")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.sum += seconds
+
+class Metrics:
+    """
+    In-process request and storage metrics, rendered in the Prometheus text
+    format by GET /metrics.
+
+    Recording is a dict lookup, a bisect over the bucket bounds and a few
+    integer increments under one lock (storage calls may run on worker
+    threads), i.e. well under a microsecond; cumulative bucket counts are
+    only computed at scrape time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.requests: Dict[Tuple[str, str, int], int] = {}
+            self.request_latency: Dict[Tuple[str, str], Histogram] = {}
+            self.storage_latency: Dict[str, Histogram] = {}
+            self.storage_errors: Dict[str, int] = {}
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float) -> None:
+        with self._lock:
+            key = (method, route, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            histogram = self.request_latency.get((method, route))
+            if histogram is None:
+                histogram = self.request_latency[(method, route)] = Histogram()
+            histogram.observe(seconds)
+
+    def observe_storage(self, operation: str, seconds: float, failed: bool = False) -> None:
+        with self._lock:
+            histogram = self.storage_latency.get(operation)
+            if histogram is None:
+                histogram = self.storage_latency[operation] = Histogram()
+            histogram.observe(seconds)
+            if failed:
+                self.storage_errors[operation] = self.storage_errors.get(operation, 0) + 1
+
+    def render(self, table_sizes: Optional[Dict[str, int]] = None) -> str:
+        with self._lock:
+            requests = dict(self.requests)
+            request_latency = {k: (list(h.counts), h.sum) for k, h in self.request_latency.items()}
+            storage_latency = {k: (list(h.counts), h.sum) for k, h in self.storage_latency.items()}
+            storage_errors = dict(self.storage_errors)
+
+        lines = ["# HELP http_requests_total Requests handled, by route template and status code.",
+                 "# TYPE http_requests_total counter"]
+        for (method, route, status), count in sorted(requests.items()):
+            lines.append(f"http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+        lines += ["# HELP http_request_duration_seconds Time from receiving a request to its last response byte.",
+                  "# TYPE http_request_duration_seconds histogram"]
+        for (method, route), histogram in sorted(request_latency.items()):
+            _histogram(lines, "http_request_duration_seconds", histogram, method=method, route=route)
+        lines += ["# HELP storage_operation_duration_seconds Time spent in each storage method.",
+                  "# TYPE storage_operation_duration_seconds histogram"]
+        for operation, histogram in sorted(storage_latency.items()):
+            _histogram(lines, "storage_operation_duration_seconds", histogram, operation=operation)
+        lines += ["# HELP storage_operation_errors_total Storage calls that raised.",
+                  "# TYPE storage_operation_errors_total counter"]
+        for operation, count in sorted(storage_errors.items()):
+            lines.append(f"storage_operation_errors_total{_labels(operation=operation)} {count}")
+        if table_sizes is not None:
+            lines += ["# HELP storage_rows Rows currently stored, by table.", "# TYPE storage_rows gauge"]
+            for table, rows in sorted(table_sizes.items()):
+                lines.append(f"storage_rows{_labels(table=table)} {rows}")
+        return "\n".join(lines) + "\n"
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+def _histogram(lines: List[str], name: str, histogram: Tuple[List[int], float], **labels) -> None:
+    counts, total = histogram
+    cumulative = 0
+    for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), counts):
+        cumulative += count
+        lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {cumulative}")
+    lines.append(f"{name}_sum{_labels(**labels)} {total}")
+    lines.append(f"{name}_count{_labels(**labels)} {cumulative}")
+
+metrics = Metrics()
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording every HTTP request's latency and status.
+
+    Requests are labelled with the matched route's template
+    (`/courses/{course_id}`), which the router leaves in the scope, so the
+    number of series stays bounded. Unlike BaseHTTPMiddleware this adds no
+    task or stream per request, only a wrapper around `send`.
+    """
+
+    def __init__(self, app, registry: Metrics = metrics):
+        self.app = app
+        self.metrics = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            self.metrics.observe_request(
+                scope["method"], getattr(route, "path", UNMATCHED), status, time.perf_counter() - start
+            )
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional
+from typing import List, Optional
 from enum import Enum
 
 class Role(str, Enum):
@@ -20,10 +20,16 @@ class User(UserBase):
 class CourseBase(BaseModel):
     title: str = Field(..., min_length=1, description="Title of the course")
     code: str = Field(..., min_length=1, description="Unique code of the course")
+    capacity: Optional[int] = Field(None, ge=1, description="Maximum number of enrolled students; unlimited if omitted")
 
 class CourseCreate(CourseBase):
     pass
 
+class CourseUpdate(CourseBase):
+    capacity: Optional[int] = Field(
+        None, ge=1, description="New maximum number of enrolled students; kept if omitted, `null` removes the limit"
+    )
+
 class Course(CourseBase):
     id: int
 
@@ -36,3 +42,57 @@ class EnrollmentCreate(EnrollmentBase):
 
 class Enrollment(EnrollmentBase):
     id: int
+
+class WaitlistEntry(EnrollmentBase):
+    id: int
+    position: int = Field(..., description="Place in the course's queue when this entry was read, starting at 1")
+
+class BatchMode(str, Enum):
+    atomic = "atomic"
+    partial = "partial"
+
+class BatchItemStatus(str, Enum):
+    created = "created"
+    duplicate = "duplicate"
+    not_found = "not_found"
+    forbidden = "forbidden"
+    full = "full"
+    aborted = "aborted"
+
+class BatchItemResult(BaseModel):
+    index: int = Field(..., description="Position of the item in the request")
+    status: BatchItemStatus
+    id: Optional[int] = Field(None, description="ID of the created row")
+    detail: Optional[str] = None
+
+class BatchResult(BaseModel):
+    committed: bool = Field(..., description="False if an atomic batch was rolled back")
+    created: int = Field(..., description="Number of rows created")
+    results: List[BatchItemResult]
+
+class TokenRequest(BaseModel):
+    ttl_seconds: Optional[int] = Field(None, ge=1, description="Token lifetime; defaults to APP_AUTH_TOKEN_TTL")
+
+class Token(BaseModel):
+    access_token: str
+    token_type: str = "bearer"
+    expires_at: int = Field(..., description="Unix time after which the token is rejected")
+
+class CourseEnrollmentCount(BaseModel):
+    course_id: int
+    enrollments: int
+
+class HistogramBucket(BaseModel):
+    value: int = Field(..., description="Enrollments per course, or courses per student")
+    count: int = Field(..., description="Number of courses (or students) with exactly that value")
+
+class EnrollmentStats(BaseModel):
+    enrollments: int = Field(..., description="Total number of enrollments")
+    courses: int = Field(..., description="Number of courses, including those nobody enrolled in")
+    students: int = Field(..., description="Number of users enrolled in at least one course")
+    top_courses: List[CourseEnrollmentCount] = Field(..., description="Most enrolled courses, largest first")
+    course_sizes: List[HistogramBucket] = Field(..., description="Courses by number of enrollments, ascending")
+    student_loads: List[HistogramBucket] = Field(..., description="Enrolled students by number of courses, ascending")
+    verified: Optional[bool] = Field(
+        None, description="With verify=true: whether the maintained counters matched a full recompute"
+    )
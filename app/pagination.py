@@ -0,0 +1,60 @@
+from typing import List, Optional, Sequence, Type
+from fastapi import HTTPException, Query, Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from app.responses import fast_json
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+class PageParams:
+    """
+    Query parameters shared by the list endpoints (see `page_params`).
+
+    Pages are keyset-based: `cursor` is the ID of the last row of the previous
+    page, so inserts and deletes elsewhere never shift or repeat rows. The
+    cursor for the next page comes back in the `X-Next-Cursor` response header;
+    it is absent on the last page. `fields` is a comma-separated projection,
+    e.g. `fields=id,email`.
+    """
+
+    def __init__(self, cursor: int = 0, limit: int = DEFAULT_PAGE_SIZE, fields: Optional[str] = None):
+        self.cursor = cursor
+        self.limit = limit
+        self.fields = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+
+    @property
+    def fetch_limit(self) -> int:
+        # One extra row tells us whether another page exists
+        return self.limit + 1
+
+    def render(self, response: Response, rows: Sequence[BaseModel], model: Type[BaseModel]):
+        """
+        Trim `rows` (fetched with `fetch_limit`) to the page, set the next
+        cursor header, and apply the field projection if one was requested.
+        """
+        headers = {}
+        if len(rows) > self.limit:
+            rows = rows[:self.limit]
+            headers[NEXT_CURSOR_HEADER] = str(rows[-1].id)
+
+        if self.fields is None:
+            response.headers.update(headers)
+            return fast_json(rows, model, response)
+
+        unknown = [f for f in self.fields if f not in model.model_fields]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown field(s): {', '.join(unknown)}")
+        # Projected rows skip response_model validation entirely
+        content: List[dict] = [{f: getattr(row, f) for f in self.fields} for row in rows]
+        return JSONResponse(content=content, headers=headers)
+
+async def page_params(
+    cursor: int = Query(0, ge=0, description="Cursor from the previous page's X-Next-Cursor header"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of rows to return"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,name"),
+) -> PageParams:
+    # A coroutine, so FastAPI resolves it on the event loop rather than in a thread
+    return PageParams(cursor, limit, fields)
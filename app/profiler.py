@@ -0,0 +1,53 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from types import CodeType
+from typing import Dict
+
+class ProfilerBusyError(Exception):
+    """Raised when a profile is requested while another one is running."""
+
+_running = threading.Lock()
+
+def _frame_name(code: CodeType, names: Dict[CodeType, str]) -> str:
+    name = names.get(code)
+    if name is None:
+        # Semicolons separate frames in the collapsed format
+        path = os.path.join(*code.co_filename.split(os.sep)[-2:])
+        name = names[code] = f"{code.co_name} ({path}:{code.co_firstlineno})".replace(";", ":")
+    return name
+
+def sample_stacks(seconds: float, interval: float) -> Counter:
+    """
+    Sample every other thread's Python stack each `interval` seconds for
+    `seconds`, and count identical stacks. Keys are root-first frames joined
+    by ";", prefixed with the thread name, i.e. the "collapsed" input of
+    flamegraph.pl / speedscope. Only one profile runs at a time.
+    """
+    if not _running.acquire(blocking=False):
+        raise ProfilerBusyError()
+    try:
+        me = threading.get_ident()
+        stacks: Counter = Counter()
+        names: Dict[CodeType, str] = {}
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            threads = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                frames = []
+                while frame is not None:
+                    frames.append(_frame_name(frame.f_code, names))
+                    frame = frame.f_back
+                frames.append(threads.get(ident, f"thread-{ident}"))
+                stacks[";".join(reversed(frames))] += 1
+            time.sleep(interval)
+        return stacks
+    finally:
+        _running.release()
+
+def collapsed(stacks: Counter) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
@@ -0,0 +1,39 @@
+from typing import Dict, List, Optional, Sequence, Type, Union
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+from app.config import settings
+
+# One pre-built serializer per model and shape, created on first use
+_serializers: Dict[tuple, TypeAdapter] = {}
+
+def _serializer(model: Type[BaseModel], many: bool) -> TypeAdapter:
+    key = (model, many)
+    adapter = _serializers.get(key)
+    if adapter is None:
+        adapter = _serializers[key] = TypeAdapter(List[model] if many else model)
+    return adapter
+
+def encode_json(content: Union[BaseModel, Sequence[BaseModel]], model: Type[BaseModel]) -> bytes:
+    """Encode stored rows straight to JSON bytes, without re-validating them."""
+    many = not isinstance(content, BaseModel)
+    return _serializer(model, many).dump_json(content if not many else list(content))
+
+def fast_json(
+    content: Union[BaseModel, Sequence[BaseModel]],
+    model: Type[BaseModel],
+    response: Optional[Response] = None,
+    status_code: int = 200,
+):
+    """
+    Return `content` for FastAPI to validate and encode against the route's
+    `response_model`, or, when `APP_FAST_RESPONSES` is on, a Response holding
+    the already-encoded bytes. Both produce the same JSON; the fast path skips
+    the per-row validation round trip, which dominates large list responses.
+    Headers already set on `response` are carried over.
+    """
+    if not settings.fast_responses:
+        return content
+    headers = dict(response.headers) if response is not None else None
+    if headers:
+        headers.pop("content-length", None)
+    return Response(content=encode_json(content, model), status_code=status_code, media_type="application/json", headers=headers)
@@ -1,23 +1,35 @@
-from fastapi import APIRouter, HTTPException, Path, Header, Depends, Query
+from fastapi import APIRouter, HTTPException, Path, Body, Depends, Query, Response
 from typing import List, Optional
-from app.models import Enrollment, EnrollmentCreate, Role
-from app.db import db
+from fastapi.responses import JSONResponse
+from app.models import Enrollment, EnrollmentCreate, WaitlistEntry, Role, BatchMode, BatchResult, BatchItemResult, BatchItemStatus
+from app.db import adb, DuplicateError, NotFoundError, CourseFullError, AbortedError, StorageError
+from app.dependencies import get_current_user_info
+from app.batch import MAX_BATCH_SIZE, batch_mode, batch_result
+from app.pagination import PageParams, page_params
+from app.idempotency import IDEMPOTENCY_KEY, idempotent
 
 router = APIRouter()
 
-def get_current_user_info(
-    x_user_role: str = Header(..., description="Role of the requester"),
-    x_user_id: int = Header(..., description="ID of the requester")
-):
-    return {"role": x_user_role, "id": x_user_id}
-
-@router.post("/enrollments", response_model=Enrollment, status_code=201, summary="Enroll a student within a course")
-def enroll_student(
+@router.post(
+    "/enrollments",
+    response_model=Enrollment,
+    status_code=201,
+    summary="Enroll a student within a course",
+    responses={202: {"model": WaitlistEntry, "description": "The course is full; the student joined its waitlist"}},
+)
+async def enroll_student(
     enrollment: EnrollmentCreate,
-    user_info: dict = Depends(get_current_user_info)
+    waitlist: bool = Query(False, description="Join the course's waitlist instead of failing if it is full"),
+    user_info: dict = Depends(get_current_user_info),
+    idempotency_key: Optional[str] = IDEMPOTENCY_KEY,
 ):
     """
-    Student only: Enroll in a course.
+    Student only: Enroll in a course. A full course answers 409, or with
+    `waitlist=true` queues the student (202); queued students are enrolled
+    in order as seats free up.
+
+    Retries sent with the same `Idempotency-Key` get the first answer
+    replayed instead of "already enrolled".
     """
     requester_role = user_info["role"]
     requester_id = user_info["id"]
@@ -29,33 +41,87 @@ def enroll_student(
     if enrollment.user_id != requester_id:
          raise HTTPException(status_code=403, detail="You can only enroll yourself")
 
-    if not db.get_user(enrollment.user_id):
-        raise HTTPException(status_code=404, detail="Student not found")
-    
-    if not db.get_course(enrollment.course_id):
-        raise HTTPException(status_code=404, detail="Course not found")
-    
-    if db.is_enrolled(enrollment.user_id, enrollment.course_id):
-         raise HTTPException(status_code=400, detail="Student is already enrolled in this course")
+    async def enroll():
+        # Existence, duplicate and seat checks run atomically with the insert
+        try:
+            created = await adb.create_enrollment(enrollment, waitlist=waitlist)
+        except NotFoundError as e:
+            detail = "Student not found" if e.entity == "user" else "Course not found"
+            raise HTTPException(status_code=404, detail=detail)
+        except DuplicateError as e:
+            if e.field == "waitlist":
+                raise HTTPException(status_code=400, detail="Student is already on the waitlist for this course")
+            raise HTTPException(status_code=400, detail="Student is already enrolled in this course")
+        except CourseFullError:
+            raise HTTPException(status_code=409, detail="Course is full")
+        if isinstance(created, WaitlistEntry):
+            return JSONResponse(status_code=202, content=created.model_dump())
+        return created
+
+    return await idempotent(idempotency_key, ("enrollments", requester_id), (enrollment, waitlist), enroll, Enrollment, 201)
+
+def _describe_enrollment_error(error: StorageError) -> str:
+    if isinstance(error, NotFoundError):
+        return "Student not found" if error.entity == "user" else "Course not found"
+    if isinstance(error, CourseFullError):
+        return "Course is full"
+    return "Student is already enrolled in this course"
 
-    new_enrollment_id = len(db.enrollments) + 1
-    new_enrollment = Enrollment(id=new_enrollment_id, **enrollment.dict())
-    db.enrollments.append(new_enrollment)
-    return new_enrollment
+@router.post("/enrollments:batch", response_model=BatchResult, summary="Enroll students in courses in bulk")
+async def enroll_students_batch(
+    response: Response,
+    enrollments: List[EnrollmentCreate] = Body(..., max_length=MAX_BATCH_SIZE),
+    mode: BatchMode = Depends(batch_mode),
+    user_info: dict = Depends(get_current_user_info)
+):
+    """
+    Students: Enroll themselves in many courses at once; items for anyone else
+    are `forbidden`.
+    Admin: Bulk-enroll any students (e.g. at term start).
+
+    Each item is reported as `created`, `duplicate`, `not_found`, `full` or
+    `forbidden`; an atomic batch with any failure creates nothing and answers 409.
+    Batches never join waitlists.
+    """
+    requester_role = user_info["role"]
+    requester_id = user_info["id"]
+
+    if requester_role not in (Role.student, Role.admin):
+        raise HTTPException(status_code=403, detail="Operation not permitted")
+
+    forbidden = {
+        index for index, item in enumerate(enrollments)
+        if requester_role == Role.student and item.user_id != requester_id
+    }
+    atomic = mode == BatchMode.atomic
+    if forbidden and atomic:
+        # Nothing may be written, so the allowed items aren't even checked
+        outcomes = [AbortedError() for _ in enrollments]
+    else:
+        allowed = [item for index, item in enumerate(enrollments) if index not in forbidden]
+        stored = iter(await adb.create_enrollments(allowed, atomic=atomic))
+        outcomes = [None if index in forbidden else next(stored) for index in range(len(enrollments))]
+    for index in forbidden:
+        outcomes[index] = BatchItemResult(
+            index=index, status=BatchItemStatus.forbidden, detail="You can only enroll yourself"
+        )
+    return batch_result(response, mode, outcomes, _describe_enrollment_error)
 
 @router.delete("/enrollments/{enrollment_id}", status_code=204, summary="Deregister from a course")
-def deregister_student(
+async def deregister_student(
     enrollment_id: int = Path(..., title="The ID of the enrollment to remove"),
     user_info: dict = Depends(get_current_user_info)
 ):
     """
     Student: Deregister themselves.
     Admin: Force deregister.
+
+    The freed seat goes to the first student on the course's waitlist.
     """
     requester_role = user_info["role"]
     requester_id = user_info["id"]
     
-    enrollment = db.get_enrollment(enrollment_id)
+    enrollment = await adb.get_enrollment(enrollment_id)
     if not enrollment:
         raise HTTPException(status_code=404, detail="Enrollment not found")
 
@@ -67,13 +133,19 @@ def deregister_student(
     else:
          raise HTTPException(status_code=403, detail="Operation not permitted")
 
-    db.enrollments.remove(enrollment)
+    try:
+        await adb.delete_enrollment(enrollment_id)
+    except NotFoundError:
+        # Lost a race with another deregistration of the same enrollment
+        raise HTTPException(status_code=404, detail="Enrollment not found")
     return
 
 @router.get("/students/{student_id}/enrollments", response_model=List[Enrollment], summary="Retrieve enrollments for a specific student")
-def get_student_enrollments(
+async def get_student_enrollments(
+    response: Response,
     student_id: int = Path(..., title="The ID of the student"),
-    user_info: dict = Depends(get_current_user_info)
+    user_info: dict = Depends(get_current_user_info),
+    page: PageParams = Depends(page_params)
 ):
     """
     Retrieve enrollments for a specific student.
@@ -85,14 +157,17 @@ def get_student_enrollments(
     if requester_role == Role.student and requester_id != student_id:
         raise HTTPException(status_code=403, detail="You can only view your own enrollments")
     
-    if not db.get_user(student_id):
+    if not await adb.get_user(student_id):
         raise HTTPException(status_code=404, detail="Student not found")
         
-    return db.get_student_enrollments(student_id)
+    enrollments = await adb.get_student_enrollments(student_id, after_id=page.cursor, limit=page.fetch_limit)
+    return page.render(response, enrollments, Enrollment)
 
 @router.get("/enrollments", response_model=List[Enrollment], summary="Retrieve all enrollments (Admin only)")
-def get_all_enrollments(
-    user_info: dict = Depends(get_current_user_info)
+async def get_all_enrollments(
+    response: Response,
+    user_info: dict = Depends(get_current_user_info),
+    page: PageParams = Depends(page_params)
 ):
     """
     Admin only: Retrieve all enrollments.
@@ -100,12 +175,14 @@ def get_all_enrollments(
     if user_info["role"] != Role.admin:
         raise HTTPException(status_code=403, detail="Operation not permitted. Admins only.")
     
-    return db.enrollments
+    return page.render(response, await adb.list_enrollments(after_id=page.cursor, limit=page.fetch_limit), Enrollment)
 
 @router.get("/courses/{course_id}/enrollments", response_model=List[Enrollment], summary="Retrieve enrollments for a specific course (Admin only)")
-def get_course_enrollments(
+async def get_course_enrollments(
+    response: Response,
     course_id: int = Path(..., title="The ID of the course"),
-    user_info: dict = Depends(get_current_user_info)
+    user_info: dict = Depends(get_current_user_info),
+    page: PageParams = Depends(page_params)
 ):
     """
     Admin only: Retrieve enrollments for a specific course.
@@ -113,7 +190,70 @@ def get_course_enrollments(
     if user_info["role"] != Role.admin:
         raise HTTPException(status_code=403, detail="Operation not permitted. Admins only.")
     
-    if not db.get_course(course_id):
+    if not await adb.get_course(course_id):
         raise HTTPException(status_code=404, detail="Course not found")
 
-    return db.get_course_enrollments(course_id)
+    enrollments = await adb.get_course_enrollments(course_id, after_id=page.cursor, limit=page.fetch_limit)
+    return page.render(response, enrollments, Enrollment)
+
+@router.get("/courses/{course_id}/waitlist", response_model=List[WaitlistEntry], summary="Retrieve a course's waitlist (Admin only)")
+async def get_course_waitlist(
+    course_id: int = Path(..., title="The ID of the course"),
+    user_info: dict = Depends(get_current_user_info)
+):
+    """
+    Admin only: Retrieve the students waiting for a seat, first in line first.
+    """
+    if user_info["role"] != Role.admin:
+        raise HTTPException(status_code=403, detail="Operation not permitted. Admins only.")
+
+    if not await adb.get_course(course_id):
+        raise HTTPException(status_code=404, detail="Course not found")
+
+    return await adb.get_course_waitlist(course_id)
+
+@router.get("/waitlist/{entry_id}", response_model=WaitlistEntry, summary="Retrieve a waitlist entry")
+async def get_waitlist_entry(
+    entry_id: int = Path(..., title="The ID of the waitlist entry"),
+    user_info: dict = Depends(get_current_user_info)
+):
+    """
+    Student: Check their own place in the queue.
+    Admin: Check any entry.
+    """
+    entry = await adb.get_waitlist_entry(entry_id)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Waitlist entry not found")
+
+    if user_info["role"] == Role.student:
+        if entry.user_id != user_info["id"]:
+            raise HTTPException(status_code=403, detail="You can only view your own waitlist entries")
+    elif user_info["role"] != Role.admin:
+        raise HTTPException(status_code=403, detail="Operation not permitted")
+    return entry
+
+@router.delete("/waitlist/{entry_id}", status_code=204, summary="Leave a course's waitlist")
+async def leave_waitlist(
+    entry_id: int = Path(..., title="The ID of the waitlist entry"),
+    user_info: dict = Depends(get_current_user_info)
+):
+    """
+    Student: Leave a waitlist they joined.
+    Admin: Remove anyone from a waitlist.
+    """
+    entry = await adb.get_waitlist_entry(entry_id)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Waitlist entry not found")
+
+    if user_info["role"] == Role.student:
+        if entry.user_id != user_info["id"]:
+            raise HTTPException(status_code=403, detail="You can only leave your own waitlist entries")
+    elif user_info["role"] != Role.admin:
+        raise HTTPException(status_code=403, detail="Operation not permitted")
+
+    try:
+        await adb.delete_waitlist_entry(entry_id)
+    except NotFoundError:
+        # Promoted or removed since it was read
+        raise HTTPException(status_code=404, detail="Waitlist entry not found")
+    return
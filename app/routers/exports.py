@@ -0,0 +1,62 @@
+import zlib
+from typing import Iterable, Iterator
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from app.db import db
+from app.dependencies import require_admin
+
+router = APIRouter()
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Rows are encoded in batches so each chunk handed to the server is a few
+# hundred KB rather than one tiny write per row.
+ROWS_PER_CHUNK = 500
+
+def _ndjson(rows: Iterable[BaseModel]) -> Iterator[bytes]:
+    lines = []
+    for row in rows:
+        lines.append(row.model_dump_json())
+        if len(lines) == ROWS_PER_CHUNK:
+            yield ("\n".join(lines) + "\n").encode()
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode()
+
+def _gzip(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(wbits=31)  # 31 = gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def _stream(rows: Iterator[BaseModel], table: str, gzip: bool) -> StreamingResponse:
+    body = _ndjson(rows)
+    headers = {"Content-Disposition": f'attachment; filename="{table}.ndjson"'}
+    if gzip:
+        body = _gzip(body)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(body, media_type=NDJSON_MEDIA_TYPE, headers=headers)
+
+@router.get("/export/users", summary="Stream all users as NDJSON (Admin only)", dependencies=[Depends(require_admin)])
+def export_users(gzip: bool = Query(False, description="Gzip-compress the stream")):
+    """
+    Admin only: Stream every user, one JSON object per line, from a consistent snapshot.
+    """
+    return _stream(db.export_users(), "users", gzip)
+
+@router.get("/export/courses", summary="Stream all courses as NDJSON (Admin only)", dependencies=[Depends(require_admin)])
+def export_courses(gzip: bool = Query(False, description="Gzip-compress the stream")):
+    """
+    Admin only: Stream every course, one JSON object per line, from a consistent snapshot.
+    """
+    return _stream(db.export_courses(), "courses", gzip)
+
+@router.get("/export/enrollments", summary="Stream all enrollments as NDJSON (Admin only)", dependencies=[Depends(require_admin)])
+def export_enrollments(gzip: bool = Query(False, description="Gzip-compress the stream")):
+    """
+    Admin only: Stream every enrollment, one JSON object per line, from a consistent snapshot.
+    """
+    return _stream(db.export_enrollments(), "enrollments", gzip)
@@ -0,0 +1,63 @@
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
+from app.models import EnrollmentStats
+from app.db import db, adb
+from app.dependencies import require_admin
+from app.metrics import metrics, PROMETHEUS_MEDIA_TYPE
+from app.profiler import ProfilerBusyError, sample_stacks, collapsed
+
+router = APIRouter()
+
+@router.get("/metrics", summary="Request and storage metrics in the Prometheus text format", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Per-route request counts and latency histograms, storage call latencies
+    and table sizes, for a Prometheus scraper.
+    """
+    return PlainTextResponse(metrics.render(await adb.table_sizes()), media_type=PROMETHEUS_MEDIA_TYPE)
+
+@router.get(
+    "/admin/profile",
+    summary="Sample all thread stacks for a while (Admin only)",
+    response_class=PlainTextResponse,
+    dependencies=[Depends(require_admin)],
+)
+async def profile(
+    seconds: float = Query(5.0, gt=0, le=60, description="How long to sample"),
+    interval_ms: float = Query(5.0, ge=1, le=1000, description="Time between samples"),
+):
+    """
+    Admin only: Sample every thread's stack while the app keeps serving and
+    return the counts in the collapsed format (`frame;frame;frame count`
+    per line), ready for flamegraph.pl or speedscope.
+    """
+    try:
+        stacks = await run_in_threadpool(sample_stacks, seconds, interval_ms / 1000)
+    except ProfilerBusyError:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    return PlainTextResponse(collapsed(stacks))
+
+@router.get(
+    "/admin/stats",
+    response_model=EnrollmentStats,
+    summary="Enrollment counts, top courses and histograms (Admin only)",
+    dependencies=[Depends(require_admin)],
+)
+async def enrollment_stats(
+    top: int = Query(10, ge=0, le=1000, description="How many of the most enrolled courses to list"),
+    verify: bool = Query(False, description="Recount from the enrollments and check the counters against it"),
+):
+    """
+    Admin only: Enrollment totals, the most enrolled courses, and histograms
+    of course sizes and student loads. Read from counters kept up to date by
+    every enrollment write, so the cost does not grow with the number of
+    enrollments. `verify=true` recounts everything from the enrollments
+    instead (linear, for checking) and reports whether the counters agreed.
+    """
+    if verify:
+        # The recount is linear and, on the memory store, holds every
+        # enrollment lock while it copies the rows: keep it off the event
+        # loop whatever APP_STORAGE_EXECUTOR says
+        return await run_in_threadpool(db.enrollment_stats, top, verify)
+    return await adb.enrollment_stats(top, verify)
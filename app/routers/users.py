@@ -1,40 +1,106 @@
-from fastapi import APIRouter, HTTPException, Path, Body
-from typing import List
-from app.models import User, UserCreate, Role
-from app.db import db
+from fastapi import APIRouter, HTTPException, Path, Query, Body, Depends, Response
+from typing import List, Optional
+from app.auth import issue_token
+from app.config import settings
+from app.models import User, UserCreate, Role, BatchMode, BatchResult, Token, TokenRequest
+from app.db import adb, DuplicateError
+from app.dependencies import get_current_user_role, principal_cache
+from app.batch import MAX_BATCH_SIZE, batch_mode, batch_result
+from app.pagination import PageParams, page_params
+from app.responses import fast_json
+from app.idempotency import IDEMPOTENCY_KEY, idempotent
 from pydantic import EmailStr
 
 router = APIRouter()
 
 @router.post("/users", response_model=User, status_code=201, summary="Create a new user")
-def create_user(user: UserCreate):
+async def create_user(user: UserCreate, idempotency_key: Optional[str] = IDEMPOTENCY_KEY):
     """
     Create a new user with the following information:
     - **name**: Name of the user
     - **email**: Email address of the user
     - **role**: Role of the user (student or admin)
+
+    Retries sent with the same `Idempotency-Key` get the first answer replayed.
+    """
+    async def create():
+        try:
+            created = await adb.create_user(user)
+        except DuplicateError:
+            raise HTTPException(status_code=400, detail="Email already registered")
+        # IDs restart after a reset, so a cached token may still name this id
+        principal_cache.invalidate_user(created.id)
+        return created
+
+    return await idempotent(idempotency_key, ("users",), (user,), create, User, 201)
+
+@router.post("/users:batch", response_model=BatchResult, summary="Create many users at once")
+async def create_users_batch(
+    response: Response,
+    users: List[UserCreate] = Body(..., max_length=MAX_BATCH_SIZE),
+    mode: BatchMode = Depends(batch_mode)
+):
+    """
+    Create up to 5000 users in one request. Every item is reported as
+    `created` or `duplicate`; an atomic batch with any failure creates nothing
+    and answers 409.
     """
-    if db.get_user_by_email(user.email):
-        raise HTTPException(status_code=400, detail="Email already registered")
-    
-    new_user_id = len(db.users) + 1
-    new_user = User(id=new_user_id, **user.dict())
-    db.users.append(new_user)
-    return new_user
+    outcomes = await adb.create_users(users, atomic=mode == BatchMode.atomic)
+    for outcome in outcomes:
+        if isinstance(outcome, User):
+            principal_cache.invalidate_user(outcome.id)
+    return batch_result(response, mode, outcomes, lambda e: "Email already registered")
 
 @router.get("/users", response_model=List[User], summary="Retrieve all users")
-def get_users():
+async def get_users(response: Response, page: PageParams = Depends(page_params)):
+    """
+    Retrieve registered users, one page at a time.
     """
-    Retrieve a list of all registered users.
+    return page.render(response, await adb.list_users(after_id=page.cursor, limit=page.fetch_limit), User)
+
+@router.get("/users/search", response_model=List[User], summary="Search users by name or email")
+async def search_users(
+    response: Response,
+    name: Optional[str] = Query(None, min_length=1, description="Name prefix"),
+    email: Optional[str] = Query(None, min_length=1, description="Email prefix"),
+    page: PageParams = Depends(page_params),
+):
+    """
+    Users whose name and/or email start with the given prefixes, ignoring
+    case, in ID order and paginated like `GET /users`.
     """
-    return db.users
+    if name is None and email is None:
+        raise HTTPException(status_code=400, detail="Give at least one of name or email")
+    users = await adb.search_users(name_prefix=name, email_prefix=email, after_id=page.cursor, limit=page.fetch_limit)
+    return page.render(response, users, User)
 
 @router.get("/users/{user_id}", response_model=User, summary="Retrieve a user by ID")
-def get_user(user_id: int = Path(..., title="The ID of the user to get")):
+async def get_user(user_id: int = Path(..., title="The ID of the user to get")):
     """
     Retrieve a specific user by their ID.
     """
-    user = db.get_user(user_id)
+    user = await adb.get_user(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
+    return fast_json(user, User)
+
+@router.post("/users/{user_id}/tokens", response_model=Token, status_code=201, summary="Issue a bearer token for a user (Admin only)")
+async def create_token(
+    user_id: int = Path(..., title="The ID of the user the token identifies"),
+    request: Optional[TokenRequest] = Body(None),
+    role: str = Depends(get_current_user_role),
+):
+    """
+    Admin only: Sign a bearer token that identifies the user. Send it as
+    `Authorization: Bearer <token>`; the user's role is read from storage
+    when the token is first seen, not from the token itself.
+    """
+    if role != Role.admin:
+        raise HTTPException(status_code=403, detail="Operation not permitted. Admins only.")
+    if not settings.auth_secret:
+        raise HTTPException(status_code=503, detail="Token authentication is not configured")
+    if not await adb.get_user(user_id):
+        raise HTTPException(status_code=404, detail="User not found")
+    ttl = request.ttl_seconds if request and request.ttl_seconds else settings.auth_token_ttl
+    token, expires = issue_token(settings.auth_secret, user_id, ttl)
+    return Token(access_token=token, expires_at=expires)
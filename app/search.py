@@ -0,0 +1,154 @@
+import bisect
+import re
+from typing import Dict, List, Set, Tuple
+
+# Runs of letters and digits; "_" and punctuation separate words
+_WORD = re.compile(r"[^\W_]+")
+
+# Sorts after every character, so [prefix, prefix + _MAX_CHAR) is the range
+# of keys starting with prefix
+_MAX_CHAR = "\U0010ffff"
+
+def prefix_range(prefix: str) -> Tuple[str, str]:
+    """Bounds [low, high) of the strings starting with `prefix`, for range scans."""
+    return prefix, prefix + _MAX_CHAR
+
+def _fold(text: str) -> str:
+    folded = text.casefold()
+    # Reuse the stored string when folding changes nothing (most emails and codes)
+    return text if folded == text else folded
+
+def tokenize(text: str) -> List[str]:
+    """Case-folded words of `text`, in order, without duplicates."""
+    return list(dict.fromkeys(_WORD.findall(text.casefold())))
+
+def token_match(text: str, query: str) -> bool:
+    """
+    Search semantics shared by every backend: each query word must be the
+    start of some word of `text`, ignoring case ("lin alg" matches "Linear
+    Algebra").
+    """
+    words = _WORD.findall(text.casefold())
+    return all(any(word.startswith(term) for word in words) for term in tokenize(query))
+
+class PrefixIndex:
+    """
+    Case-folded keys kept in sorted order with a value (a row id) each, so
+    "values of keys starting with p" is a couple of binary searches plus the
+    size of the result.
+
+    Keys live in blocks of at most 2 * BLOCK entries, each with its largest
+    key in `_maxes`: an insert or delete shifts one block instead of the
+    whole index, so loading a million rows stays linear-ish.
+    """
+
+    BLOCK = 512
+
+    def __init__(self):
+        self._keys: List[List[str]] = []
+        self._values: List[list] = []
+        self._maxes: List[str] = []
+
+    def __len__(self) -> int:
+        return sum(len(keys) for keys in self._keys)
+
+    def add(self, key: str, value) -> None:
+        key = _fold(key)
+        if not self._maxes:
+            self._keys.append([key])
+            self._values.append([value])
+            self._maxes.append(key)
+            return
+        b = min(bisect.bisect_left(self._maxes, key), len(self._maxes) - 1)
+        keys, values = self._keys[b], self._values[b]
+        i = bisect.bisect_right(keys, key)
+        keys.insert(i, key)
+        values.insert(i, value)
+        self._maxes[b] = keys[-1]
+        if len(keys) > 2 * self.BLOCK:
+            self._keys[b:b + 1] = [keys[:self.BLOCK], keys[self.BLOCK:]]
+            self._values[b:b + 1] = [values[:self.BLOCK], values[self.BLOCK:]]
+            self._maxes[b:b + 1] = [keys[self.BLOCK - 1], keys[-1]]
+
+    def remove(self, key: str, value) -> None:
+        key = _fold(key)
+        # Equal keys can spill over into the following blocks
+        for b in range(bisect.bisect_left(self._maxes, key), len(self._maxes)):
+            keys, values = self._keys[b], self._values[b]
+            i = bisect.bisect_left(keys, key)
+            while i < len(keys) and keys[i] == key:
+                if values[i] == value:
+                    del keys[i]
+                    del values[i]
+                    if keys:
+                        self._maxes[b] = keys[-1]
+                    else:
+                        del self._keys[b], self._values[b], self._maxes[b]
+                    return
+                i += 1
+            if i < len(keys):
+                return
+
+    def values(self, prefix: str) -> list:
+        """Values of every key starting with `prefix`, in key order."""
+        low, high = prefix_range(_fold(prefix))
+        found = []
+        for b in range(bisect.bisect_left(self._maxes, low), len(self._maxes)):
+            keys = self._keys[b]
+            start = bisect.bisect_left(keys, low)
+            stop = bisect.bisect_left(keys, high, start)
+            found.extend(self._values[b][start:stop])
+            if stop < len(keys):
+                break
+        return found
+
+    def match(self, prefix: str) -> Set[int]:
+        return set(self.values(prefix))
+
+class TokenIndex:
+    """
+    Inverted index from each word of a text column to the ids of the rows
+    containing it, plus the sorted list of distinct words so a query word
+    expands to every indexed word it is a prefix of (see token_match).
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, Set[int]] = {}
+        self._words = PrefixIndex()
+
+    def add(self, text: str, row_id: int) -> None:
+        for word in tokenize(text):
+            ids = self._postings.get(word)
+            if ids is None:
+                ids = self._postings[word] = set()
+                self._words.add(word, word)
+            ids.add(row_id)
+
+    def remove(self, text: str, row_id: int) -> None:
+        for word in tokenize(text):
+            ids = self._postings[word]
+            ids.discard(row_id)
+            if not ids:
+                del self._postings[word]
+                self._words.remove(word, word)
+
+    def match(self, query: str) -> Set[int]:
+        candidates: List[Set[int]] = []
+        for term in tokenize(query):
+            words = self._words.values(term)
+            if len(words) == 1:
+                # The posting set itself: only read below, never modified
+                ids = self._postings[words[0]]
+            else:
+                ids = set().union(*(self._postings[word] for word in words))
+            if not ids:
+                return set()
+            candidates.append(ids)
+        if not candidates:
+            return set()
+        # Intersecting from the smallest set keeps every step as cheap as the result so far
+        candidates.sort(key=len)
+        result = set(candidates[0])
+        for ids in candidates[1:]:
+            result &= ids
+        return result
@@ -0,0 +1,754 @@
+import os
+import queue
+import sqlite3
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple, Union
+from urllib.request import pathname2url
+from app.models import User, UserCreate, Course, CourseCreate, CourseUpdate, Enrollment, EnrollmentCreate, WaitlistEntry, Role, EnrollmentStats
+from app.search import prefix_range, tokenize
+from app.stats import recomputed_stats, stats_from_counts
+from app.storage import Storage, IdempotencyLog, StorageError, NotFoundError, DuplicateError, CourseFullError, AbortedError
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL UNIQUE,
+    role TEXT NOT NULL,
+    -- Number of courses the user is enrolled in, kept like courses.enrolled
+    enrolled INTEGER NOT NULL DEFAULT 0,
+    -- str.casefold() of name and email, written with them, for searches
+    name_key TEXT NOT NULL DEFAULT '',
+    email_key TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS courses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT NOT NULL,
+    code TEXT NOT NULL UNIQUE,
+    capacity INTEGER,
+    -- Seat counter, kept in step with the enrollments table by every write
+    enrolled INTEGER NOT NULL DEFAULT 0,
+    -- The title's search words (app.search.tokenize), space-separated, for
+    -- the word index; str.casefold() of code, like users.name_key
+    title_key TEXT NOT NULL DEFAULT '',
+    code_key TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS enrollments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    course_id INTEGER NOT NULL REFERENCES courses(id) ON DELETE CASCADE,
+    UNIQUE (user_id, course_id)
+);
+-- Composite indexes so per-user/per-course pages seek straight to the cursor
+CREATE INDEX IF NOT EXISTS enrollments_course_id ON enrollments(course_id, id);
+CREATE INDEX IF NOT EXISTS enrollments_user_id ON enrollments(user_id, id);
+CREATE TABLE IF NOT EXISTS waitlist (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    course_id INTEGER NOT NULL REFERENCES courses(id) ON DELETE CASCADE,
+    UNIQUE (user_id, course_id)
+);
+-- Queue order per course is id order
+CREATE INDEX IF NOT EXISTS waitlist_course_id ON waitlist(course_id, id);
+-- Counters bumped in the same transaction as the writes they count, so every
+-- process sharing the file can tell when data it has cached changed
+CREATE TABLE IF NOT EXISTS change_counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+-- Requests that carried an Idempotency-Key (see app/idempotency.py): a claim
+-- while the first one runs (outcome NULL), then its encoded outcome
+CREATE TABLE IF NOT EXISTS idempotency (
+    scope TEXT NOT NULL,
+    key TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    outcome BLOB,
+    expires REAL NOT NULL,
+    PRIMARY KEY (scope, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idempotency_expires ON idempotency(expires);
+"""
+
+# Columns added to tables after their first release: (table, column, DDL,
+# statement backfilling existing rows)
+MIGRATIONS = [
+    ("courses", "capacity", "ALTER TABLE courses ADD COLUMN capacity INTEGER", None),
+    (
+        "courses", "enrolled", "ALTER TABLE courses ADD COLUMN enrolled INTEGER NOT NULL DEFAULT 0",
+        "UPDATE courses SET enrolled = (SELECT COUNT(*) FROM enrollments WHERE course_id = courses.id)",
+    ),
+    (
+        "users", "enrolled", "ALTER TABLE users ADD COLUMN enrolled INTEGER NOT NULL DEFAULT 0",
+        "UPDATE users SET enrolled = (SELECT COUNT(*) FROM enrollments WHERE user_id = users.id)",
+    ),
+    # Search keys (casefold() and search_words() are registered on every connection)
+    ("users", "name_key", "ALTER TABLE users ADD COLUMN name_key TEXT NOT NULL DEFAULT ''",
+     "UPDATE users SET name_key = casefold(name)"),
+    ("users", "email_key", "ALTER TABLE users ADD COLUMN email_key TEXT NOT NULL DEFAULT ''",
+     "UPDATE users SET email_key = casefold(email)"),
+    ("courses", "title_key", "ALTER TABLE courses ADD COLUMN title_key TEXT NOT NULL DEFAULT ''",
+     "UPDATE courses SET title_key = search_words(title)"),
+    ("courses", "code_key", "ALTER TABLE courses ADD COLUMN code_key TEXT NOT NULL DEFAULT ''",
+     "UPDATE courses SET code_key = casefold(code)"),
+]
+
+# Indexes on migrated columns, created once the migrations have run. The
+# enrolled ones serve enrollment_stats: the top courses are the first rows of
+# courses_enrolled, and the histograms group the counters, not the enrollments.
+# The key ones make prefix searches range scans, folding case exactly like
+# the memory store (COLLATE NOCASE, used before, only folds ASCII).
+MIGRATED_INDEXES = """
+CREATE INDEX IF NOT EXISTS courses_enrolled ON courses(enrolled DESC, id);
+CREATE INDEX IF NOT EXISTS users_enrolled ON users(enrolled);
+DROP INDEX IF EXISTS users_name_nocase;
+DROP INDEX IF EXISTS users_email_nocase;
+DROP INDEX IF EXISTS courses_code_nocase;
+CREATE INDEX IF NOT EXISTS users_name_key ON users(name_key);
+CREATE INDEX IF NOT EXISTS users_email_key ON users(email_key);
+CREATE INDEX IF NOT EXISTS courses_code_key ON courses(code_key);
+"""
+
+# Word index over the course titles, kept in step with the courses table by
+# the triggers (the text itself is only stored in courses). title_key holds
+# the words Python already split, so the ascii tokenizer, which only splits on
+# ASCII punctuation and spaces, keeps each as one token: both backends see the
+# same words. Replaces older versions that let FTS5 split the titles itself,
+# so it is (re)built under the write lock rather than with IF NOT EXISTS.
+TITLE_INDEX = [
+    "CREATE VIRTUAL TABLE courses_fts USING fts5("
+    "title_key, content='courses', content_rowid='id', tokenize='ascii')",
+    "CREATE TRIGGER courses_fts_insert AFTER INSERT ON courses BEGIN "
+    "INSERT INTO courses_fts(rowid, title_key) VALUES (new.id, new.title_key); END",
+    "CREATE TRIGGER courses_fts_delete AFTER DELETE ON courses BEGIN "
+    "INSERT INTO courses_fts(courses_fts, rowid, title_key) VALUES ('delete', old.id, old.title_key); END",
+    "CREATE TRIGGER courses_fts_update AFTER UPDATE OF title_key ON courses BEGIN "
+    "INSERT INTO courses_fts(courses_fts, rowid, title_key) VALUES ('delete', old.id, old.title_key); "
+    "INSERT INTO courses_fts(rowid, title_key) VALUES (new.id, new.title_key); END",
+    "INSERT INTO courses_fts(courses_fts) VALUES ('rebuild')",
+]
+
+COURSE_COLUMNS = "id, title, code, capacity"
+
+INSERT_USER = "INSERT INTO users (name, email, role, name_key, email_key) VALUES (?, ?, ?, ?, ?)"
+INSERT_COURSE = "INSERT INTO courses (title, code, capacity, title_key, code_key) VALUES (?, ?, ?, ?, ?)"
+
+CATALOG_CHANGED = (
+    "INSERT INTO change_counters (name, value) VALUES ('catalog', 1) "
+    "ON CONFLICT (name) DO UPDATE SET value = value + 1 RETURNING value"
+)
+
+# One waitlist entry with its place in the course's queue
+WAITLIST_ENTRY_SQL = (
+    "SELECT id, user_id, course_id, "
+    "(SELECT COUNT(*) FROM waitlist AS ahead WHERE ahead.course_id = waitlist.course_id AND ahead.id <= waitlist.id) "
+    "FROM waitlist WHERE id = ?"
+)
+
+EXPORT_BATCH_SIZE = 1000
+
+class ConnectionPool:
+    """
+    Fixed-size pool of connections to one database file. Each connection keeps
+    its own prepared-statement cache, so reusing connections also reuses the
+    compiled statements for the constant SQL below.
+    """
+
+    def __init__(self, path: str, size: int):
+        self._connections: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        for _ in range(size):
+            self._connections.put(self._connect(path))
+
+    @staticmethod
+    def _connect(path: str) -> sqlite3.Connection:
+        # Autocommit mode: transactions are opened explicitly with BEGIN
+        conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False, cached_statements=256)
+        # First, so that workers starting together wait for each other's
+        # schema changes instead of failing with "database is locked"
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL only fsyncs at checkpoints; committed data survives an
+        # application crash and can only be lost on power failure
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        # For the search-key backfills in MIGRATIONS
+        conn.create_function("casefold", 1, str.casefold, deterministic=True)
+        conn.create_function("search_words", 1, _search_words, deterministic=True)
+        return conn
+
+    @staticmethod
+    def connect_reader(path: str) -> sqlite3.Connection:
+        """A read-only connection outside the pool, for readers that may be slow to finish."""
+        conn = sqlite3.connect(
+            f"file:{pathname2url(os.path.abspath(path))}?mode=ro", uri=True,
+            isolation_level=None, check_same_thread=False,
+        )
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self._connections.get()
+        try:
+            yield conn
+        finally:
+            self._connections.put(conn)
+
+    def close(self) -> None:
+        while not self._connections.empty():
+            self._connections.get_nowait().close()
+
+def _limit(limit: Optional[int]) -> int:
+    # SQLite treats a negative LIMIT as "no limit"
+    return -1 if limit is None else limit
+
+def _prefix_filter(column: str, prefix: Optional[str]) -> Tuple[List[str], list]:
+    # `column` holds casefolded keys. Callers pin its index with INDEXED BY:
+    # left to itself the planner walks the whole table in id order to skip
+    # the sort, which is linear in the table size however few rows match
+    if prefix is None:
+        return [], []
+    return [f"{column} >= ?", f"{column} < ?"], list(prefix_range(prefix.casefold()))
+
+def _user_params(user: UserCreate) -> tuple:
+    return user.name, user.email, user.role.value, user.name.casefold(), user.email.casefold()
+
+def _course_params(course: CourseCreate) -> tuple:
+    return course.title, course.code, course.capacity, _search_words(course.title), course.code.casefold()
+
+def _search_words(text: str) -> str:
+    # What courses.title_key holds
+    return " ".join(tokenize(text))
+
+def _match_expression(query: str) -> str:
+    # Every word as a prefix token: "lin alg" -> "lin"* "alg"*
+    return " ".join(f'"{word}"*' for word in tokenize(query))
+
+def _user(row) -> User:
+    # Rows were validated on the way in, so skip re-validation on the way out
+    return User.model_construct(id=row[0], name=row[1], email=row[2], role=Role(row[3]))
+
+def _course(row) -> Course:
+    return Course.model_construct(id=row[0], title=row[1], code=row[2], capacity=row[3])
+
+def _enrollment(row) -> Enrollment:
+    return Enrollment.model_construct(id=row[0], user_id=row[1], course_id=row[2])
+
+def _waitlist_entry(row) -> WaitlistEntry:
+    return WaitlistEntry.model_construct(id=row[0], user_id=row[1], course_id=row[2], position=row[3])
+
+class _Rollback(Exception):
+    """Raised inside a transaction to roll back an atomic batch."""
+
+class SQLiteDB(Storage, IdempotencyLog):
+    """
+    Storage backed by a SQLite file in WAL mode, so several worker processes
+    can share one database: readers never block the single writer and see a
+    consistent snapshot. Writes run in `BEGIN IMMEDIATE` transactions, which
+    take the write lock up front so check-then-insert sequences are atomic
+    across processes; AUTOINCREMENT keeps IDs from ever being reused.
+    """
+
+    blocking = True
+    shared = True
+
+    def __init__(self, path: str, pool_size: int = 8):
+        self._path = path
+        self._pool = ConnectionPool(path, pool_size)
+        # Dedicated to catalog_version(), which runs on the event loop
+        self._watch = ConnectionPool._connect(path)
+        self._watch_lock = threading.Lock()
+        self._seen_data_version: Optional[int] = None
+        self._catalog_counter = 0
+        self._catalog_version = 0
+        # Counter values committed by this process but not yet seen by catalog_version()
+        self._own_catalog_changes: Set[int] = set()
+        with self._pool.connection() as conn:
+            conn.executescript(SCHEMA)
+            self._migrate(conn)
+            conn.executescript(MIGRATED_INDEXES)
+            self._index_titles(conn)
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection) -> None:
+        # Databases created before a column existed get it added (CREATE
+        # TABLE IF NOT EXISTS leaves their tables alone)
+        columns = lambda table: {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        for table, column, ddl, backfill in MIGRATIONS:
+            if column in columns(table):
+                continue
+            conn.execute("BEGIN IMMEDIATE")
+            # Another worker may have migrated while this one waited for the lock
+            if column not in columns(table):
+                conn.execute(ddl)
+                if backfill:
+                    conn.execute(backfill)
+            conn.execute("COMMIT")
+
+    @staticmethod
+    def _index_titles(conn: sqlite3.Connection) -> None:
+        def current():
+            row = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'courses_fts'").fetchone()
+            return row is not None and row[0] == TITLE_INDEX[0]
+
+        if current():
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        if not current():
+            for name in ("courses_fts_insert", "courses_fts_delete", "courses_fts_update"):
+                conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+            conn.execute("DROP TABLE IF EXISTS courses_fts")
+            # Older versions kept the folded title, not its words
+            conn.execute("UPDATE courses SET title_key = search_words(title)")
+            # Also indexes the courses written before the index existed
+            for statement in TITLE_INDEX:
+                conn.execute(statement)
+        conn.execute("COMMIT")
+
+    @contextmanager
+    def _transaction(self, catalog: bool = False) -> Iterator[sqlite3.Connection]:
+        """
+        Run the block in one write transaction. With `catalog`, the block
+        changes the courses and bumps the catalog counter on commit.
+        """
+        counter = None
+        with self._pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                if catalog:
+                    counter = conn.execute(CATALOG_CHANGED).fetchone()[0]
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        if counter is not None:
+            with self._watch_lock:
+                if counter > self._catalog_counter:
+                    self._own_catalog_changes.add(counter)
+
+    def _batch(self, items: list, atomic: bool, insert: Callable, catalog: bool = False) -> list:
+        """
+        Run `insert(conn, item)` for every item in one transaction. `insert`
+        returns the created row or a StorageError; a failed INSERT only rolls
+        back its own statement, so the rest of the batch is unaffected.
+        """
+        results: list = []
+        try:
+            with self._transaction(catalog) as conn:
+                results = [insert(conn, item) for item in items]
+                if atomic and any(isinstance(r, StorageError) for r in results):
+                    raise _Rollback()
+        except _Rollback:
+            return [r if isinstance(r, StorageError) else AbortedError() for r in results]
+        return results
+
+    def _fetch_one(self, sql: str, params=()):
+        with self._pool.connection() as conn:
+            return conn.execute(sql, params).fetchone()
+
+    def _fetch_all(self, sql: str, params=()) -> list:
+        with self._pool.connection() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def _export(self, sql: str, build) -> Iterator:
+        # A read transaction pins one WAL snapshot for the whole export while
+        # rows are fetched in batches, so memory stays flat and writers
+        # are never blocked. The export is only as fast as its client reads,
+        # so it gets its own connection: slow downloads never tie up the pool
+        # the other requests wait on.
+        conn = ConnectionPool.connect_reader(self._path)
+        try:
+            conn.execute("BEGIN")
+            cursor = conn.execute(sql)
+            while True:
+                rows = cursor.fetchmany(EXPORT_BATCH_SIZE)
+                if not rows:
+                    break
+                for row in rows:
+                    yield build(row)
+        finally:
+            conn.close()
+
+    def close(self) -> None:
+        self._pool.close()
+        self._watch.close()
+
+    def catalog_version(self) -> int:
+        # PRAGMA data_version changes whenever another connection, in this
+        # process or another, commits; it is answered from the shared WAL
+        # index, so the common "nothing happened" case costs microseconds.
+        with self._watch_lock:
+            data_version = self._watch.execute("PRAGMA data_version").fetchone()[0]
+            if data_version != self._seen_data_version:
+                self._seen_data_version = data_version
+                row = self._watch.execute("SELECT value FROM change_counters WHERE name = 'catalog'").fetchone()
+                counter = row[0] if row else 0
+                # Every bump since the last look came from this process, whose
+                # writers already invalidated what they touched
+                own = all(n in self._own_catalog_changes for n in range(self._catalog_counter + 1, counter + 1))
+                if counter != self._catalog_counter and not own:
+                    self._catalog_version = counter
+                self._catalog_counter = counter
+                self._own_catalog_changes = {n for n in self._own_catalog_changes if n > counter}
+            return self._catalog_version
+
+    def table_sizes(self) -> Dict[str, int]:
+        tables = ("users", "courses", "enrollments", "waitlist")
+        counts = self._fetch_one("SELECT " + ", ".join(f"(SELECT count(*) FROM {t})" for t in tables))
+        return dict(zip(tables, counts))
+
+    def reset(self) -> None:
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM waitlist")
+            conn.execute("DELETE FROM enrollments")
+            conn.execute("DELETE FROM courses")
+            conn.execute("DELETE FROM users")
+            conn.execute("DELETE FROM sqlite_sequence")
+            # Not recorded as this process's own change: nothing invalidates
+            # the catalog cache on a reset, so every process clears it
+            conn.execute(CATALOG_CHANGED)
+
+    # Users
+
+    def get_user(self, user_id: int) -> Optional[User]:
+        row = self._fetch_one("SELECT id, name, email, role FROM users WHERE id = ?", (user_id,))
+        return _user(row) if row else None
+
+    def get_user_by_email(self, email: str) -> Optional[User]:
+        row = self._fetch_one("SELECT id, name, email, role FROM users WHERE email = ?", (email,))
+        return _user(row) if row else None
+
+    def list_users(self, after_id: int = 0, limit: Optional[int] = None) -> List[User]:
+        rows = self._fetch_all(
+            "SELECT id, name, email, role FROM users WHERE id > ? ORDER BY id LIMIT ?", (after_id, _limit(limit))
+        )
+        return [_user(row) for row in rows]
+
+    def create_user(self, user_data: UserCreate) -> User:
+        try:
+            with self._transaction() as conn:
+                cursor = conn.execute(INSERT_USER, _user_params(user_data))
+        except sqlite3.IntegrityError:
+            raise DuplicateError("email")
+        return User.model_construct(id=cursor.lastrowid, **dict(user_data))
+
+    def create_users(self, items: List[UserCreate], atomic: bool = True) -> List[Union[User, StorageError]]:
+        def insert(conn, item):
+            try:
+                cursor = conn.execute(INSERT_USER, _user_params(item))
+            except sqlite3.IntegrityError:
+                return DuplicateError("email")
+            return User.model_construct(id=cursor.lastrowid, **dict(item))
+        return self._batch(items, atomic, insert)
+
+    def search_users(
+        self, name_prefix: Optional[str] = None, email_prefix: Optional[str] = None,
+        after_id: int = 0, limit: Optional[int] = None,
+    ) -> List[User]:
+        name_sql, name_params = _prefix_filter("name_key", name_prefix)
+        email_sql, email_params = _prefix_filter("email_key", email_prefix)
+        where = " AND ".join(["id > ?"] + name_sql + email_sql)
+        index = "users_name_key" if name_prefix is not None else "users_email_key"
+        rows = self._fetch_all(
+            f"SELECT id, name, email, role FROM users INDEXED BY {index} WHERE {where} ORDER BY id LIMIT ?",
+            [after_id] + name_params + email_params + [_limit(limit)],
+        )
+        return [_user(row) for row in rows]
+
+    def export_users(self) -> Iterator[User]:
+        return self._export("SELECT id, name, email, role FROM users ORDER BY id", _user)
+
+    # Courses
+
+    def get_course(self, course_id: int) -> Optional[Course]:
+        row = self._fetch_one(f"SELECT {COURSE_COLUMNS} FROM courses WHERE id = ?", (course_id,))
+        return _course(row) if row else None
+
+    def get_course_by_code(self, code: str) -> Optional[Course]:
+        row = self._fetch_one(f"SELECT {COURSE_COLUMNS} FROM courses WHERE code = ?", (code,))
+        return _course(row) if row else None
+
+    def list_courses(self, after_id: int = 0, limit: Optional[int] = None) -> List[Course]:
+        rows = self._fetch_all(
+            f"SELECT {COURSE_COLUMNS} FROM courses WHERE id > ? ORDER BY id LIMIT ?", (after_id, _limit(limit))
+        )
+        return [_course(row) for row in rows]
+
+    def create_course(self, course_data: CourseCreate) -> Course:
+        try:
+            with self._transaction(catalog=True) as conn:
+                cursor = conn.execute(INSERT_COURSE, _course_params(course_data))
+        except sqlite3.IntegrityError:
+            raise DuplicateError("code")
+        return Course.model_construct(id=cursor.lastrowid, **dict(course_data))
+
+    def create_courses(self, items: List[CourseCreate], atomic: bool = True) -> List[Union[Course, StorageError]]:
+        def insert(conn, item):
+            try:
+                cursor = conn.execute(INSERT_COURSE, _course_params(item))
+            except sqlite3.IntegrityError:
+                return DuplicateError("code")
+            return Course.model_construct(id=cursor.lastrowid, **dict(item))
+        return self._batch(items, atomic, insert, catalog=True)
+
+    def search_courses(
+        self, query: Optional[str] = None, code_prefix: Optional[str] = None,
+        after_id: int = 0, limit: Optional[int] = None,
+    ) -> List[Course]:
+        where, params = _prefix_filter("code_key", code_prefix)
+        source = "courses INDEXED BY courses_code_key"
+        if query is not None:
+            expression = _match_expression(query)
+            if not expression:
+                return []
+            where.append("id IN (SELECT rowid FROM courses_fts WHERE courses_fts MATCH ?)")
+            params.append(expression)
+            source = "courses"
+        rows = self._fetch_all(
+            f"SELECT {COURSE_COLUMNS} FROM {source} WHERE {' AND '.join(['id > ?'] + where)} ORDER BY id LIMIT ?",
+            [after_id] + params + [_limit(limit)],
+        )
+        return [_course(row) for row in rows]
+
+    def export_courses(self) -> Iterator[Course]:
+        return self._export(f"SELECT {COURSE_COLUMNS} FROM courses ORDER BY id", _course)
+
+    def update_course(self, course_id: int, course_data: CourseUpdate) -> Course:
+        try:
+            with self._transaction(catalog=True) as conn:
+                # An omitted capacity keeps the stored one
+                row = conn.execute(
+                    "UPDATE courses SET title = ?, code = ?, title_key = ?, code_key = ?, "
+                    "capacity = CASE WHEN ? THEN ? ELSE capacity END "
+                    f"WHERE id = ? RETURNING {COURSE_COLUMNS}",
+                    (course_data.title, course_data.code, _search_words(course_data.title), course_data.code.casefold(),
+                     "capacity" in course_data.model_fields_set, course_data.capacity, course_id),
+                ).fetchall()
+                if not row:
+                    raise NotFoundError("course")
+                row = row[0]
+                # A raised or removed capacity fills from the waitlist
+                self._promote(conn, course_id)
+        except sqlite3.IntegrityError:
+            raise DuplicateError("code")
+        return _course(row)
+
+    def delete_course(self, course_id: int) -> Course:
+        with self._transaction(catalog=True) as conn:
+            row = conn.execute(f"SELECT {COURSE_COLUMNS} FROM courses WHERE id = ?", (course_id,)).fetchone()
+            if row is None:
+                raise NotFoundError("course")
+            conn.execute(
+                "UPDATE users SET enrolled = enrolled - 1 WHERE id IN (SELECT user_id FROM enrollments WHERE course_id = ?)",
+                (course_id,),
+            )
+            # ON DELETE CASCADE removes the enrollments and waitlist through their course_id indexes
+            conn.execute("DELETE FROM courses WHERE id = ?", (course_id,))
+        return _course(row)
+
+    # Enrollments
+
+    def get_enrollment(self, enrollment_id: int) -> Optional[Enrollment]:
+        row = self._fetch_one("SELECT id, user_id, course_id FROM enrollments WHERE id = ?", (enrollment_id,))
+        return _enrollment(row) if row else None
+
+    def get_student_enrollments(self, student_id: int, after_id: int = 0, limit: Optional[int] = None) -> List[Enrollment]:
+        rows = self._fetch_all(
+            "SELECT id, user_id, course_id FROM enrollments WHERE user_id = ? AND id > ? ORDER BY id LIMIT ?",
+            (student_id, after_id, _limit(limit)),
+        )
+        return [_enrollment(row) for row in rows]
+
+    def get_course_enrollments(self, course_id: int, after_id: int = 0, limit: Optional[int] = None) -> List[Enrollment]:
+        rows = self._fetch_all(
+            "SELECT id, user_id, course_id FROM enrollments WHERE course_id = ? AND id > ? ORDER BY id LIMIT ?",
+            (course_id, after_id, _limit(limit)),
+        )
+        return [_enrollment(row) for row in rows]
+
+    def list_enrollments(self, after_id: int = 0, limit: Optional[int] = None) -> List[Enrollment]:
+        rows = self._fetch_all(
+            "SELECT id, user_id, course_id FROM enrollments WHERE id > ? ORDER BY id LIMIT ?", (after_id, _limit(limit))
+        )
+        return [_enrollment(row) for row in rows]
+
+    def is_enrolled(self, user_id: int, course_id: int) -> bool:
+        row = self._fetch_one("SELECT 1 FROM enrollments WHERE user_id = ? AND course_id = ?", (user_id, course_id))
+        return row is not None
+
+    def create_enrollment(self, enrollment_data: EnrollmentCreate, waitlist: bool = False) -> Union[Enrollment, WaitlistEntry]:
+        with self._transaction() as conn:
+            result = self._insert_enrollment(conn, enrollment_data)
+            if isinstance(result, CourseFullError) and waitlist:
+                result = self._insert_waitlist_entry(conn, enrollment_data)
+        if isinstance(result, StorageError):
+            raise result
+        return result
+
+    def create_enrollments(self, items: List[EnrollmentCreate], atomic: bool = True) -> List[Union[Enrollment, StorageError]]:
+        return self._batch(items, atomic, self._insert_enrollment)
+
+    @staticmethod
+    def _insert_enrollment(conn: sqlite3.Connection, item: EnrollmentCreate) -> Union[Enrollment, StorageError]:
+        # Runs inside BEGIN IMMEDIATE, so the seat check and the insert can't
+        # interleave with another writer
+        if conn.execute("SELECT 1 FROM users WHERE id = ?", (item.user_id,)).fetchone() is None:
+            return NotFoundError("user")
+        course = conn.execute("SELECT capacity, enrolled FROM courses WHERE id = ?", (item.course_id,)).fetchone()
+        if course is None:
+            return NotFoundError("course")
+        if conn.execute(
+            "SELECT 1 FROM enrollments WHERE user_id = ? AND course_id = ?", (item.user_id, item.course_id)
+        ).fetchone() is not None:
+            return DuplicateError("enrollment")
+        capacity, enrolled = course
+        if capacity is not None and enrolled >= capacity:
+            return CourseFullError()
+        cursor = conn.execute(
+            "INSERT INTO enrollments (user_id, course_id) VALUES (?, ?)", (item.user_id, item.course_id)
+        )
+        conn.execute("UPDATE courses SET enrolled = enrolled + 1 WHERE id = ?", (item.course_id,))
+        conn.execute("UPDATE users SET enrolled = enrolled + 1 WHERE id = ?", (item.user_id,))
+        return Enrollment.model_construct(id=cursor.lastrowid, user_id=item.user_id, course_id=item.course_id)
+
+    def export_enrollments(self) -> Iterator[Enrollment]:
+        return self._export("SELECT id, user_id, course_id FROM enrollments ORDER BY id", _enrollment)
+
+    def delete_enrollment(self, enrollment_id: int) -> Enrollment:
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT id, user_id, course_id FROM enrollments WHERE id = ?", (enrollment_id,)
+            ).fetchone()
+            if row is None:
+                raise NotFoundError("enrollment")
+            conn.execute("DELETE FROM enrollments WHERE id = ?", (enrollment_id,))
+            conn.execute("UPDATE courses SET enrolled = enrolled - 1 WHERE id = ?", (row[2],))
+            conn.execute("UPDATE users SET enrolled = enrolled - 1 WHERE id = ?", (row[1],))
+            self._promote(conn, row[2])
+        return _enrollment(row)
+
+    # Waitlist
+
+    def get_waitlist_entry(self, entry_id: int) -> Optional[WaitlistEntry]:
+        row = self._fetch_one(WAITLIST_ENTRY_SQL, (entry_id,))
+        return _waitlist_entry(row) if row else None
+
+    def get_course_waitlist(self, course_id: int) -> List[WaitlistEntry]:
+        rows = self._fetch_all("SELECT id, user_id, course_id FROM waitlist WHERE course_id = ? ORDER BY id", (course_id,))
+        return [_waitlist_entry(row + (position,)) for position, row in enumerate(rows, 1)]
+
+    def delete_waitlist_entry(self, entry_id: int) -> WaitlistEntry:
+        with self._transaction() as conn:
+            row = conn.execute(WAITLIST_ENTRY_SQL, (entry_id,)).fetchone()
+            if row is None:
+                raise NotFoundError("waitlist")
+            conn.execute("DELETE FROM waitlist WHERE id = ?", (entry_id,))
+        return _waitlist_entry(row)
+
+    @staticmethod
+    def _insert_waitlist_entry(conn: sqlite3.Connection, item: EnrollmentCreate) -> Union[WaitlistEntry, StorageError]:
+        try:
+            cursor = conn.execute("INSERT INTO waitlist (user_id, course_id) VALUES (?, ?)", (item.user_id, item.course_id))
+        except sqlite3.IntegrityError:
+            return DuplicateError("waitlist")
+        (position,) = conn.execute(
+            "SELECT COUNT(*) FROM waitlist WHERE course_id = ? AND id <= ?", (item.course_id, cursor.lastrowid)
+        ).fetchone()
+        return WaitlistEntry.model_construct(
+            id=cursor.lastrowid, user_id=item.user_id, course_id=item.course_id, position=position
+        )
+
+    def _promote(self, conn: sqlite3.Connection, course_id: int) -> None:
+        # Inside the caller's write transaction: move students from the front
+        # of the queue into free seats
+        while True:
+            entry = conn.execute(
+                "SELECT id, user_id FROM waitlist WHERE course_id = ? ORDER BY id LIMIT 1", (course_id,)
+            ).fetchone()
+            if entry is None:
+                return
+            result = self._insert_enrollment(conn, EnrollmentCreate.model_construct(user_id=entry[1], course_id=course_id))
+            if isinstance(result, (CourseFullError, NotFoundError)):
+                return
+            # Enrolled now, or a student who already holds a seat: either way
+            # the entry leaves the queue
+            conn.execute("DELETE FROM waitlist WHERE id = ?", (entry[0],))
+
+    # Statistics
+
+    def enrollment_stats(self, top: int = 10, verify: bool = False) -> EnrollmentStats:
+        with self._pool.connection() as conn:
+            # One read transaction, so every query sees the same snapshot
+            conn.execute("BEGIN")
+            try:
+                courses = conn.execute("SELECT COUNT(*) FROM courses").fetchone()[0]
+                if verify:
+                    return self._recount_stats(conn, courses, top)
+                return stats_from_counts(
+                    courses,
+                    conn.execute(
+                        "SELECT id, enrolled FROM courses WHERE enrolled > 0 ORDER BY enrolled DESC, id LIMIT ?", (top,)
+                    ).fetchall(),
+                    conn.execute(
+                        "SELECT enrolled, COUNT(*) FROM courses WHERE enrolled > 0 GROUP BY enrolled ORDER BY enrolled"
+                    ).fetchall(),
+                    conn.execute(
+                        "SELECT enrolled, COUNT(*) FROM users WHERE enrolled > 0 GROUP BY enrolled ORDER BY enrolled"
+                    ).fetchall(),
+                )
+            finally:
+                conn.execute("COMMIT")
+
+    @staticmethod
+    def _recount_stats(conn: sqlite3.Connection, courses: int, top: int) -> EnrollmentStats:
+        user_ids, course_ids = [], []
+        cursor = conn.execute("SELECT user_id, course_id FROM enrollments")
+        while True:
+            rows = cursor.fetchmany(EXPORT_BATCH_SIZE)
+            if not rows:
+                break
+            batch_users, batch_courses = zip(*rows)
+            user_ids.extend(batch_users)
+            course_ids.extend(batch_courses)
+        by_course, by_student = Counter(course_ids), Counter(user_ids)
+        stats = recomputed_stats(by_course, by_student, courses, top)
+        stats.verified = (
+            by_course == dict(conn.execute("SELECT id, enrolled FROM courses WHERE enrolled != 0"))
+            and by_student == dict(conn.execute("SELECT id, enrolled FROM users WHERE enrolled != 0"))
+        )
+        return stats
+
+    # Idempotency keys
+
+    def claim_request(
+        self, scope: str, key: str, fingerprint: str, expires: float, now: float
+    ) -> Optional[Tuple[str, Optional[bytes]]]:
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM idempotency WHERE expires <= ?", (now,))
+            row = conn.execute(
+                "SELECT fingerprint, outcome FROM idempotency WHERE scope = ? AND key = ?", (scope, key)
+            ).fetchone()
+            if row is not None:
+                return row
+            conn.execute(
+                "INSERT INTO idempotency (scope, key, fingerprint, expires) VALUES (?, ?, ?, ?)",
+                (scope, key, fingerprint, expires),
+            )
+        return None
+
+    def complete_request(self, scope: str, key: str, outcome: bytes, expires: float) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE idempotency SET outcome = ?, expires = ? WHERE scope = ? AND key = ?",
+                (outcome, expires, scope, key),
+            )
+
+    def release_request(self, scope: str, key: str) -> None:
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM idempotency WHERE scope = ? AND key = ? AND outcome IS NULL", (scope, key))
+
+    def clear_requests(self) -> None:
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM idempotency")
@@ -0,0 +1,156 @@
+import bisect
+import heapq
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Mapping, Tuple
+from app.models import EnrollmentStats, CourseEnrollmentCount, HistogramBucket
+
+class RankedCounter:
+    """
+    Positive counts per key, also grouped by value: each distinct count keeps
+    the keys that have it, and the distinct counts are kept sorted. Changing
+    a count by one moves its key between two neighbouring groups, so the k
+    largest counts are read in O(k) and the histogram of counts in
+    O(distinct counts), however many keys there are.
+
+    Keys with equal counts rank by key, ascending (course id, the order
+    SQLite's courses_enrolled index gives); only the last group top() reads
+    from is partly sorted, so that costs O(k log k + size of that group).
+    """
+
+    def __init__(self):
+        self._counts: Dict[int, int] = {}
+        self._keys_by_count: Dict[int, Dict[int, None]] = {}
+        self._levels: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def get(self, key: int) -> int:
+        return self._counts.get(key, 0)
+
+    def add(self, key: int, delta: int = 1) -> None:
+        old = self._counts.get(key, 0)
+        new = old + delta
+        if old:
+            self._unlink(key, old)
+        if new > 0:
+            self._counts[key] = new
+            self._link(key, new)
+        elif old:
+            del self._counts[key]
+
+    def update(self, counts: Mapping[int, int]) -> None:
+        for key, count in counts.items():
+            self.add(key, count)
+
+    def top(self, k: int) -> List[Tuple[int, int]]:
+        result: List[Tuple[int, int]] = []
+        for count in reversed(self._levels):
+            wanted = k - len(result)
+            if wanted <= 0:
+                break
+            keys = self._keys_by_count[count]
+            ranked = sorted(keys) if len(keys) <= wanted else heapq.nsmallest(wanted, keys)
+            result.extend((key, count) for key in ranked)
+        return result
+
+    def histogram(self) -> List[Tuple[int, int]]:
+        """(count, number of keys with that count), ascending."""
+        return [(count, len(self._keys_by_count[count])) for count in self._levels]
+
+    def as_dict(self) -> Dict[int, int]:
+        return dict(self._counts)
+
+    def _link(self, key: int, count: int) -> None:
+        keys = self._keys_by_count.get(count)
+        if keys is None:
+            keys = self._keys_by_count[count] = {}
+            bisect.insort(self._levels, count)
+        keys[key] = None
+
+    def _unlink(self, key: int, count: int) -> None:
+        keys = self._keys_by_count[count]
+        del keys[key]
+        if not keys:
+            del self._keys_by_count[count]
+            del self._levels[bisect.bisect_left(self._levels, count)]
+
+def _buckets(histogram: Iterable[Tuple[int, int]]) -> List[HistogramBucket]:
+    return [HistogramBucket.model_construct(value=value, count=count) for value, count in histogram]
+
+def stats_from_counts(
+    courses: int, top: List[Tuple[int, int]], course_sizes: List[Tuple[int, int]], student_loads: List[Tuple[int, int]],
+) -> EnrollmentStats:
+    """
+    Assemble EnrollmentStats from the top (course id, enrollments) pairs and
+    the (value, count) histograms of enrolled courses and students; the
+    totals follow from the histograms.
+    """
+    # Courses nobody is enrolled in have no counter
+    empty = courses - sum(count for _, count in course_sizes)
+    if empty:
+        course_sizes = [(0, empty)] + course_sizes
+    return EnrollmentStats.model_construct(
+        enrollments=sum(value * count for value, count in course_sizes),
+        courses=courses,
+        students=sum(count for _, count in student_loads),
+        top_courses=[CourseEnrollmentCount.model_construct(course_id=c, enrollments=n) for c, n in top],
+        course_sizes=_buckets(course_sizes),
+        student_loads=_buckets(student_loads),
+        verified=None,
+    )
+
+class EnrollmentCounters:
+    """
+    Enrollments per course and per student, updated by InMemoryDB with every
+    enrollment written or removed (including promotions and course-delete
+    cascades), so stats() never looks at the enrollments themselves.
+    """
+
+    def __init__(self):
+        # Writers hold different enrollment stripes, so the counters need their own lock
+        self._lock = threading.Lock()
+        self.by_course = RankedCounter()
+        self.by_student = RankedCounter()
+
+    def enrolled(self, user_id: int, course_id: int) -> None:
+        with self._lock:
+            self.by_course.add(course_id)
+            self.by_student.add(user_id)
+
+    def deregistered(self, user_id: int, course_id: int) -> None:
+        with self._lock:
+            self.by_course.add(course_id, -1)
+            self.by_student.add(user_id, -1)
+
+    def load(self, user_ids: List[int], course_ids: List[int]) -> None:
+        with self._lock:
+            self.by_course.update(Counter(course_ids))
+            self.by_student.update(Counter(user_ids))
+
+    def stats(self, courses: int, top: int) -> EnrollmentStats:
+        with self._lock:
+            return stats_from_counts(
+                courses, self.by_course.top(top), self.by_course.histogram(), self.by_student.histogram()
+            )
+
+    def snapshot(self) -> Tuple[Dict[int, int], Dict[int, int]]:
+        with self._lock:
+            return self.by_course.as_dict(), self.by_student.as_dict()
+
+def _rank(item: Tuple[int, int]) -> Tuple[int, int]:
+    # Most enrollments first, ties by course id
+    course_id, count = item
+    return -count, course_id
+
+def recomputed_stats(by_course: Counter, by_student: Counter, courses: int, top: int) -> EnrollmentStats:
+    """
+    The same statistics as EnrollmentCounters.stats(), from full recounts of
+    the enrollment columns (for verification): O(n log k) for the top
+    courses, O(n) for the histograms.
+    """
+    return stats_from_counts(
+        courses, heapq.nsmallest(top, by_course.items(), key=_rank),
+        sorted(Counter(by_course.values()).items()), sorted(Counter(by_student.values()).items()),
+    )
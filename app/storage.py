@@ -0,0 +1,245 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+from app.models import User, UserCreate, Course, CourseCreate, CourseUpdate, Enrollment, EnrollmentCreate, WaitlistEntry, EnrollmentStats
+
+class StorageError(Exception):
+    """Base class for errors raised by the storage layer."""
+
+class NotFoundError(StorageError):
+    """A referenced row does not exist. `entity` names the missing row's table."""
+    def __init__(self, entity: str):
+        super().__init__(f"{entity} not found")
+        self.entity = entity
+
+class DuplicateError(StorageError):
+    """An insert or update would violate a uniqueness rule. `field` names the rule."""
+    def __init__(self, field: str):
+        super().__init__(f"duplicate {field}")
+        self.field = field
+
+class CourseFullError(StorageError):
+    """The course has as many enrollments as its capacity allows."""
+    def __init__(self):
+        super().__init__("course is full")
+
+class AbortedError(StorageError):
+    """The item was valid, but its atomic batch was rolled back because of another item."""
+    def __init__(self):
+        super().__init__("batch aborted")
+
+class Storage(ABC):
+    """
+    Interface the routers use to reach the data, whatever holds it.
+
+    Implementations allocate IDs themselves, never reuse them, and check
+    uniqueness (email, course code, enrollment pair) and referenced rows
+    atomically with each write, raising NotFoundError / DuplicateError.
+
+    List methods return rows in ID order and support keyset pagination: at
+    most `limit` rows (all if None) whose ID is greater than `after_id`.
+
+    Batch create methods check every item in one pass and return one entry
+    per item, in order: the created row, or the StorageError it failed with
+    (duplicates within the batch itself count too). With `atomic=True` a
+    single failure writes nothing, and the valid items come back as
+    AbortedError; otherwise the valid items are committed.
+
+    Export methods iterate a whole table, in ID order, from a consistent
+    point-in-time snapshot taken no later than when the first row is read:
+    writes made while the iterator is being consumed are not seen, and no
+    row is half-updated.
+
+    A course with a `capacity` never holds more enrollments than that; the
+    seat check is atomic with the insert and uses a per-course count, never a
+    scan. Students who find a course full can join its FIFO waitlist, which is
+    promoted automatically whenever a seat frees up (a deregistration, or the
+    capacity being raised or removed). So while anyone is waiting the course
+    is full, and newcomers cannot jump the queue. Lowering a capacity below
+    the current count keeps the existing enrollments.
+
+    `blocking` tells callers on an event loop whether a call may wait on I/O
+    (see AsyncStorage); in-memory calls only ever wait on short-held locks.
+    """
+
+    blocking: bool = False
+
+    # Whether other processes may write the same data, so caches kept by
+    # this process must follow catalog_version()
+    shared: bool = False
+
+    @abstractmethod
+    def reset(self) -> None:
+        """Drop every row and restart the ID sequences."""
+
+    @abstractmethod
+    def table_sizes(self) -> Dict[str, int]:
+        """Row count of each table (users, courses, enrollments, waitlist), for monitoring."""
+
+    def close(self) -> None:
+        """Release files and connections at shutdown; nothing to do for a plain in-memory store."""
+
+    def catalog_version(self) -> int:
+        """
+        A number that changes whenever another process commits a change to
+        the courses (this process's writers invalidate the cache entries they
+        touch themselves); only `shared` backends need to provide one.
+        """
+        return 0
+
+    # Users
+
+    @abstractmethod
+    def get_user(self, user_id: int) -> Optional[User]: ...
+
+    @abstractmethod
+    def get_user_by_email(self, email: str) -> Optional[User]: ...
+
+    @abstractmethod
+    def list_users(self, after_id: int = 0, limit: Optional[int] = None) -> List[User]: ...
+
+    @abstractmethod
+    def create_user(self, user_data: UserCreate) -> User: ...
+
+    @abstractmethod
+    def create_users(self, items: List[UserCreate], atomic: bool = True) -> List[Union[User, StorageError]]: ...
+
+    @abstractmethod
+    def search_users(
+        self, name_prefix: Optional[str] = None, email_prefix: Optional[str] = None,
+        after_id: int = 0, limit: Optional[int] = None,
+    ) -> List[User]:
+        """
+        Users whose name and/or email start with the given prefixes, ignoring
+        case, paginated like list_users. Answered from an index, not a scan.
+        """
+
+    @abstractmethod
+    def export_users(self) -> Iterator[User]: ...
+
+    # Courses
+
+    @abstractmethod
+    def get_course(self, course_id: int) -> Optional[Course]: ...
+
+    @abstractmethod
+    def get_course_by_code(self, code: str) -> Optional[Course]: ...
+
+    @abstractmethod
+    def list_courses(self, after_id: int = 0, limit: Optional[int] = None) -> List[Course]: ...
+
+    @abstractmethod
+    def create_course(self, course_data: CourseCreate) -> Course: ...
+
+    @abstractmethod
+    def create_courses(self, items: List[CourseCreate], atomic: bool = True) -> List[Union[Course, StorageError]]: ...
+
+    @abstractmethod
+    def search_courses(
+        self, query: Optional[str] = None, code_prefix: Optional[str] = None,
+        after_id: int = 0, limit: Optional[int] = None,
+    ) -> List[Course]:
+        """
+        Courses whose title matches `query` (each word is the start of a title
+        word, ignoring case; see app.search.token_match) and/or whose code
+        starts with `code_prefix`, paginated like list_courses.
+        """
+
+    @abstractmethod
+    def export_courses(self) -> Iterator[Course]: ...
+
+    @abstractmethod
+    def update_course(self, course_id: int, course_data: CourseUpdate) -> Course:
+        """Replace a course's title and code, and its capacity only if `course_data` sets the field."""
+
+    @abstractmethod
+    def delete_course(self, course_id: int) -> Course:
+        """Delete a course and, with it, all of its enrollments and its waitlist."""
+
+    # Enrollments
+
+    @abstractmethod
+    def get_enrollment(self, enrollment_id: int) -> Optional[Enrollment]: ...
+
+    @abstractmethod
+    def get_student_enrollments(self, student_id: int, after_id: int = 0, limit: Optional[int] = None) -> List[Enrollment]: ...
+
+    @abstractmethod
+    def get_course_enrollments(self, course_id: int, after_id: int = 0, limit: Optional[int] = None) -> List[Enrollment]: ...
+
+    @abstractmethod
+    def list_enrollments(self, after_id: int = 0, limit: Optional[int] = None) -> List[Enrollment]: ...
+
+    @abstractmethod
+    def is_enrolled(self, user_id: int, course_id: int) -> bool: ...
+
+    @abstractmethod
+    def create_enrollment(self, enrollment_data: EnrollmentCreate, waitlist: bool = False) -> Union[Enrollment, WaitlistEntry]:
+        """
+        Enroll the student, or raise CourseFullError if there is no seat. With
+        `waitlist`, a full course queues the student instead and the
+        WaitlistEntry is returned. DuplicateError("waitlist") if already queued.
+        """
+
+    @abstractmethod
+    def create_enrollments(self, items: List[EnrollmentCreate], atomic: bool = True) -> List[Union[Enrollment, StorageError]]: ...
+
+    @abstractmethod
+    def export_enrollments(self) -> Iterator[Enrollment]: ...
+
+    @abstractmethod
+    def delete_enrollment(self, enrollment_id: int) -> Enrollment:
+        """Delete an enrollment and promote the head of the course's waitlist into the freed seat."""
+
+    # Waitlist
+
+    @abstractmethod
+    def get_waitlist_entry(self, entry_id: int) -> Optional[WaitlistEntry]: ...
+
+    @abstractmethod
+    def get_course_waitlist(self, course_id: int) -> List[WaitlistEntry]:
+        """The course's queue, first in line first."""
+
+    @abstractmethod
+    def delete_waitlist_entry(self, entry_id: int) -> WaitlistEntry: ...
+
+    # Statistics
+
+    @abstractmethod
+    def enrollment_stats(self, top: int = 10, verify: bool = False) -> EnrollmentStats:
+        """
+        Enrollment totals, the `top` most enrolled courses and histograms of
+        course sizes and student loads, read from counters kept up to date by
+        every enrollment write rather than from the enrollments. With
+        `verify`, everything is recounted from the enrollments instead and
+        `verified` says whether the counters agreed.
+        """
+
+class IdempotencyLog(ABC):
+    """
+    Idempotency keys kept where every worker process sees them, implemented
+    by the `shared` backends alongside Storage (see app/idempotency.py).
+    """
+
+    @abstractmethod
+    def claim_request(
+        self, scope: str, key: str, fingerprint: str, expires: float, now: float
+    ) -> Optional[Tuple[str, Optional[bytes]]]:
+        """
+        Atomically: drop entries whose `expires` is past `now`, then return
+        the (fingerprint, outcome) stored under (scope, key), or claim the key
+        until `expires` and return None. The outcome is None while the
+        claiming request still runs.
+        """
+
+    @abstractmethod
+    def complete_request(self, scope: str, key: str, outcome: bytes, expires: float) -> None:
+        """Store the encoded outcome of a claimed request, kept until `expires`."""
+
+    @abstractmethod
+    def release_request(self, scope: str, key: str) -> None:
+        """Drop a claim whose request failed without an outcome, so a retry runs again."""
+
+    @abstractmethod
+    def clear_requests(self) -> None:
+        """Forget every idempotency key."""
+
@@ -0,0 +1,57 @@
+"""
+Per-request cost of resolving the caller in get_current_user_info.
+
+Compares trusting the X-User-* headers, verifying a bearer token on every
+request (HMAC check plus user lookup, i.e. the cache disabled) and the
+principal cache hit that repeat callers get.
+
+    python -m benchmarks.bench_auth
+    python -m benchmarks.bench_auth --calls 500000
+"""
+import argparse
+import asyncio
+import time
+
+from app.auth import issue_token
+from app.config import settings
+from app.db import db
+from app.dependencies import get_current_user_info, principal_cache
+from app.models import UserCreate, Role
+
+SECRET = "bench-secret"
+
+
+async def per_call(calls: int, **headers) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        await get_current_user_info(**headers)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+async def run(calls: int) -> None:
+    user = db.create_user(UserCreate(name="Admin", email="admin@example.com", role=Role.admin))
+    bearer = f"Bearer {issue_token(SECRET, user.id, 3600)[0]}"
+
+    headers = await per_call(calls, authorization=None, x_user_role="admin", x_user_id=user.id)
+    print(f"trusted headers:           {headers:6.2f} µs")
+    principal_cache.max_entries = 0
+    uncached = await per_call(calls, authorization=bearer, x_user_role=None, x_user_id=None)
+    print(f"token, verified each time: {uncached:6.2f} µs")
+    principal_cache.max_entries = 10
+    cached = await per_call(calls, authorization=bearer, x_user_role=None, x_user_id=None)
+    print(f"token, cached principal:   {cached:6.2f} µs ({uncached / cached:.1f}x faster)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200_000)
+    args = parser.parse_args()
+    settings.auth_secret = SECRET
+    # Header callers are measured too, so keep trusting them alongside tokens
+    settings.auth_allow_headers = True
+    db.reset()
+    asyncio.run(run(args.calls))
+
+
+if __name__ == "__main__":
+    main()
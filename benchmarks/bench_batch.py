@@ -0,0 +1,84 @@
+"""
+Throughput of the batch create endpoints against one POST per row.
+
+Creates N users, N courses and N enrollments through the app in-process, first
+with individual requests and then with `:batch` requests, and prints rows/s
+for each.
+
+    python -m benchmarks.bench_batch
+    python -m benchmarks.bench_batch --rows 5000 --batch-size 1000
+"""
+import argparse
+import time
+
+from fastapi.testclient import TestClient
+
+from app.db import db
+from app.main import app
+
+ADMIN = {"X-User-Role": "admin", "X-User-Id": "1"}
+
+
+def _users(rows):
+    return [{"name": f"User {i}", "email": f"user{i}@example.com", "role": "student"} for i in range(rows)]
+
+
+def _courses(rows):
+    return [{"title": f"Course {i}", "code": f"C{i}"} for i in range(rows)]
+
+
+def _enrollments(rows):
+    return [{"user_id": i, "course_id": i} for i in range(1, rows + 1)]
+
+
+def _timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def run_individual(client: TestClient, rows: int) -> dict:
+    db.reset()
+    timings = {}
+    timings["users"] = _timed(lambda: [client.post("/users", json=u) for u in _users(rows)])
+    timings["courses"] = _timed(lambda: [client.post("/courses", json=c, headers=ADMIN) for c in _courses(rows)])
+    timings["enrollments"] = _timed(lambda: [
+        client.post("/enrollments", json=e, headers={"X-User-Role": "student", "X-User-Id": str(e["user_id"])})
+        for e in _enrollments(rows)
+    ])
+    return timings
+
+
+def run_batched(client: TestClient, rows: int, batch_size: int) -> dict:
+    db.reset()
+
+    def post_all(path, items, headers=None):
+        for start in range(0, len(items), batch_size):
+            response = client.post(path, json=items[start:start + batch_size], headers=headers)
+            assert response.json()["created"] == len(items[start:start + batch_size])
+
+    timings = {}
+    timings["users"] = _timed(lambda: post_all("/users:batch", _users(rows)))
+    timings["courses"] = _timed(lambda: post_all("/courses:batch", _courses(rows), ADMIN))
+    timings["enrollments"] = _timed(lambda: post_all("/enrollments:batch", _enrollments(rows), ADMIN))
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    client = TestClient(app)
+    individual = run_individual(client, args.rows)
+    batched = run_batched(client, args.rows, args.batch_size)
+    print(f"{'table':<12} {'individual rows/s':>18} {'batched rows/s':>16} {'speedup':>8}")
+    for table in individual:
+        single_rate = args.rows / individual[table]
+        batch_rate = args.rows / batched[table]
+        print(f"{table:<12} {single_rate:>18.0f} {batch_rate:>16.0f} {batch_rate / single_rate:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Registration-opening rush: thousands of parallel enrollments into one hot course.
+
+Seeds N students and one course with --capacity seats, then has --threads
+threads enroll every student at once (with waitlist=True), optionally while
+the same number of students enroll into --cold other courses. Checks that the
+hot course holds exactly `capacity` students and everyone else is queued in
+order, then deregisters a tenth of the class in parallel and checks that each
+freed seat went to the next in line. Prints throughput for each phase.
+
+    python -m benchmarks.bench_capacity
+    python -m benchmarks.bench_capacity --students 20000 --capacity 500 --backend sqlite
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.db import InMemoryDB
+from app.models import UserCreate, CourseCreate, EnrollmentCreate, WaitlistEntry, Role
+from app.storage import CourseFullError
+
+
+def make_storage(backend: str, tmp: str):
+    if backend == "sqlite":
+        from app.sqlite_db import SQLiteDB
+        return SQLiteDB(os.path.join(tmp, "bench.db"), pool_size=8)
+    return InMemoryDB()
+
+
+def rush(storage, items, threads: int) -> tuple:
+    def enroll(item):
+        try:
+            return storage.create_enrollment(item, waitlist=True)
+        except CourseFullError:
+            return None
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(enroll, items, chunksize=64))
+    return results, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=10_000)
+    parser.add_argument("--capacity", type=int, default=300)
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--cold", type=int, default=63, help="other courses enrolled into during the rush")
+    parser.add_argument("--backend", choices=["memory", "sqlite"], default="memory")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = make_storage(args.backend, tmp)
+        storage.create_users([
+            UserCreate.model_construct(name=f"S{i}", email=f"s{i}@example.com", role=Role.student)
+            for i in range(args.students)
+        ], atomic=False)
+        hot = storage.create_course(CourseCreate(title="Hot", code="HOT", capacity=args.capacity))
+        cold = [storage.create_course(CourseCreate(title=f"Cold {i}", code=f"COLD{i}")) for i in range(args.cold)]
+
+        items = [EnrollmentCreate.model_construct(user_id=i + 1, course_id=hot.id) for i in range(args.students)]
+        if cold:
+            # Interleave so the cold enrollments really run during the rush
+            cold_items = [EnrollmentCreate.model_construct(user_id=i + 1, course_id=cold[i % len(cold)].id)
+                          for i in range(args.students)]
+            items = [item for pair in zip(items, cold_items) for item in pair]
+        results, seconds = rush(storage, items, args.threads)
+
+        enrolled = storage.get_course_enrollments(hot.id)
+        waitlist = storage.get_course_waitlist(hot.id)
+        queued = sorted((r for r in results if isinstance(r, WaitlistEntry)), key=lambda e: e.id)
+        assert len(enrolled) == args.capacity, f"overbooked: {len(enrolled)} > {args.capacity}"
+        assert len(waitlist) == args.students - args.capacity
+        assert [e.id for e in waitlist] == [e.id for e in queued]
+        print(f"{args.backend} backend, {args.threads} threads, {args.students} students, {args.capacity} seats")
+        print(f"rush:        {len(items)} enrollments in {seconds:.2f}s "
+              f"({len(items) / seconds:,.0f}/s), hot course {len(enrolled)}/{args.capacity}, "
+              f"{len(waitlist)} waiting, {args.cold} cold courses")
+
+        leaving = enrolled[:max(args.capacity // 10, 1)]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            list(pool.map(lambda e: storage.delete_enrollment(e.id), leaving))
+        seconds = time.perf_counter() - start
+        promoted = {e.user_id for e in storage.get_course_enrollments(hot.id)}
+        assert len(promoted) == args.capacity
+        assert {e.user_id for e in queued[:len(leaving)]} <= promoted, "promotion skipped the queue order"
+        print(f"deregister:  {len(leaving)} seats freed and refilled from the waitlist in {seconds * 1000:.0f}ms "
+              f"({len(leaving) / seconds:,.0f}/s)")
+        print("no overbooking; waitlist promoted in order")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Cost of deleting a course as the enrollments table grows.
+
+Seeds N enrollments spread over many courses plus one course holding K of
+them, then times delete_course() on that course. The cascade only walks the
+course's own enrollments, so the time should track K and stay flat in N.
+
+    python -m benchmarks.bench_cascade
+    python -m benchmarks.bench_cascade --sizes 10000 1000000 --course-size 20000
+"""
+import argparse
+import time
+
+from app.db import InMemoryDB
+from app.models import CourseCreate, EnrollmentCreate, UserCreate
+
+BATCH = 5000
+
+
+def seed(storage: InMemoryDB, enrollments: int, course_size: int) -> int:
+    students = max(course_size, enrollments // 50)
+    courses = max(1, enrollments // students)
+    for start in range(0, students, BATCH):
+        storage.create_users([UserCreate(name=f"S{i}", email=f"s{i}@example.com", role="student")
+                              for i in range(start, min(students, start + BATCH))], atomic=False)
+    storage.create_courses([CourseCreate(title=f"Course {i}", code=f"C{i}") for i in range(courses + 1)], atomic=False)
+    doomed = courses + 1
+    # The doomed course's enrollments are interleaved with the rest, so they
+    # are spread over the whole id range
+    pairs = [(i % students + 1, i // students + 1) for i in range(enrollments)]
+    stride = max(1, enrollments // course_size)
+    for n, i in enumerate(range(0, enrollments, stride)[:course_size]):
+        pairs[i] = (n + 1, doomed)
+    for start in range(0, len(pairs), BATCH):
+        storage.create_enrollments([EnrollmentCreate(user_id=u, course_id=c) for u, c in pairs[start:start + BATCH]],
+                                   atomic=False)
+    return doomed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--course-size", type=int, default=20_000, help="enrollments in the deleted course")
+    args = parser.parse_args()
+    print(f"{'enrollments':>12} {'in course':>10} {'delete_course':>14}")
+    for size in args.sizes:
+        storage = InMemoryDB()
+        doomed = seed(storage, size, args.course_size)
+        in_course = len(storage.get_course_enrollments(doomed))
+        start = time.perf_counter()
+        storage.delete_course(doomed)
+        elapsed = time.perf_counter() - start
+        print(f"{size:>12} {in_course:>10} {elapsed * 1000:>11.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Repeat catalog reads with and without the response cache.
+
+Seeds N courses, then requests GET /courses?limit=100 and GET /courses/{id}
+repeatedly by calling the ASGI app directly (TestClient's own per-request cost
+would swamp the difference), once with APP_CATALOG_CACHE_SIZE=0, once with the
+cache on, and once revalidating with If-None-Match (304s).
+
+    python -m benchmarks.bench_catalog
+    python -m benchmarks.bench_catalog --courses 5000 --requests 5000
+"""
+import argparse
+import asyncio
+import time
+
+from app.cache import catalog_cache
+from app.db import db
+from app.main import app
+from app.models import CourseCreate
+
+
+def seed(courses: int) -> None:
+    db.reset()
+    catalog_cache.clear()
+    db.create_courses([CourseCreate.model_construct(title=f"Course {i}", code=f"C{i}") for i in range(courses)],
+                      atomic=False)
+
+
+async def get(url: str, etag: bytes = None) -> dict:
+    path, _, query = url.partition("?")
+    headers = [(b"if-none-match", etag)] if etag else []
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+             "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+             "query_string": query.encode(), "headers": headers, "client": ("bench", 1),
+             "server": ("bench", 80)}
+    start = {}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            start.update(status=message["status"], headers=dict(message["headers"]))
+
+    await app(scope, receive, send)
+    return start
+
+
+async def run(urls: list, requests: int, revalidate: bool = False) -> float:
+    etags = {}
+    for url in urls:
+        etags[url] = (await get(url))["headers"].get(b"etag")
+    start = time.perf_counter()
+    for i in range(requests):
+        url = urls[i % len(urls)]
+        await get(url, etags[url] if revalidate else None)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--courses", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=3000)
+    args = parser.parse_args()
+
+    seed(args.courses)
+    size = catalog_cache.max_entries
+    print(f"{'endpoint':<22} {'mode':<12} {'µs/request':>11}")
+    for name, urls in (("GET /courses", ["/courses?limit=100"]),
+                       ("GET /courses/{id}", [f"/courses/{i}" for i in range(1, 101)])):
+        for mode, cache_size, revalidate in (("uncached", 0, False), ("cached", size, False),
+                                             ("304", size, True)):
+            catalog_cache.max_entries = cache_size
+            catalog_cache.clear()
+            seconds = asyncio.run(run(urls, args.requests, revalidate))
+            print(f"{name:<22} {mode:<12} {seconds / args.requests * 1e6:>11.0f}")
+    catalog_cache.max_entries = size
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Lookup cost of InMemoryDB as the tables grow.
+
+Seeds users, courses and enrollments with N rows each and times the point
+lookups the routers use on every request. With the hash indexes the per-call
+cost should stay flat from 1k to 1M rows.
+
+    python -m benchmarks.bench_db_lookups
+    python -m benchmarks.bench_db_lookups --sizes 1000 10000 --number 50000
+    python -m benchmarks.bench_db_lookups --backend sqlite --sizes 1000 100000
+"""
+import argparse
+import os
+import random
+import tempfile
+import timeit
+
+from app.config import Settings
+from app.db import create_storage
+from app.storage import Storage
+from app.models import UserCreate, CourseCreate, EnrollmentCreate, Role
+
+
+def seed(db: Storage, rows: int) -> None:
+    db.reset()
+    for i in range(1, rows + 1):
+        db.create_user(UserCreate.model_construct(name=f"User {i}", email=f"user{i}@example.com", role=Role.student))
+        db.create_course(CourseCreate.model_construct(title=f"Course {i}", code=f"C{i}"))
+    for i in range(1, rows + 1):
+        # Enrollment i pairs user i with course (i % rows) + 1 so every pair is unique
+        db.create_enrollment(EnrollmentCreate.model_construct(user_id=i, course_id=(i % rows) + 1))
+
+
+def run(db: Storage, sizes, number: int) -> None:
+    print(f"{'rows':>10} " + " ".join(f"{name:>18}" for name, _ in _lookups(db, 1)))
+    for rows in sizes:
+        seed(db, rows)
+        timings = []
+        for _, stmt in _lookups(db, rows):
+            seconds = timeit.timeit(stmt, number=number)
+            timings.append(seconds / number * 1e9)
+        print(f"{rows:>10} " + " ".join(f"{ns:>15.0f} ns" for ns in timings))
+
+
+def _lookups(db: Storage, rows: int):
+    rng = random.Random(rows)
+    keys = [rng.randint(1, rows) for _ in range(1024)]
+    it = iter(range(1 << 62))
+
+    def key():
+        return keys[next(it) & 1023]
+
+    return [
+        ("get_user", lambda: db.get_user(key())),
+        ("get_user_by_email", lambda: db.get_user_by_email(f"user{key()}@example.com")),
+        ("get_course", lambda: db.get_course(key())),
+        ("get_course_by_code", lambda: db.get_course_by_code(f"C{key()}")),
+        ("get_enrollment", lambda: db.get_enrollment(key())),
+        ("is_enrolled", lambda: db.is_enrolled(key(), key())),
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--number", type=int, default=200_000, help="calls timed per lookup and size")
+    parser.add_argument("--backend", choices=["memory", "sqlite"], default="memory")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        config = Settings(storage_backend=args.backend, sqlite_path=os.path.join(tmp, "bench.db"))
+        run(create_storage(config), args.sizes, args.number)
+
+
+if __name__ == "__main__":
+    main()
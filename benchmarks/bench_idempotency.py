@@ -0,0 +1,87 @@
+"""
+Retry storm at registration opening, with and without Idempotency-Key.
+
+Each of --students students sends one POST /enrollments plus --retries
+copies of it at once (a client retrying on timeout), then the same number
+again after the first answer. Without a key every copy runs the full write
+path and all but one answer 400 "already enrolled"; with a key the copies
+in flight wait for the first, the later ones are replayed, and every
+student sees the original 201. Runs in-process through the ASGI app with
+the storage configured by APP_* (memory by default). Prints requests/s,
+storage write calls and the answers received.
+
+    python -m benchmarks.bench_idempotency
+    APP_STORAGE_BACKEND=sqlite APP_SQLITE_PATH=/tmp/bench.db python -m benchmarks.bench_idempotency --students 2000
+"""
+import argparse
+import asyncio
+import time
+from collections import Counter
+
+import httpx
+
+from app.db import db
+from app.idempotency import idempotency_store
+from app.main import app
+from app.models import CourseCreate, UserCreate, Role
+
+ADMIN = {"X-User-Role": "admin", "X-User-Id": "1"}
+
+
+async def storm(client: httpx.AsyncClient, students: int, retries: int, keyed: bool, course_id: int) -> Counter:
+    async def attempt(user_id: int) -> int:
+        headers = {"X-User-Role": "student", "X-User-Id": str(user_id)}
+        if keyed:
+            headers["Idempotency-Key"] = f"enroll-{user_id}-{course_id}"
+        response = await client.post("/enrollments", json={"user_id": user_id, "course_id": course_id}, headers=headers)
+        return response.status_code
+
+    async def student(user_id: int) -> list:
+        burst = await asyncio.gather(*(attempt(user_id) for _ in range(retries + 1)))
+        return burst + [await attempt(user_id) for _ in range(retries)]
+
+    statuses = Counter()
+    for codes in await asyncio.gather(*(student(user_id) for user_id in range(1, students + 1))):
+        statuses.update(codes)
+    return statuses
+
+
+async def run(students: int, retries: int) -> None:
+    db.reset()
+    idempotency_store.clear()
+    db.create_users([UserCreate(name=f"S{i}", email=f"s{i}@example.com", role=Role.student) for i in range(students)],
+                    atomic=False)
+    writes = Counter()
+    create_enrollment = db.create_enrollment
+
+    def counted(*args, **kwargs):
+        writes["calls"] += 1
+        return create_enrollment(*args, **kwargs)
+
+    db.create_enrollment = counted
+    requests = students * (2 * retries + 1)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for keyed in (False, True):
+            course = db.create_course(CourseCreate(title=f"Course {keyed}", code=f"C{int(keyed)}"))
+            writes.clear()
+            start = time.perf_counter()
+            statuses = await storm(client, students, retries, keyed, course.id)
+            elapsed = time.perf_counter() - start
+            answers = ", ".join(f"{count} x {status}" for status, count in sorted(statuses.items()))
+            print(f"{'with key' if keyed else 'no key':8}  {requests / elapsed:8.0f} req/s   "
+                  f"storage writes: {writes['calls']:6}   answers: {answers}")
+    del db.create_enrollment
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=5000)
+    parser.add_argument("--retries", type=int, default=4)
+    args = parser.parse_args()
+    print(f"{args.students} students, 1 request + {args.retries} concurrent + {args.retries} later retries each")
+    asyncio.run(run(args.students, args.retries))
+
+
+if __name__ == "__main__":
+    main()
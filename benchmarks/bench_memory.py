@@ -0,0 +1,81 @@
+"""
+Bytes per stored row, Pydantic models vs the compact __slots__ records.
+
+Part one allocates N rows of each kind and reports the traced bytes per row
+for the representation the store used before (Pydantic model instances) and
+the one it uses now (UserRow / CourseRow / EnrollmentRow). Part two seeds a
+whole InMemoryDB with N enrollments and reports the total per enrollment,
+indexes included.
+
+    python -m benchmarks.bench_memory
+    python -m benchmarks.bench_memory --rows 1000000
+"""
+import argparse
+import gc
+import tracemalloc
+
+from app.db import InMemoryDB, UserRow, CourseRow, EnrollmentRow
+from app.models import User, Course, Enrollment, Role, UserCreate, CourseCreate, EnrollmentCreate
+
+
+def traced_bytes(build) -> int:
+    gc.collect()
+    tracemalloc.start()
+    kept = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return size
+
+
+def rows_report(rows: int) -> None:
+    kinds = {
+        "user": (
+            lambda i: User.model_construct(id=i, name=f"User {i}", email=f"user{i}@example.com", role=Role.student),
+            lambda i: UserRow(i, f"User {i}", f"user{i}@example.com", Role.student),
+        ),
+        "course": (
+            lambda i: Course.model_construct(id=i, title=f"Course {i}", code=f"C{i}"),
+            lambda i: CourseRow(i, f"Course {i}", f"C{i}"),
+        ),
+        "enrollment": (
+            lambda i: Enrollment.model_construct(id=i, user_id=i * 7, course_id=i * 13),
+            lambda i: EnrollmentRow(i, i * 7, i * 13),
+        ),
+    }
+    print(f"{'row':<12} {'pydantic B/row':>15} {'slots B/row':>12} {'saved':>7}")
+    for name, (before, after) in kinds.items():
+        before_bytes = traced_bytes(lambda: [before(i) for i in range(rows)]) / rows
+        after_bytes = traced_bytes(lambda: [after(i) for i in range(rows)]) / rows
+        print(f"{name:<12} {before_bytes:>15.0f} {after_bytes:>12.0f} {1 - after_bytes / before_bytes:>6.0%}")
+
+
+def store_report(rows: int) -> None:
+    users = max(rows // 10, 1)
+    courses = max(rows // 100, 1)
+    db = InMemoryDB()
+    db.create_users([UserCreate.model_construct(name=f"U{i}", email=f"u{i}@example.com", role=Role.student)
+                     for i in range(users)], atomic=False)
+    db.create_courses([CourseCreate.model_construct(title=f"C{i}", code=f"C{i}") for i in range(courses)], atomic=False)
+    items = [EnrollmentCreate.model_construct(user_id=i % users + 1, course_id=i // users % courses + 1)
+             for i in range(rows)]
+
+    def seed():
+        for start in range(0, rows, 5000):
+            db.create_enrollments(items[start:start + 5000], atomic=False)
+        return db
+
+    size = traced_bytes(seed)
+    print(f"whole store: {size / rows:.0f} B per enrollment ({rows} enrollments, indexes included)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    args = parser.parse_args()
+    rows_report(args.rows)
+    store_report(args.rows)
+
+
+if __name__ == "__main__":
+    main()
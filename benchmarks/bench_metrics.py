@@ -0,0 +1,93 @@
+"""
+Per-request cost of the built-in instrumentation.
+
+Times a minimal ASGI endpoint with and without MetricsMiddleware, a storage
+read with and without the AsyncStorage timer, and a full GET /courses/{id}
+through the app (cache off, so it reaches storage) with and without both.
+
+    python -m benchmarks.bench_metrics
+    python -m benchmarks.bench_metrics --requests 200000
+"""
+import argparse
+import asyncio
+import time
+
+from app.async_storage import AsyncStorage, INLINE
+from app.cache import catalog_cache
+from app.db import db, adb
+from app.main import app
+from app.metrics import MetricsMiddleware, Metrics
+from app.models import CourseCreate
+
+
+class Route:
+    path = "/courses/{course_id}"
+
+
+async def endpoint(scope, receive, send):
+    scope["route"] = Route
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+def scope_for(path: str) -> dict:
+    return {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+            "query_string": b"", "headers": [], "client": ("bench", 1), "server": ("bench", 80)}
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+async def per_call(fn, requests: int) -> float:
+    for _ in range(min(requests, 1000)):
+        await fn()
+    start = time.perf_counter()
+    for _ in range(requests):
+        await fn()
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+async def run(requests: int) -> None:
+    scope = scope_for("/courses/1")
+    bare = await per_call(lambda: endpoint(dict(scope), receive, send), requests)
+    wrapped_app = MetricsMiddleware(endpoint, Metrics())
+    wrapped = await per_call(lambda: wrapped_app(dict(scope), receive, send), requests)
+    print(f"middleware:   {bare:6.2f} µs bare endpoint, {wrapped:6.2f} µs with metrics "
+          f"(+{wrapped - bare:.2f} µs/request)")
+
+    plain = AsyncStorage(db, INLINE, 1, timed=False)
+    timed = AsyncStorage(db, INLINE, 1, timed=True)
+    untimed_us = await per_call(lambda: plain.get_course(1), requests)
+    timed_us = await per_call(lambda: timed.get_course(1), requests)
+    print(f"storage call: {untimed_us:6.2f} µs untimed, {timed_us:6.2f} µs timed "
+          f"(+{timed_us - untimed_us:.2f} µs/call)")
+
+    full_app = lambda: app(dict(scope), receive, send)
+    with_metrics = await per_call(full_app, requests // 10)
+    # Strip the middleware and the storage timer: the stack is rebuilt on the next call
+    app.user_middleware = [m for m in app.user_middleware if m.cls is not MetricsMiddleware]
+    app.middleware_stack = None
+    adb._run = plain._run
+    without = await per_call(full_app, requests // 10)
+    print(f"GET /courses/{{id}}: {without:6.2f} µs without metrics, {with_metrics:6.2f} µs with "
+          f"(+{with_metrics - without:.2f} µs/request)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100_000)
+    args = parser.parse_args()
+    db.reset()
+    catalog_cache.max_entries = 0
+    db.create_course(CourseCreate(title="Algebra", code="MATH101"))
+    asyncio.run(run(args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Cost of GET /users with and without APP_FAST_RESPONSES.
+
+Seeds the store with N users, then walks every page of /users (limit=1000)
+through the app in-process, once with response_model validation and once with
+the pre-built serializers, and prints the time per page and rows/s.
+
+    python -m benchmarks.bench_responses
+    python -m benchmarks.bench_responses --rows 20000 --repeat 3
+"""
+import argparse
+import time
+
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.db import db
+from app.main import app
+from app.models import UserCreate, Role
+
+
+def seed(rows: int) -> None:
+    db.reset()
+    users = [
+        UserCreate.model_construct(name=f"User {i}", email=f"user{i}@example.com", role=Role.student)
+        for i in range(rows)
+    ]
+    for start in range(0, rows, 5000):
+        db.create_users(users[start:start + 5000], atomic=False)
+
+
+def walk(client: TestClient) -> tuple:
+    pages, cursor = 0, None
+    start = time.perf_counter()
+    while True:
+        url = "/users?limit=1000" + (f"&cursor={cursor}" if cursor else "")
+        response = client.get(url)
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return time.perf_counter() - start, pages, response.content
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3, help="best of N walks per mode")
+    args = parser.parse_args()
+
+    seed(args.rows)
+    client = TestClient(app)
+    results = {}
+    for fast in (False, True):
+        settings.fast_responses = fast
+        results[fast] = min((walk(client) for _ in range(args.repeat)), key=lambda r: r[0])
+    settings.fast_responses = False
+
+    assert results[False][2] == results[True][2], "fast mode changed the response body"
+    print(f"{'mode':<10} {'ms/page':>10} {'rows/s':>12}")
+    for fast, (seconds, pages, _) in results.items():
+        print(f"{'fast' if fast else 'validated':<10} {seconds / pages * 1000:>10.2f} {args.rows / seconds:>12.0f}")
+    print(f"speedup: {results[False][0] / results[True][0]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
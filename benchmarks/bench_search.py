@@ -0,0 +1,80 @@
+"""
+Index-backed search vs the client-side scan it replaces, as the catalog grows.
+
+For each catalog size, times search_courses (title words, code prefix) and
+search_users (name prefix) against filtering a full list_courses/list_users
+with the same match rules, on the in-memory store and on SQLite.
+
+    python -m benchmarks.bench_search
+    python -m benchmarks.bench_search --sizes 1000 10000 100000 --queries 200
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from app.db import InMemoryDB
+from app.models import CourseCreate, UserCreate
+from app.search import token_match
+from app.sqlite_db import SQLiteDB
+
+SUBJECTS = ["Algebra", "Biology", "Chemistry", "Databases", "Economics", "French", "Geometry", "History",
+            "Imaging", "Java", "Kinetics", "Logic", "Music", "Networks", "Optics", "Physics"]
+LEVELS = ["Intro to", "Advanced", "Applied", "Topics in", "Seminar on", "Foundations of"]
+
+
+def seed(storage, size: int) -> None:
+    rng = random.Random(size)
+    storage.create_courses([
+        CourseCreate(title=f"{rng.choice(LEVELS)} {rng.choice(SUBJECTS)} {i}", code=f"{SUBJECTS[i % 16][:4].upper()}{i}")
+        for i in range(size)
+    ], atomic=False)
+    storage.create_users([
+        UserCreate(name=f"{rng.choice(SUBJECTS)} Student{i}", email=f"s{i}@example.com", role="student")
+        for i in range(size)
+    ], atomic=False)
+
+
+def per_query(fn, queries: list) -> float:
+    start = time.perf_counter()
+    for query in queries:
+        fn(query)
+    return (time.perf_counter() - start) / len(queries) * 1e6
+
+
+def run(name: str, storage, size: int, count: int) -> None:
+    rng = random.Random(0)
+    seed(storage, size)
+    # Selective queries: a level word plus a row number prefix
+    titles = [f"{rng.choice(LEVELS).split()[0]} {rng.randrange(size)}" for _ in range(count)]
+    codes = [f"{SUBJECTS[rng.randrange(16)][:4]}{rng.randrange(size)}" for _ in range(count)]
+    names = [f"{rng.choice(SUBJECTS)[:3]}" for _ in range(count)]
+    scans = max(1, count // 20)
+
+    title_index = per_query(lambda q: storage.search_courses(query=q, limit=20), titles)
+    title_scan = per_query(lambda q: [c for c in storage.list_courses() if token_match(c.title, q)][:20], titles[:scans])
+    code_index = per_query(lambda q: storage.search_courses(code_prefix=q, limit=20), codes)
+    code_scan = per_query(
+        lambda q: [c for c in storage.list_courses() if c.code.casefold().startswith(q.casefold())][:20], codes[:scans]
+    )
+    name_index = per_query(lambda q: storage.search_users(name_prefix=q, limit=20), names)
+    print(f"{name:6} {size:>8} courses  title: {title_index:9.1f} µs index {title_scan:11.1f} µs scan   "
+          f"code: {code_index:7.1f} µs index {code_scan:11.1f} µs scan   user name: {name_index:9.1f} µs index")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    for size in args.sizes:
+        run("memory", InMemoryDB(), size, args.queries)
+        with tempfile.TemporaryDirectory() as directory:
+            sqlite = SQLiteDB(os.path.join(directory, "search.db"))
+            run("sqlite", sqlite, size, args.queries)
+            sqlite.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Enrollment statistics from the maintained counters vs a full recount.
+
+For each enrollment count, times enrollment_stats() (counters),
+enrollment_stats(verify=True) (recount from the enrollments) and the
+client-side way: paging through every enrollment and counting. Then
+measures what keeping the counters costs each enrollment write, on the
+memory store.
+
+    python -m benchmarks.bench_stats
+    python -m benchmarks.bench_stats --sizes 10000 100000 1000000 --backend sqlite
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+
+from app.db import InMemoryDB
+from app.models import CourseCreate, EnrollmentCreate, UserCreate
+from app.sqlite_db import SQLiteDB
+
+BATCH = 5000
+PAGE = 1000
+
+
+def seed(storage, enrollments: int) -> None:
+    # Course popularity is skewed, so the top-k and histograms are not trivial
+    rng = random.Random(enrollments)
+    courses = max(10, enrollments // 100)
+    students = max(10, enrollments // 5)
+    for start in range(0, students, BATCH):
+        storage.create_users([UserCreate(name=f"S{i}", email=f"s{i}@example.com", role="student")
+                              for i in range(start, min(students, start + BATCH))], atomic=False)
+    for start in range(0, courses, BATCH):
+        storage.create_courses([CourseCreate(title=f"Course {i}", code=f"C{i}")
+                                for i in range(start, min(courses, start + BATCH))], atomic=False)
+    pairs = set()
+    while len(pairs) < enrollments:
+        pairs.add((rng.randrange(students) + 1, min(courses, int(rng.paretovariate(1.2)))))
+    pairs = list(pairs)
+    for start in range(0, len(pairs), BATCH):
+        storage.create_enrollments([EnrollmentCreate(user_id=u, course_id=c) for u, c in pairs[start:start + BATCH]],
+                                   atomic=False)
+
+
+def client_side(storage) -> None:
+    by_course, by_student = Counter(), Counter()
+    cursor = 0
+    while True:
+        page = storage.list_enrollments(after_id=cursor, limit=PAGE)
+        if not page:
+            break
+        for enrollment in page:
+            by_course[enrollment.course_id] += 1
+            by_student[enrollment.user_id] += 1
+        cursor = page[-1].id
+    by_course.most_common(10)
+
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e3
+
+
+def run(name: str, storage, size: int) -> None:
+    seed(storage, size)
+    counters = timed(lambda: storage.enrollment_stats(top=10), 200)
+    stats = storage.enrollment_stats(top=10, verify=True)
+    assert stats.verified, "counters disagree with the recount"
+    recount = timed(lambda: storage.enrollment_stats(top=10, verify=True), 3)
+    listing = timed(lambda: client_side(storage), 1)
+    print(f"{name:6} {size:>9} enrollments  counters: {counters:8.3f} ms   recount: {recount:9.1f} ms   "
+          f"client-side paging: {listing:9.1f} ms")
+
+
+class NoCounters:
+    def enrolled(self, user_id, course_id):
+        pass
+
+    def deregistered(self, user_id, course_id):
+        pass
+
+
+def write_cost(enrollments: int) -> None:
+    for label, counted in (("without counters", False), ("with counters", True)):
+        storage = InMemoryDB()
+        if not counted:
+            storage._counters = NoCounters()
+        storage.create_users([UserCreate(name=f"S{i}", email=f"s{i}@example.com", role="student")
+                              for i in range(enrollments)], atomic=False)
+        course = storage.create_course(CourseCreate(title="Write", code="WRITE")).id
+        start = time.perf_counter()
+        for user_id in range(1, enrollments + 1):
+            storage.create_enrollment(EnrollmentCreate(user_id=user_id, course_id=course))
+        for enrollment in storage.get_course_enrollments(course):
+            storage.delete_enrollment(enrollment.id)
+        print(f"enroll + deregister {label:17}: {(time.perf_counter() - start) / enrollments * 1e6:6.2f} µs")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--backend", choices=["memory", "sqlite", "both"], default="both")
+    args = parser.parse_args()
+    for size in args.sizes:
+        if args.backend in ("memory", "both"):
+            run("memory", InMemoryDB(), size)
+        if args.backend in ("sqlite", "both"):
+            with tempfile.TemporaryDirectory() as directory:
+                sqlite = SQLiteDB(os.path.join(directory, "stats.db"))
+                run("sqlite", sqlite, size)
+                sqlite.close()
+    write_cost(50_000)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Cost of durability for the in-memory store (app/durable_db.py).
+
+Write throughput: --threads threads enroll --students students (one
+create_enrollment call each) into the plain InMemoryDB and into
+DurableMemoryDB with commit-time and interval fsyncs, reporting fsyncs per
+write to show the group commit at work.
+
+Restart time: bulk-loads --enrollments enrollments, then times a restart
+that replays the whole log and one that loads a snapshot.
+
+    python -m benchmarks.bench_wal
+    python -m benchmarks.bench_wal --enrollments 1000000 --dir /var/tmp/wal-bench
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.db import InMemoryDB
+from app.durable_db import DurableMemoryDB, SNAPSHOT_NAME
+from app.models import UserCreate, CourseCreate, EnrollmentCreate, Role
+
+COURSES = 100
+
+
+def seed(storage, students: int) -> None:
+    storage.create_users([
+        UserCreate.model_construct(name=f"S{i}", email=f"s{i}@example.com", role=Role.student)
+        for i in range(students)
+    ], atomic=False)
+    storage.create_courses([CourseCreate.model_construct(title=f"C{i}", code=f"C{i}", capacity=None)
+                            for i in range(COURSES)], atomic=False)
+
+
+def write_throughput(name: str, storage, students: int, threads: int) -> None:
+    seed(storage, students)
+    items = [EnrollmentCreate.model_construct(user_id=i + 1, course_id=i % COURSES + 1) for i in range(students)]
+    wal = getattr(storage, "_wal", None)
+    syncs = wal.syncs if wal else 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(storage.create_enrollment, items, chunksize=16))
+    seconds = time.perf_counter() - start
+    fsyncs = f", {(wal.syncs - syncs) / len(items):.3f} fsyncs/write" if wal else ""
+    print(f"  {name:<18} {len(items) / seconds:>9,.0f} writes/s{fsyncs}")
+
+
+def restart(directory: str, enrollments: int) -> None:
+    students = max(enrollments // 10, 1)
+    db = DurableMemoryDB(directory, sync_commit=False, snapshot_bytes=1 << 62)
+    seed(db, students)
+    start = time.perf_counter()
+    batch = 5000
+    # Ten distinct courses per student
+    items = (EnrollmentCreate.model_construct(user_id=i // 10 + 1, course_id=(i // 10 % 10) * 10 + i % 10 + 1)
+             for i in range(enrollments))
+    while True:
+        chunk = [item for _, item in zip(range(batch), items)]
+        if not chunk:
+            break
+        db.create_enrollments(chunk, atomic=False)
+    print(f"  loaded {len(db.enrollments):,} enrollments ({students:,} users) through the log "
+          f"in {time.perf_counter() - start:.1f}s")
+    # Simulated crash: flush the log but skip the shutdown snapshot
+    db._stop.set()
+    db._wal.close()
+    log_bytes = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory))
+
+    start = time.perf_counter()
+    db = DurableMemoryDB(directory, sync_commit=False)
+    replay = time.perf_counter() - start
+    print(f"  restart from log:      {replay:.2f}s ({log_bytes / 2**20:.0f} MiB of log)")
+
+    start = time.perf_counter()
+    db.close()
+    print(f"  snapshot write:        {time.perf_counter() - start:.2f}s "
+          f"({os.path.getsize(os.path.join(directory, SNAPSHOT_NAME)) / 2**20:.0f} MiB)")
+    start = time.perf_counter()
+    db = DurableMemoryDB(directory, sync_commit=False)
+    print(f"  restart from snapshot: {time.perf_counter() - start:.2f}s ({len(db.enrollments):,} enrollments)")
+    db.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=20_000)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--enrollments", type=int, default=1_000_000)
+    parser.add_argument("--dir", help="where to put the log (default: a temporary directory)")
+    args = parser.parse_args()
+
+    root = args.dir or tempfile.mkdtemp(prefix="wal-bench-")
+    try:
+        print(f"write throughput, {args.threads} threads:")
+        write_throughput("memory only", InMemoryDB(), args.students, args.threads)
+        for name, sync_commit in (("wal, commit sync", True), ("wal, interval sync", False)):
+            directory = os.path.join(root, name.replace(", ", "-").replace(" ", "-"))
+            db = DurableMemoryDB(directory, sync_commit=sync_commit)
+            write_throughput(name, db, args.students, args.threads)
+            db.close()
+        print(f"restart with {args.enrollments:,} enrollments:")
+        restart(os.path.join(root, "restart"), args.enrollments)
+    finally:
+        if not args.dir:
+            shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Read throughput as uvicorn workers are added, on the shared SQLite store.
+
+For each worker count, starts the app with WEB_CONCURRENCY=N over one SQLite
+file, seeds it over HTTP, runs the load_test read mix for --duration seconds
+and prints requests/s, p50/p99 latency and the speedup over one worker.
+Each worker is its own process with its own GIL, so throughput can only grow
+with the cores the server has to itself: run the load generator on other
+cores (or another machine) and keep N at or below the server's cores.
+
+    python -m benchmarks.bench_workers
+    python -m benchmarks.bench_workers --workers 1 2 4 8 --clients 1000 --duration 20
+"""
+import argparse
+import os
+import tempfile
+
+from benchmarks.load_test import measure, seed, start_server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--procs", type=int, default=2, help="load generator processes")
+    parser.add_argument("--mode", default="threadpool", help="APP_STORAGE_EXECUTOR")
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs, {args.clients} clients, {args.duration:.0f}s per worker count")
+    print(f"{'workers':>7} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7} {'speedup':>8}")
+    single = None
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as tmp:
+            server = start_server(args.port, args.mode, "sqlite", os.path.join(tmp, "workers.db"), workers)
+            try:
+                seed(f"http://127.0.0.1:{args.port}")
+                rps, p50, p99, errors = measure(args.port, args.clients, args.duration, args.procs)
+            finally:
+                server.terminate()
+                server.wait()
+        single = single or rps
+        print(f"{workers:>7} {rps:>9.0f} {p50:>9.1f} {p99:>9.1f} {errors:>7} {rps / single:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
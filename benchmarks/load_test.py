@@ -0,0 +1,168 @@
+"""
+Throughput and tail latency at high concurrency, threadpool vs async storage calls.
+
+For each APP_STORAGE_EXECUTOR mode, starts the app under uvicorn (one
+worker), seeds it over HTTP, then runs --clients concurrent keep-alive
+connections for --duration seconds, spread over --procs load processes (give
+the server its own core for numbers that mean anything). Each client loops over
+a read-heavy mix: user lookups, enrollment pages, course pages and details.
+Prints requests/s and p50/p99 latency per mode.
+
+    python -m benchmarks.load_test
+    python -m benchmarks.load_test --clients 1000 --duration 20 --backend sqlite
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+USERS = 2000
+COURSES = 200
+ADMIN = {"X-User-Role": "admin", "X-User-Id": "1"}
+
+
+def start_server(port: int, mode: str, backend: str, db_path: str, workers: int = 1) -> subprocess.Popen:
+    # WEB_CONCURRENCY sets both uvicorn's worker count and APP_WORKERS
+    env = dict(os.environ, APP_STORAGE_EXECUTOR=mode, APP_STORAGE_BACKEND=backend, APP_SQLITE_PATH=db_path,
+               WEB_CONCURRENCY=str(workers))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+         "--log-level", "warning", "--no-access-log", "--backlog", "4096"],
+        env=env,
+    )
+    deadline = time.time() + 20
+    while time.time() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/courses", timeout=1)
+            return server
+        except httpx.TransportError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError("server did not start")
+
+
+def seed(base: str) -> None:
+    with httpx.Client(base_url=base, timeout=60) as client:
+        client.post("/users:batch", json=[
+            {"name": f"User {i}", "email": f"user{i}@example.com", "role": "student"} for i in range(USERS)
+        ]).raise_for_status()
+        client.post("/courses:batch", headers=ADMIN, json=[
+            {"title": f"Course {i}", "code": f"C{i}"} for i in range(COURSES)
+        ]).raise_for_status()
+        enrollments = [
+            {"user_id": u, "course_id": c} for u in range(1, USERS + 1) for c in random.sample(range(1, COURSES + 1), 3)
+        ]
+        for start in range(0, len(enrollments), 5000):
+            client.post("/enrollments:batch", headers=ADMIN, json=enrollments[start:start + 5000]).raise_for_status()
+
+
+def request_mix(rng: random.Random) -> tuple:
+    user_id = rng.randint(1, USERS)
+    pick = rng.random()
+    if pick < 0.4:
+        return f"/users/{user_id}", None
+    if pick < 0.7:
+        return f"/students/{user_id}/enrollments", {"X-User-Role": "student", "X-User-Id": str(user_id)}
+    if pick < 0.85:
+        return f"/courses?limit=20&cursor={rng.randint(0, COURSES - 20)}", None
+    return f"/courses/{rng.randint(1, COURSES)}", None
+
+
+async def get(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, url: str, headers: dict) -> int:
+    # Bare HTTP/1.1 keep-alive GET: a full client library costs more CPU per
+    # request than the handlers being measured
+    extra = "".join(f"{k}: {v}\r\n" for k, v in (headers or {}).items())
+    writer.write(f"GET {url} HTTP/1.1\r\nHost: bench\r\n{extra}\r\n".encode())
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line == b"\r\n":
+            break
+        name, _, value = line.partition(b":")
+        if name.lower() == b"content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def client_loop(port: int, deadline: float, seed_value: int, latencies: list, errors: list):
+    rng = random.Random(seed_value)
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        while time.perf_counter() < deadline:
+            url, headers = request_mix(rng)
+            start = time.perf_counter()
+            status = await get(reader, writer, url, headers)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+def load_process(port: int, clients: int, duration: float, proc: int, results) -> None:
+    async def run():
+        latencies, errors = [], []
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(
+            client_loop(port, deadline, proc * 100_000 + i, latencies, errors) for i in range(clients)
+        ))
+        return latencies, errors
+
+    results.put(asyncio.run(run()))
+
+
+def measure(port: int, clients: int, duration: float, procs: int) -> tuple:
+    results = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(target=load_process, args=(port, clients // procs + (i < clients % procs), duration, i, results))
+        for i in range(procs)
+    ]
+    for worker in workers:
+        worker.start()
+    latencies, errors = [], []
+    for _ in workers:
+        lat, err = results.get()
+        latencies.extend(lat)
+        errors.extend(err)
+    for worker in workers:
+        worker.join()
+    latencies.sort()
+    percentile = lambda p: latencies[min(int(p * len(latencies)), len(latencies) - 1)] * 1000 if latencies else 0.0
+    return len(latencies) / duration, percentile(0.5), percentile(0.99), len(errors)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--procs", type=int, default=2, help="load generator processes")
+    parser.add_argument("--backend", choices=["memory", "sqlite"], default="memory")
+    parser.add_argument("--modes", nargs="+", default=["threadpool", "inline"])
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    print(f"{args.backend} backend, {args.clients} clients, {args.duration:.0f}s per mode")
+    print(f"{'mode':<12} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for mode in args.modes:
+        with tempfile.TemporaryDirectory() as tmp:
+            server = start_server(args.port, mode, args.backend, os.path.join(tmp, "load.db"))
+            try:
+                seed(f"http://127.0.0.1:{args.port}")
+                rps, p50, p99, errors = measure(args.port, args.clients, args.duration, args.procs)
+            finally:
+                server.terminate()
+                server.wait()
+        print(f"{mode:<12} {rps:>9.0f} {p50:>9.1f} {p99:>9.1f} {errors:>7}")
+
+
+if __name__ == "__main__":
+    main()
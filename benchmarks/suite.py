@@ -0,0 +1,410 @@
+"""
+Reproducible benchmark of every core route, with baseline comparison.
+
+Seeds --users users, --courses courses and --enrollments enrollments through
+the batch endpoints, then runs each scenario below for --requests requests
+over --concurrency keep-alive clients, in order (later scenarios use the rows
+earlier ones created). The request sequence is fixed by --seed, so two runs
+send exactly the same requests.
+
+    --target inprocess   call the ASGI app directly, no sockets (default)
+    --target uvicorn     start `uvicorn app.main:app` and talk HTTP/1.1 to it
+
+Reports throughput, p50/p90/p99/max latency and errors per scenario plus the
+server's resident memory, optionally writes them as JSON (--output) and
+compares them with a stored run (--baseline). The whole suite runs --repeat
+times against a fresh store and each figure is the median over the runs, as
+single sub-millisecond p99s swing with every GC pause. A scenario regresses
+when its throughput drops by more than --tolerance or its p99 rises by more
+than --latency-tolerance; the exit status is then 1, so CI can gate on it.
+Baselines are only comparable on the same machine and target.
+
+    python -m benchmarks.suite
+    python -m benchmarks.suite --target uvicorn --backend sqlite --output run.json
+    python -m benchmarks.suite --baseline benchmarks/baseline.json
+    python -m benchmarks.suite --output benchmarks/baseline.json   # refresh the baseline
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+ADMIN = {"X-User-Role": "admin", "X-User-Id": "1"}
+BATCH_LIMIT = 5000
+
+Request = Tuple[str, str, Optional[dict], Optional[bytes]]  # method, path, headers, JSON body
+
+
+def student(user_id: int) -> dict:
+    return {"X-User-Role": "student", "X-User-Id": str(user_id)}
+
+
+class InProcessClient:
+    """Calls the ASGI app directly: measures the app without any socket or HTTP parsing cost."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def request(self, method: str, path: str, headers: Optional[dict], body: Optional[bytes]) -> Tuple[int, bytes]:
+        path, _, query = path.partition("?")
+        raw_headers = [(k.lower().encode(), str(v).encode()) for k, v in (headers or {}).items()]
+        if body is not None:
+            raw_headers += [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+                 "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+                 "query_string": query.encode(), "headers": raw_headers, "client": ("bench", 1),
+                 "server": ("bench", 80)}
+        status, chunks = 0, []
+
+        async def receive():
+            return {"type": "http.request", "body": body or b"", "more_body": False}
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, receive, send)
+        return status, b"".join(chunks)
+
+    async def close(self) -> None:
+        pass
+
+
+class HttpClient:
+    """One bare HTTP/1.1 keep-alive connection; a full client library costs more CPU than the handlers."""
+
+    def __init__(self, port: int):
+        self.port = port
+        self.reader = self.writer = None
+
+    async def request(self, method: str, path: str, headers: Optional[dict], body: Optional[bytes]) -> Tuple[int, bytes]:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection("127.0.0.1", self.port)
+        extra = "".join(f"{k}: {v}\r\n" for k, v in (headers or {}).items())
+        if body is not None:
+            extra += f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+        self.writer.write(f"{method} {path} HTTP/1.1\r\nHost: bench\r\n{extra}\r\n".encode() + (body or b""))
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line == b"\r\n":
+                break
+            name, _, value = line.partition(b":")
+            if name.lower() == b"content-length":
+                length = int(value)
+        return status, await self.reader.readexactly(length)
+
+    async def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+
+
+class Context:
+    """Seed sizes plus the rows created by earlier scenarios."""
+
+    def __init__(self, users: int, courses: int, rng: random.Random):
+        self.users = users
+        self.courses = courses
+        self.rng = rng
+        self.created: Dict[str, List[dict]] = {"users": [], "courses": [], "enrollments": []}
+
+    def user_id(self) -> int:
+        return self.rng.randint(1, self.users)
+
+    def course_id(self) -> int:
+        return self.rng.randint(1, self.courses)
+
+
+class Scenario:
+    def __init__(self, name: str, expect: int, make: Callable[[Context, int], Request], creates: Optional[str] = None):
+        self.name = name
+        self.expect = expect
+        self.make = make
+        # Responses are kept in ctx.created[creates] for later scenarios
+        self.creates = creates
+
+
+def _json(value) -> bytes:
+    return json.dumps(value).encode()
+
+
+def _new_course(ctx: Context, i: int) -> dict:
+    return ctx.created["courses"][i % len(ctx.created["courses"])]
+
+
+def _enroll(ctx: Context, i: int) -> Request:
+    # Each new user enrolls in seeded courses one after another, so pairs never repeat
+    users = ctx.created["users"]
+    user = users[i % len(users)]
+    course_id = (i // len(users) + user["id"]) % ctx.courses + 1
+    return "POST", "/enrollments", student(user["id"]), _json({"user_id": user["id"], "course_id": course_id})
+
+
+def _deregister(ctx: Context, i: int) -> Request:
+    enrollment = ctx.created["enrollments"][i]
+    return "DELETE", f"/enrollments/{enrollment['id']}", student(enrollment["user_id"]), None
+
+
+SCENARIOS = [
+    Scenario("user_create", 201, lambda ctx, i: (
+        "POST", "/users", None, _json({"name": f"New {i}", "email": f"new{i}@example.com", "role": "student"})
+    ), creates="users"),
+    Scenario("user_get", 200, lambda ctx, i: ("GET", f"/users/{ctx.user_id()}", None, None)),
+    Scenario("user_list", 200, lambda ctx, i: ("GET", f"/users?limit=50&cursor={ctx.user_id()}", None, None)),
+    Scenario("course_create", 201, lambda ctx, i: (
+        "POST", "/courses", ADMIN, _json({"title": f"New course {i}", "code": f"NEW{i}"})
+    ), creates="courses"),
+    Scenario("course_get", 200, lambda ctx, i: ("GET", f"/courses/{ctx.course_id()}", None, None)),
+    Scenario("course_list", 200, lambda ctx, i: ("GET", f"/courses?limit=50&cursor={ctx.course_id()}", None, None)),
+    Scenario("course_update", 200, lambda ctx, i: (
+        "PUT", f"/courses/{_new_course(ctx, i)['id']}", ADMIN,
+        _json({"title": f"Renamed {i}", "code": _new_course(ctx, i)["code"]}),
+    )),
+    Scenario("enroll", 201, _enroll, creates="enrollments"),
+    Scenario("student_enrollments", 200, lambda ctx, i: (
+        "GET", f"/students/{(uid := ctx.user_id())}/enrollments", student(uid), None
+    )),
+    Scenario("course_enrollments", 200, lambda ctx, i: (
+        "GET", f"/courses/{ctx.course_id()}/enrollments?limit=50", ADMIN, None
+    )),
+    Scenario("deregister", 204, _deregister),
+    Scenario("course_delete", 204, lambda ctx, i: ("DELETE", f"/courses/{_new_course(ctx, i)['id']}", ADMIN, None)),
+]
+
+
+async def seed(client, users: int, courses: int, enrollments: int) -> None:
+    async def batch(path: str, items: list, headers: Optional[dict] = None) -> None:
+        for start in range(0, len(items), BATCH_LIMIT):
+            status, body = await client.request("POST", path, headers, _json(items[start:start + BATCH_LIMIT]))
+            if status != 200:
+                raise RuntimeError(f"seeding {path} failed: {status} {body[:200]!r}")
+
+    await batch("/users:batch", [{"name": f"User {i}", "email": f"user{i}@example.com", "role": "student"}
+                                 for i in range(users)])
+    await batch("/courses:batch", [{"title": f"Course {i}", "code": f"C{i}"} for i in range(courses)], ADMIN)
+    # Enrollment k pairs user k % users with a distinct course per round
+    enrollments = min(enrollments, users * courses)
+    await batch("/enrollments:batch", [
+        {"user_id": k % users + 1, "course_id": (k // users + k % users) % courses + 1} for k in range(enrollments)
+    ], ADMIN)
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    return sorted_values[min(int(p * len(sorted_values)), len(sorted_values) - 1)] if sorted_values else 0.0
+
+
+async def run_scenario(scenario: Scenario, clients: list, ctx: Context, requests: int) -> dict:
+    if scenario.name == "deregister":
+        requests = min(requests, len(ctx.created["enrollments"]))
+    # Requests are generated up front so the sequence does not depend on scheduling
+    planned = [scenario.make(ctx, i) for i in range(requests)]
+    latencies: List[float] = []
+    errors = 0
+    created = []
+    position = 0
+
+    async def worker(client) -> None:
+        nonlocal position, errors
+        while position < len(planned):
+            method, path, headers, body = planned[position]
+            position += 1
+            start = time.perf_counter()
+            status, content = await client.request(method, path, headers, body)
+            latencies.append(time.perf_counter() - start)
+            if status != scenario.expect:
+                errors += 1
+            elif scenario.creates:
+                created.append(json.loads(content))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(client) for client in clients))
+    elapsed = time.perf_counter() - start
+    if scenario.creates:
+        ctx.created[scenario.creates] = sorted(created, key=lambda row: row["id"])
+    latencies.sort()
+    ms = lambda p: round(percentile(latencies, p) * 1000, 3)
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": ms(0.5),
+        "p90_ms": ms(0.9),
+        "p99_ms": ms(0.99),
+        "max_ms": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        "errors": errors,
+    }
+
+
+def memory_mb(pid: Optional[int] = None) -> dict:
+    """Current and peak resident set size of `pid` (this process if None)."""
+    try:
+        with open(f"/proc/{pid or 'self'}/status") as f:
+            fields = dict(line.split(":", 1) for line in f)
+        return {"rss_mb": round(int(fields["VmRSS"].split()[0]) / 1024, 1),
+                "peak_rss_mb": round(int(fields["VmHWM"].split()[0]) / 1024, 1)}
+    except OSError:
+        # No procfs (macOS): only this process's peak is available
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {"peak_rss_mb": round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)}
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_suite(make_client: Callable[[], object], args, pid: Optional[int]) -> dict:
+    seed_client = make_client()
+    await seed(seed_client, args.users, args.courses, args.enrollments)
+    await seed_client.close()
+    memory = {"after_seed": memory_mb(pid)}
+
+    ctx = Context(args.users, args.courses, random.Random(args.seed))
+    clients = [make_client() for _ in range(args.concurrency)]
+    scenarios = {}
+    try:
+        for scenario in SCENARIOS:
+            scenarios[scenario.name] = await run_scenario(scenario, clients, ctx, args.requests)
+    finally:
+        for client in clients:
+            await client.close()
+    memory["after_run"] = memory_mb(pid)
+    return {"scenarios": scenarios, "memory": memory}
+
+
+def run_inprocess(args) -> dict:
+    os.environ["APP_STORAGE_BACKEND"] = args.backend
+    tmp = tempfile.mkdtemp(prefix="bench-suite-")
+    os.environ["APP_SQLITE_PATH"] = os.path.join(tmp, "suite.db")
+    from app.main import app
+    from app.db import db
+    from app.cache import catalog_cache
+    db.reset()
+    catalog_cache.clear()
+    return asyncio.run(run_suite(lambda: InProcessClient(app), args, None))
+
+
+def run_uvicorn(args) -> dict:
+    from benchmarks.load_test import start_server
+    with tempfile.TemporaryDirectory() as tmp:
+        server = start_server(args.port, "auto", args.backend, os.path.join(tmp, "suite.db"))
+        try:
+            return asyncio.run(run_suite(lambda: HttpClient(args.port), args, server.pid))
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def median_of(runs: List[dict]) -> dict:
+    """Per-figure median over repeated runs (memory: the largest)."""
+    scenarios = {
+        name: {key: statistics.median(run["scenarios"][name][key] for run in runs) for key in result}
+        for name, result in runs[0]["scenarios"].items()
+    }
+    memory = {
+        stage: {key: max(run["memory"][stage].get(key, 0) for run in runs) for key in figures}
+        for stage, figures in runs[0]["memory"].items()
+    }
+    return {"scenarios": scenarios, "memory": memory}
+
+
+def compare(current: dict, baseline: dict, tolerance: float, latency_tolerance: float) -> List[str]:
+    """Scenarios with more errors, throughput down by more than `tolerance` or p99 up by more than `latency_tolerance`."""
+    regressions = []
+    for name, result in current["scenarios"].items():
+        base = baseline["scenarios"].get(name)
+        if base is None:
+            continue
+        if result["errors"] > base["errors"]:
+            regressions.append(f"{name}: {result['errors']} errors (baseline {base['errors']})")
+        if base["rps"] and result["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: {result['rps']:.0f} req/s vs {base['rps']:.0f} baseline "
+                               f"({result['rps'] / base['rps'] - 1:+.0%})")
+        if base["p99_ms"] and result["p99_ms"] > base["p99_ms"] * (1 + latency_tolerance):
+            regressions.append(f"{name}: p99 {result['p99_ms']:.2f} ms vs {base['p99_ms']:.2f} ms baseline "
+                               f"({result['p99_ms'] / base['p99_ms'] - 1:+.0%})")
+    return regressions
+
+
+def report(results: dict, baseline: Optional[dict]) -> None:
+    config = results["config"]
+    print(f"{config['target']} / {config['backend']} backend, {config['concurrency']} clients, "
+          f"{config['requests']} requests per scenario, median of {config['repeat']} runs")
+    print(f"{'scenario':<22}{'req/s':>10}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}{'errors':>8}"
+          + (f"{'vs base':>10}" if baseline else ""))
+    for name, r in results["scenarios"].items():
+        line = (f"{name:<22}{r['rps']:>10,.0f}{r['p50_ms']:>9.2f}{r['p90_ms']:>9.2f}{r['p99_ms']:>9.2f}"
+                f"{r['max_ms']:>9.2f}{r['errors']:>8}")
+        base = (baseline or {}).get("scenarios", {}).get(name)
+        if base and base["rps"]:
+            line += f"{r['rps'] / base['rps'] - 1:>+10.0%}"
+        print(line)
+    for stage, memory in results["memory"].items():
+        print(f"memory {stage}: " + ", ".join(f"{k} {v}" for k, v in memory.items()))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=["inprocess", "uvicorn"], default="inprocess")
+    parser.add_argument("--backend", choices=["memory", "sqlite"], default="memory")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--courses", type=int, default=500)
+    parser.add_argument("--enrollments", type=int, default=50_000)
+    parser.add_argument("--requests", type=int, default=2000, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare with the results stored in this JSON file")
+    parser.add_argument("--repeat", type=int, default=3, help="runs to take the median of")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed throughput drop (fraction)")
+    parser.add_argument("--latency-tolerance", type=float, default=1.0, help="allowed p99 increase (fraction)")
+    args = parser.parse_args()
+
+    run = run_inprocess if args.target == "inprocess" else run_uvicorn
+    results = median_of([run(args) for _ in range(args.repeat)])
+    results = {
+        "config": {k: getattr(args, k) for k in
+                   ("target", "backend", "users", "courses", "enrollments", "requests", "concurrency", "seed",
+                    "repeat")},
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpus": os.cpu_count(), "revision": git_revision(), "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        **results,
+    }
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["config"] != results["config"]:
+            print(f"warning: baseline was run with {baseline['config']}", file=sys.stderr)
+    report(results, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+    if baseline:
+        regressions = compare(results, baseline, args.tolerance, args.latency_tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
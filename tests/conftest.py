@@ -2,13 +2,19 @@ import pytest
 from fastapi.testclient import TestClient
 from app.main import app
 from app.db import db, InMemoryDB
+from app.cache import catalog_cache
+from app.metrics import metrics
+from app.dependencies import principal_cache
+from app.idempotency import idempotency_store
 
 @pytest.fixture(scope="function")
 def client():
     # Reset DB before each test
-    db.users = []
-    db.courses = []
-    db.enrollments = []
+    db.reset()
+    catalog_cache.clear()
+    metrics.reset()
+    principal_cache.clear()
+    idempotency_store.clear()
     return TestClient(app)
 
 @pytest.fixture
@@ -18,3 +24,13 @@ def admin_headers():
 @pytest.fixture
 def student_headers():
     return {"X-User-Role": "student", "X-User-Id": "2"}
+
+@pytest.fixture
+def student_headers_for():
+    """Headers acting as student `user_id`, optionally with an Idempotency-Key."""
+    def headers(user_id, idempotency_key=None):
+        result = {"X-User-Role": "student", "X-User-Id": str(user_id)}
+        if idempotency_key is not None:
+            result["Idempotency-Key"] = idempotency_key
+        return result
+    return headers
@@ -0,0 +1,67 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.async_storage import INLINE, THREADPOOL, AsyncStorage
+from app.config import Settings
+from app.db import InMemoryDB, adb, create_async_storage, db
+from app.models import UserCreate
+from app.storage import DuplicateError
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+def test_executor_mode_follows_backend(tmp_path):
+    from app.sqlite_db import SQLiteDB
+    sqlite = SQLiteDB(str(tmp_path / "test.db"), pool_size=2)
+    try:
+        assert create_async_storage(InMemoryDB(), Settings()).mode == INLINE
+        assert create_async_storage(sqlite, Settings(storage_backend="sqlite")).mode == THREADPOOL
+        assert create_async_storage(InMemoryDB(), Settings(storage_executor="threadpool")).mode == THREADPOOL
+    finally:
+        sqlite.close()
+
+def test_inline_handlers_call_storage_on_event_loop(client, monkeypatch):
+    seen = []
+    real_get_user = db.get_user
+    monkeypatch.setattr(db, "get_user", lambda user_id: seen.append(_on_event_loop()) or real_get_user(user_id))
+    client.post("/users", json={"name": "A", "email": "a@example.com", "role": "student"})
+    assert client.get("/users/1").status_code == 200
+    assert seen == [True]
+
+def test_threadpool_mode_serves_requests(client, admin_headers, monkeypatch):
+    seen = []
+    real_get_user = db.get_user
+    monkeypatch.setattr(db, "get_user", lambda user_id: seen.append(_on_event_loop()) or real_get_user(user_id))
+    monkeypatch.setattr(adb, "_executor", ThreadPoolExecutor(max_workers=2))
+    client.post("/users", json={"name": "A", "email": "a@example.com", "role": "student"})
+    assert client.get("/users/1").json()["email"] == "a@example.com"
+    assert client.post("/users", json={"name": "B", "email": "a@example.com", "role": "student"}).status_code == 400
+    assert seen == [False]
+
+@pytest.mark.parametrize("mode", [INLINE, THREADPOOL])
+def test_async_storage_round_trip(tmp_path, mode):
+    from app.sqlite_db import SQLiteDB
+    sqlite = SQLiteDB(str(tmp_path / "test.db"), pool_size=2)
+    storage = AsyncStorage(sqlite, mode, workers=2)
+
+    async def scenario():
+        created = await asyncio.gather(*(
+            storage.create_user(UserCreate(name=f"U{i}", email=f"u{i}@example.com", role="student"))
+            for i in range(20)
+        ))
+        assert sorted(u.id for u in created) == list(range(1, 21))
+        assert (await storage.get_user_by_email("u7@example.com")).name == "U7"
+        assert len(await storage.list_users(after_id=10, limit=5)) == 5
+        with pytest.raises(DuplicateError):
+            await storage.create_user(UserCreate(name="X", email="u1@example.com", role="student"))
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        sqlite.close()
@@ -0,0 +1,109 @@
+import time
+from unittest.mock import patch
+
+import pytest
+
+from app.auth import Principal, PrincipalCache, InvalidTokenError, issue_token, verify_token
+from app.config import settings
+from app.db import db
+
+SECRET = "test-secret"
+
+@pytest.fixture
+def tokens(monkeypatch):
+    monkeypatch.setattr(settings, "auth_secret", SECRET)
+
+def _bearer(user_id, ttl=60):
+    return {"Authorization": f"Bearer {issue_token(SECRET, user_id, ttl)[0]}"}
+
+def _users(client):
+    client.post("/users", json={"name": "Admin", "email": "admin@example.com", "role": "admin"})
+    client.post("/users", json={"name": "Student", "email": "student@example.com", "role": "student"})
+    client.post("/courses", json={"title": "Algebra", "code": "MATH101"}, headers=_bearer(1))
+
+def test_token_roundtrip():
+    token, expires = issue_token(SECRET, 7, 60)
+    assert verify_token(SECRET, token) == (7, expires)
+    with pytest.raises(InvalidTokenError, match="bad signature"):
+        verify_token("other-secret", token)
+    with pytest.raises(InvalidTokenError, match="expired"):
+        verify_token(SECRET, issue_token(SECRET, 7, 60, now=time.time() - 120)[0])
+    with pytest.raises(InvalidTokenError):
+        verify_token(SECRET, "garbage")
+
+def test_role_comes_from_storage(client, tokens):
+    _users(client)
+    assert client.get("/enrollments", headers=_bearer(1)).status_code == 200
+    assert client.get("/enrollments", headers=_bearer(2)).status_code == 403
+    response = client.post("/enrollments", json={"user_id": 2, "course_id": 1}, headers=_bearer(2))
+    assert response.status_code == 201
+    # The token's subject is the requester: student 2 cannot act as anyone else
+    assert client.post("/enrollments", json={"user_id": 1, "course_id": 1}, headers=_bearer(2)).status_code == 403
+
+def test_issue_token_endpoint(client, tokens):
+    _users(client)
+    assert client.post("/users/2/tokens", headers=_bearer(2)).status_code == 403
+    assert client.post("/users/99/tokens", headers=_bearer(1)).status_code == 404
+    response = client.post("/users/2/tokens", json={"ttl_seconds": 30}, headers=_bearer(1))
+    assert response.status_code == 201
+    body = response.json()
+    assert body["token_type"] == "bearer"
+    assert body["expires_at"] - time.time() <= 30
+    headers = {"Authorization": f"Bearer {body['access_token']}"}
+    assert client.get("/students/2/enrollments", headers=headers).status_code == 200
+
+def test_token_endpoint_needs_a_secret(client, admin_headers):
+    _users(client)
+    assert client.post("/users/2/tokens", headers=admin_headers).status_code == 503
+
+def test_rejected_tokens(client, tokens):
+    _users(client)
+    forged = issue_token("other-secret", 1, 60)[0]
+    expired = issue_token(SECRET, 1, 60, now=time.time() - 120)[0]
+    for token in (forged, expired, "not-a-token"):
+        response = client.get("/enrollments", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 401
+        assert response.headers["www-authenticate"] == "Bearer"
+    assert client.get("/enrollments", headers={"Authorization": "Basic abc"}).status_code == 401
+    assert client.get("/enrollments", headers=_bearer(99)).status_code == 401
+
+def test_headers_are_rejected_once_a_secret_is_set(client, tokens, admin_headers, monkeypatch):
+    _users(client)
+    assert client.get("/enrollments", headers=admin_headers).status_code == 401
+    assert client.post("/courses", json={"title": "X", "code": "X"}, headers=admin_headers).status_code == 401
+    assert client.get("/enrollments", headers=_bearer(1)).status_code == 200
+    # Only an explicit opt-in trusts them alongside tokens
+    monkeypatch.setattr(settings, "auth_allow_headers", True)
+    assert client.get("/enrollments", headers=admin_headers).status_code == 200
+
+def test_header_fallback_can_be_disabled_without_tokens(client, admin_headers, monkeypatch):
+    monkeypatch.setattr(settings, "auth_allow_headers", False)
+    assert client.get("/enrollments", headers=admin_headers).status_code == 401
+
+def test_verified_tokens_skip_storage(client, tokens):
+    _users(client)
+    headers = _bearer(1)
+    assert client.get("/enrollments", headers=headers).status_code == 200
+    with patch.object(db, "get_user", side_effect=AssertionError("user lookup on a cached token")), \
+         patch("app.dependencies.verify_token", side_effect=AssertionError("signature check on a cached token")):
+        assert client.get("/enrollments", headers=headers).status_code == 200
+
+def test_recreated_user_invalidates_cached_principal(client, tokens):
+    _users(client)
+    headers = _bearer(1)
+    assert client.get("/enrollments", headers=headers).status_code == 200
+    db.reset()
+    client.post("/users", json={"name": "Now a student", "email": "s@example.com", "role": "student"})
+    assert client.get("/enrollments", headers=headers).status_code == 403
+
+def test_principal_cache_is_bounded_and_expires():
+    cache = PrincipalCache(max_entries=2, ttl=60)
+    far = time.time() + 3600
+    for i in range(3):
+        cache.put(f"t{i}", Principal(i, "student"), far)
+    assert len(cache) == 2 and cache.get("t0") is None
+    cache.invalidate_user(2)
+    assert cache.get("t2") is None and cache.get("t1").id == 1
+    # A token expiring before the cache TTL is dropped with it
+    cache.put("short", Principal(5, "student"), time.time() - 1)
+    assert cache.get("short") is None
@@ -0,0 +1,76 @@
+def _users(count, start=0):
+    return [{"name": f"User {i}", "email": f"user{i}@example.com", "role": "student"} for i in range(start, start + count)]
+
+def test_create_users_batch(client):
+    response = client.post("/users:batch", json=_users(3))
+    assert response.status_code == 200
+    body = response.json()
+    assert body["committed"] is True
+    assert body["created"] == 3
+    assert [r["id"] for r in body["results"]] == [1, 2, 3]
+    assert len(client.get("/users").json()) == 3
+
+def test_users_batch_atomic_rolls_back(client):
+    client.post("/users", json=_users(1)[0])
+    response = client.post("/users:batch", json=_users(3))
+    assert response.status_code == 409
+    body = response.json()
+    assert body["committed"] is False
+    assert body["created"] == 0
+    assert [r["status"] for r in body["results"]] == ["duplicate", "aborted", "aborted"]
+    assert len(client.get("/users").json()) == 1
+
+def test_users_batch_partial(client):
+    client.post("/users", json=_users(1)[0])
+    # The duplicate inside the batch itself is caught too
+    items = _users(3) + _users(1, start=2)
+    response = client.post("/users:batch?mode=partial", json=items)
+    assert response.status_code == 200
+    body = response.json()
+    assert [r["status"] for r in body["results"]] == ["duplicate", "created", "created", "duplicate"]
+    assert body["created"] == 2
+
+def test_courses_batch_admin_only(client, admin_headers, student_headers):
+    courses = [{"title": f"Course {i}", "code": f"C{i}"} for i in range(3)]
+    assert client.post("/courses:batch", json=courses, headers=student_headers).status_code == 403
+    response = client.post("/courses:batch", json=courses, headers=admin_headers)
+    assert response.json()["created"] == 3
+    assert [c["code"] for c in client.get("/courses").json()] == ["C0", "C1", "C2"]
+
+def test_enrollments_batch_admin(client, admin_headers, student_headers_for):
+    client.post("/users:batch", json=_users(3))
+    client.post("/courses:batch", json=[{"title": "Math", "code": "MATH"}], headers=admin_headers)
+    client.post("/enrollments", json={"user_id": 1, "course_id": 1}, headers=student_headers_for(1))
+
+    items = [
+        {"user_id": 1, "course_id": 1},
+        {"user_id": 2, "course_id": 1},
+        {"user_id": 99, "course_id": 1},
+        {"user_id": 3, "course_id": 42},
+        {"user_id": 3, "course_id": 1},
+    ]
+    response = client.post("/enrollments:batch?mode=partial", json=items, headers=admin_headers)
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["status"] for r in results] == ["duplicate", "created", "not_found", "not_found", "created"]
+    assert results[2]["detail"] == "Student not found"
+    assert results[3]["detail"] == "Course not found"
+    assert len(client.get("/courses/1/enrollments", headers=admin_headers).json()) == 3
+
+def test_enrollments_batch_student_forbidden_items(client, admin_headers, student_headers_for):
+    client.post("/users:batch", json=_users(2))
+    client.post("/courses:batch", json=[{"title": f"Course {i}", "code": f"C{i}"} for i in range(2)], headers=admin_headers)
+    items = [{"user_id": 1, "course_id": 1}, {"user_id": 2, "course_id": 1}, {"user_id": 1, "course_id": 2}]
+
+    response = client.post("/enrollments:batch", json=items, headers=student_headers_for(1))
+    assert response.status_code == 409
+    assert [r["status"] for r in response.json()["results"]] == ["aborted", "forbidden", "aborted"]
+    assert client.get("/students/1/enrollments", headers=student_headers_for(1)).json() == []
+
+    response = client.post("/enrollments:batch?mode=partial", json=items, headers=student_headers_for(1))
+    assert [r["status"] for r in response.json()["results"]] == ["created", "forbidden", "created"]
+    assert len(client.get("/students/1/enrollments", headers=student_headers_for(1)).json()) == 2
+
+def test_batch_size_limit(client):
+    response = client.post("/users:batch", json=_users(5001))
+    assert response.status_code == 422
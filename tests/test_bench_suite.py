@@ -0,0 +1,29 @@
+import asyncio
+import copy
+from types import SimpleNamespace
+
+from app.main import app
+from benchmarks.suite import InProcessClient, compare, run_suite, SCENARIOS
+
+def test_every_scenario_succeeds(client):
+    # client fixture: fresh store and cache
+    args = SimpleNamespace(users=50, courses=10, enrollments=100, requests=20, concurrency=4, seed=1)
+    results = asyncio.run(run_suite(lambda: InProcessClient(app), args, None))
+    assert list(results["scenarios"]) == [s.name for s in SCENARIOS]
+    for name, result in results["scenarios"].items():
+        assert result["errors"] == 0, name
+        assert result["requests"] == 20, name
+
+def test_compare_flags_regressions():
+    baseline = {"scenarios": {
+        "user_get": {"rps": 1000.0, "p99_ms": 1.0, "errors": 0},
+        "enroll": {"rps": 1000.0, "p99_ms": 1.0, "errors": 0},
+    }}
+    current = copy.deepcopy(baseline)
+    current["scenarios"]["user_get"]["rps"] = 800.0
+    current["scenarios"]["enroll"].update(p99_ms=2.5, errors=3)
+    assert compare(current, baseline, 0.25, 1.0) == [
+        "enroll: 3 errors (baseline 0)",
+        "enroll: p99 2.50 ms vs 1.00 ms baseline (+150%)",
+    ]
+    assert compare(current, baseline, 0.1, 1.0)[0] == "user_get: 800 req/s vs 1000 baseline (-20%)"
@@ -0,0 +1,96 @@
+from unittest.mock import patch
+
+from app.cache import ResponseCache, catalog_cache
+from app.db import db
+from app.models import CourseCreate
+
+def _seed(client, admin_headers, count=3):
+    for i in range(count):
+        client.post("/courses", json={"title": f"Course {i}", "code": f"C{i}"}, headers=admin_headers)
+
+def test_repeat_catalog_reads_skip_storage(client, admin_headers):
+    _seed(client, admin_headers)
+    first = client.get("/courses?limit=2")
+    with patch.object(db, "list_courses", side_effect=AssertionError("storage hit")):
+        second = client.get("/courses?limit=2")
+    assert second.status_code == 200
+    assert second.content == first.content
+    assert second.headers["X-Next-Cursor"] == "2"
+    assert second.headers["ETag"] == first.headers["ETag"]
+
+def test_if_none_match_returns_304(client, admin_headers):
+    _seed(client, admin_headers)
+    etag = client.get("/courses/1").headers["ETag"]
+    response = client.get("/courses/1", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+    assert client.get("/courses/1", headers={"If-None-Match": '"other"'}).status_code == 200
+
+def test_writes_invalidate_catalog(client, admin_headers):
+    _seed(client, admin_headers)
+    listing = client.get("/courses")
+    detail = client.get("/courses/2")
+
+    client.put("/courses/2", json={"title": "Renamed", "code": "C1"}, headers=admin_headers)
+    assert client.get("/courses/2").json()["title"] == "Renamed"
+    relisted = client.get("/courses", headers={"If-None-Match": listing.headers["ETag"]})
+    assert relisted.status_code == 200
+    assert relisted.json()[1]["title"] == "Renamed"
+    assert client.get("/courses/2", headers={"If-None-Match": detail.headers["ETag"]}).status_code == 200
+
+    client.post("/courses", json={"title": "New", "code": "N1"}, headers=admin_headers)
+    assert len(client.get("/courses").json()) == 4
+
+    client.post("/courses:batch", json=[{"title": "Batch", "code": "B1"}], headers=admin_headers)
+    assert len(client.get("/courses").json()) == 5
+
+    client.delete("/courses/2", headers=admin_headers)
+    assert client.get("/courses/2").status_code == 404
+    assert [c["id"] for c in client.get("/courses").json()] == [1, 3, 4, 5]
+
+def test_update_keeps_other_courses_cached(client, admin_headers):
+    _seed(client, admin_headers)
+    client.get("/courses/1")
+    client.get("/courses/3")
+    client.put("/courses/3", json={"title": "Renamed", "code": "C2"}, headers=admin_headers)
+    with patch.object(db, "get_course", side_effect=AssertionError("storage hit")):
+        assert client.get("/courses/1").status_code == 200
+
+def test_projection_is_cached_separately(client, admin_headers):
+    _seed(client, admin_headers)
+    assert client.get("/courses?fields=code").json() == [{"code": "C0"}, {"code": "C1"}, {"code": "C2"}]
+    assert client.get("/courses").json()[0] == {"id": 1, "title": "Course 0", "code": "C0", "capacity": None}
+    assert client.get("/courses?fields=code").json()[0] == {"code": "C0"}
+
+def test_missing_course_is_not_cached(client, admin_headers):
+    assert client.get("/courses/1").status_code == 404
+    _seed(client, admin_headers, count=1)
+    assert client.get("/courses/1").status_code == 200
+
+def test_lru_is_bounded(client, admin_headers, monkeypatch):
+    monkeypatch.setattr(catalog_cache, "max_entries", 2)
+    _seed(client, admin_headers)
+    for course_id in (1, 2, 3):
+        client.get(f"/courses/{course_id}")
+    assert len(catalog_cache) == 2
+
+def test_fill_racing_a_write_is_not_cached(client, admin_headers):
+    _seed(client, admin_headers)
+    real_get_course = db.get_course
+
+    def get_course_then_update(course_id):
+        # What PUT /courses/1 does, landing between the read and the store
+        course = real_get_course(course_id)
+        db.update_course(1, CourseCreate(title="Renamed", code="C0"))
+        catalog_cache.invalidate("courses", "course:1")
+        return course
+
+    with patch.object(db, "get_course", side_effect=get_course_then_update):
+        assert client.get("/courses/1").json()["title"] == "Course 0"
+    assert client.get("/courses/1").json()["title"] == "Renamed"
+
+def test_disabled_cache_stores_nothing():
+    cache = ResponseCache(0)
+    cache.invalidate("courses")
+    assert len(cache) == 0
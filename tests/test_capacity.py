@@ -0,0 +1,186 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.db import InMemoryDB, WaitlistRow
+from app.models import UserCreate, CourseCreate, CourseUpdate, EnrollmentCreate, WaitlistEntry
+from app.sqlite_db import SQLiteDB
+from app.storage import CourseFullError, DuplicateError
+
+def _seed(client, admin_headers, students=4, capacity=2):
+    for i in range(students):
+        client.post("/users", json={"name": f"S{i}", "email": f"s{i}@example.com", "role": "student"})
+    client.post("/courses", json={"title": "Hot", "code": "HOT", "capacity": capacity}, headers=admin_headers)
+
+@pytest.fixture
+def enroll(client, student_headers_for):
+    def enroll(user_id, waitlist=False):
+        return client.post(
+            "/enrollments" + ("?waitlist=true" if waitlist else ""),
+            json={"user_id": user_id, "course_id": 1},
+            headers=student_headers_for(user_id),
+        )
+    return enroll
+
+def test_capacity_is_validated(client, admin_headers):
+    response = client.post("/courses", json={"title": "X", "code": "X", "capacity": 0}, headers=admin_headers)
+    assert response.status_code == 422
+
+def test_full_course_rejects_enrollment(client, admin_headers, enroll):
+    _seed(client, admin_headers)
+    assert enroll(1).status_code == 201
+    assert enroll(2).status_code == 201
+    response = enroll(3)
+    assert response.status_code == 409
+    assert response.json()["detail"] == "Course is full"
+    # Duplicates are still reported as duplicates
+    assert enroll(1).status_code == 400
+
+def test_waitlist_is_promoted_in_order(client, admin_headers, student_headers_for, enroll):
+    _seed(client, admin_headers)
+    first = enroll(1).json()
+    enroll(2)
+    third = enroll(3, waitlist=True)
+    fourth = enroll(4, waitlist=True)
+    assert third.status_code == 202
+    assert third.json()["position"] == 1 and fourth.json()["position"] == 2
+    assert enroll(3, waitlist=True).json()["detail"] == "Student is already on the waitlist for this course"
+
+    assert client.delete(f"/enrollments/{first['id']}", headers=student_headers_for(1)).status_code == 204
+    enrolled = [e["user_id"] for e in client.get("/courses/1/enrollments", headers=admin_headers).json()]
+    assert enrolled == [2, 3]
+    waitlist = client.get("/courses/1/waitlist", headers=admin_headers).json()
+    assert [(e["user_id"], e["position"]) for e in waitlist] == [(4, 1)]
+    assert client.get(f"/waitlist/{waitlist[0]['id']}", headers=student_headers_for(4)).json()["position"] == 1
+
+def test_leave_waitlist(client, admin_headers, student_headers_for, enroll):
+    _seed(client, admin_headers, capacity=1)
+    enroll(1)
+    entry = enroll(2, waitlist=True).json()
+    assert client.delete(f"/waitlist/{entry['id']}", headers=student_headers_for(3)).status_code == 403
+    assert client.delete(f"/waitlist/{entry['id']}", headers=student_headers_for(2)).status_code == 204
+    assert client.get(f"/waitlist/{entry['id']}", headers=student_headers_for(2)).status_code == 404
+    assert client.get("/courses/1/waitlist", headers=admin_headers).json() == []
+
+def test_raising_capacity_promotes_waitlist(client, admin_headers, enroll):
+    _seed(client, admin_headers, capacity=1)
+    enroll(1)
+    enroll(2, waitlist=True)
+    enroll(3, waitlist=True)
+    client.put("/courses/1", json={"title": "Hot", "code": "HOT", "capacity": 2}, headers=admin_headers)
+    assert [e["user_id"] for e in client.get("/courses/1/enrollments", headers=admin_headers).json()] == [1, 2]
+    client.put("/courses/1", json={"title": "Hot", "code": "HOT", "capacity": None}, headers=admin_headers)
+    assert [e["user_id"] for e in client.get("/courses/1/enrollments", headers=admin_headers).json()] == [1, 2, 3]
+    assert client.get("/courses/1/waitlist", headers=admin_headers).json() == []
+
+def test_rename_keeps_capacity_and_waitlist(client, admin_headers, enroll):
+    _seed(client, admin_headers, capacity=1)
+    for user_id in (1, 2, 3, 4):
+        enroll(user_id, waitlist=True)
+    response = client.put("/courses/1", json={"title": "Hotter", "code": "HOT2"}, headers=admin_headers)
+    assert response.json() == {"id": 1, "title": "Hotter", "code": "HOT2", "capacity": 1}
+    assert [e["user_id"] for e in client.get("/courses/1/enrollments", headers=admin_headers).json()] == [1]
+    assert [e["user_id"] for e in client.get("/courses/1/waitlist", headers=admin_headers).json()] == [2, 3, 4]
+
+def test_lowering_capacity_keeps_enrollments(client, admin_headers, enroll):
+    _seed(client, admin_headers, capacity=3)
+    for user_id in (1, 2, 3):
+        enroll(user_id)
+    client.put("/courses/1", json={"title": "Hot", "code": "HOT", "capacity": 1}, headers=admin_headers)
+    assert len(client.get("/courses/1/enrollments", headers=admin_headers).json()) == 3
+    enrollment_id = client.get("/courses/1/enrollments", headers=admin_headers).json()[0]["id"]
+    client.delete(f"/enrollments/{enrollment_id}", headers=admin_headers)
+    assert enroll(4).status_code == 409
+
+def test_batch_counts_seats_within_the_batch(client, admin_headers):
+    _seed(client, admin_headers)
+    items = [{"user_id": i, "course_id": 1} for i in (1, 2, 3)]
+    response = client.post("/enrollments:batch?mode=partial", json=items, headers=admin_headers)
+    assert [r["status"] for r in response.json()["results"]] == ["created", "created", "full"]
+    assert response.json()["results"][2]["detail"] == "Course is full"
+
+@pytest.fixture(params=["memory", "sqlite"])
+def storage(request, tmp_path):
+    if request.param == "memory":
+        yield InMemoryDB()
+    else:
+        sqlite = SQLiteDB(str(tmp_path / "enrollment.db"), pool_size=8)
+        yield sqlite
+        sqlite.close()
+
+def test_parallel_rush_never_overbooks(storage):
+    students = [storage.create_user(UserCreate(name=f"S{i}", email=f"s{i}@example.com", role="student"))
+                for i in range(300)]
+    course = storage.create_course(CourseCreate(title="Hot", code="HOT", capacity=50))
+
+    def enroll(student):
+        try:
+            return storage.create_enrollment(EnrollmentCreate(user_id=student.id, course_id=course.id), waitlist=True)
+        except CourseFullError:
+            return None
+
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        results = list(pool.map(enroll, students))
+    queued = [r for r in results if isinstance(r, WaitlistEntry)]
+    assert len(storage.get_course_enrollments(course.id)) == 50
+    assert len(queued) == 250
+    assert [e.position for e in storage.get_course_waitlist(course.id)] == list(range(1, 251))
+
+    # Concurrent deregistrations each hand their seat to the next in line
+    enrollments = storage.get_course_enrollments(course.id)
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        list(pool.map(lambda e: storage.delete_enrollment(e.id), enrollments[:20]))
+    assert len(storage.get_course_enrollments(course.id)) == 50
+    waitlist = storage.get_course_waitlist(course.id)
+    assert len(waitlist) == 230
+    first_in_line = sorted(queued, key=lambda e: e.id)[:20]
+    promoted = {e.user_id for e in storage.get_course_enrollments(course.id)}
+    assert {e.user_id for e in first_in_line} <= promoted
+
+def test_delete_course_drops_waitlist(storage):
+    a = storage.create_user(UserCreate(name="A", email="a@example.com", role="student"))
+    b = storage.create_user(UserCreate(name="B", email="b@example.com", role="student"))
+    course = storage.create_course(CourseCreate(title="Hot", code="HOT", capacity=1))
+    storage.create_enrollment(EnrollmentCreate(user_id=a.id, course_id=course.id))
+    entry = storage.create_enrollment(EnrollmentCreate(user_id=b.id, course_id=course.id), waitlist=True)
+    with pytest.raises(DuplicateError):
+        storage.create_enrollment(EnrollmentCreate(user_id=b.id, course_id=course.id), waitlist=True)
+    storage.delete_course(course.id)
+    assert storage.get_waitlist_entry(entry.id) is None
+    assert storage.get_course_waitlist(course.id) == []
+
+def test_update_without_capacity_keeps_it(storage):
+    for i in range(3):
+        storage.create_user(UserCreate(name=f"S{i}", email=f"s{i}@example.com", role="student"))
+    course = storage.create_course(CourseCreate(title="Hot", code="HOT", capacity=1))
+    for user_id in (1, 2, 3):
+        storage.create_enrollment(EnrollmentCreate(user_id=user_id, course_id=course.id), waitlist=True)
+    updated = storage.update_course(course.id, CourseUpdate(title="Hotter", code="HOT"))
+    assert updated.capacity == 1
+    assert storage.get_course(course.id).capacity == 1
+    assert len(storage.get_course_waitlist(course.id)) == 2
+    assert storage.update_course(course.id, CourseUpdate(title="Hotter", code="HOT", capacity=None)).capacity is None
+    assert len(storage.get_course_enrollments(course.id)) == 3
+
+def _stale_waitlist_entry(storage, user_id, course_id):
+    # A queue entry for a student who also holds a seat; the API never
+    # creates one, but a promotion must not trust the queue blindly
+    if isinstance(storage, SQLiteDB):
+        with storage._pool.connection() as conn:
+            conn.execute("INSERT INTO waitlist (user_id, course_id) VALUES (?, ?)", (user_id, course_id))
+    else:
+        storage._store_waitlist_entry(WaitlistRow(storage._waitlist_ids.next(), user_id, course_id))
+
+def test_promotion_skips_students_already_enrolled(storage):
+    for i in range(3):
+        storage.create_user(UserCreate(name=f"S{i}", email=f"s{i}@example.com", role="student"))
+    course = storage.create_course(CourseCreate(title="Hot", code="HOT", capacity=2))
+    first = storage.create_enrollment(EnrollmentCreate(user_id=1, course_id=course.id))
+    storage.create_enrollment(EnrollmentCreate(user_id=2, course_id=course.id))
+    _stale_waitlist_entry(storage, 2, course.id)
+    storage.create_enrollment(EnrollmentCreate(user_id=3, course_id=course.id), waitlist=True)
+    storage.delete_enrollment(first.id)
+    # Student 2 keeps one seat, and the freed seat goes to the next in line
+    assert sorted(e.user_id for e in storage.get_course_enrollments(course.id)) == [2, 3]
+    assert storage.get_course_waitlist(course.id) == []
+
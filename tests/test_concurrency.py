@@ -0,0 +1,60 @@
+from concurrent.futures import ThreadPoolExecutor
+
+WORKERS = 32
+
+def _run_concurrently(fn, count):
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        return list(pool.map(fn, range(count)))
+
+def test_concurrent_user_creates_get_unique_ids(client):
+    responses = _run_concurrently(
+        lambda i: client.post("/users", json={"name": f"User {i}", "email": f"user{i}@example.com", "role": "student"}),
+        2000,
+    )
+    assert all(r.status_code == 201 for r in responses)
+    ids = sorted(r.json()["id"] for r in responses)
+    assert ids == list(range(1, 2001))
+
+def test_concurrent_duplicate_email_creates_one_user(client):
+    responses = _run_concurrently(
+        lambda i: client.post("/users", json={"name": f"User {i}", "email": "same@example.com", "role": "student"}),
+        500,
+    )
+    assert sorted(r.status_code for r in responses) == [201] + [400] * 499
+
+def test_concurrent_duplicate_course_code_creates_one_course(client, admin_headers):
+    responses = _run_concurrently(
+        lambda i: client.post("/courses", json={"title": f"Math {i}", "code": "MATH101"}, headers=admin_headers),
+        500,
+    )
+    assert sorted(r.status_code for r in responses) == [201] + [400] * 499
+
+def test_concurrent_enrollments(client, admin_headers):
+    for i in range(50):
+        client.post("/users", json={"name": f"User {i}", "email": f"user{i}@example.com", "role": "student"})
+    for i in range(10):
+        client.post("/courses", json={"title": f"Course {i}", "code": f"C{i}"}, headers=admin_headers)
+
+    # Every (user, course) pair is attempted twice; exactly one of each must win
+    pairs = [(u, c) for u in range(1, 51) for c in range(1, 11)] * 2
+
+    def enroll(i):
+        user_id, course_id = pairs[i]
+        return client.post(
+            "/enrollments",
+            json={"user_id": user_id, "course_id": course_id},
+            headers={"X-User-Role": "student", "X-User-Id": str(user_id)},
+        )
+
+    responses = _run_concurrently(enroll, len(pairs))
+    created = [r.json() for r in responses if r.status_code == 201]
+    assert len(created) == 500
+    assert sum(r.status_code == 400 for r in responses) == 500
+    assert sorted(e["id"] for e in created) == list(range(1, 501))
+    assert len(client.get("/enrollments?limit=1000", headers=admin_headers).json()) == 500
+
+def test_ids_not_reused_after_delete(client, admin_headers):
+    first = client.post("/courses", json={"title": "Math 101", "code": "MATH101"}, headers=admin_headers).json()
+    client.delete(f"/courses/{first['id']}", headers=admin_headers)
+    second = client.post("/courses", json={"title": "Math 102", "code": "MATH102"}, headers=admin_headers).json()
+    assert second["id"] != first["id"]
@@ -34,3 +34,27 @@ def test_delete_course_admin(client, admin_headers):
     
     get_res = client.get(f"/courses/{course_id}")
     assert get_res.status_code == 404
+
+def test_update_course_code_frees_old_code(client, admin_headers):
+    create_res = client.post("/courses", json={"title": "Math 101", "code": "MATH101"}, headers=admin_headers)
+    course_id = create_res.json()["id"]
+    client.put(f"/courses/{course_id}", json={"title": "Math 101", "code": "MATH101-A"}, headers=admin_headers)
+
+    # The old code is free again, the new one is taken
+    response = client.post("/courses", json={"title": "Math 102", "code": "MATH101"}, headers=admin_headers)
+    assert response.status_code == 201
+    response = client.post("/courses", json={"title": "Math 103", "code": "MATH101-A"}, headers=admin_headers)
+    assert response.status_code == 400
+
+def test_delete_course_cascades_enrollments(client, admin_headers):
+    client.post("/users", json={"name": "Student", "email": "student@example.com", "role": "student"})
+    create_res = client.post("/courses", json={"title": "Math 101", "code": "MATH101"}, headers=admin_headers)
+    course_id = create_res.json()["id"]
+    client.post("/enrollments", json={"user_id": 1, "course_id": course_id}, headers={"X-User-Role": "student", "X-User-Id": "1"})
+
+    client.delete(f"/courses/{course_id}", headers=admin_headers)
+
+    response = client.get("/enrollments", headers=admin_headers)
+    assert response.json() == []
+    response = client.get("/students/1/enrollments", headers={"X-User-Role": "student", "X-User-Id": "1"})
+    assert response.json() == []
@@ -0,0 +1,141 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.db import create_storage
+from app.config import Settings
+from app.durable_db import DurableMemoryDB, SNAPSHOT_NAME
+from app.models import UserCreate, CourseCreate, EnrollmentCreate, WaitlistEntry
+
+def _state(db):
+    return (
+        [u.model_dump() for u in db.list_users()],
+        [c.model_dump() for c in db.list_courses()],
+        [e.model_dump() for e in db.list_enrollments()],
+        {c.id: [w.model_dump() for w in db.get_course_waitlist(c.id)] for c in db.list_courses()},
+    )
+
+def _populate(db):
+    users = [db.create_user(UserCreate(name=f"S{i}", email=f"s{i}@example.com", role="student")) for i in range(5)]
+    hot = db.create_course(CourseCreate(title="Hot", code="HOT", capacity=2))
+    gone = db.create_course(CourseCreate(title="Gone", code="GONE"))
+    db.create_enrollments([EnrollmentCreate(user_id=u.id, course_id=gone.id) for u in users[:2]])
+    for user in users:
+        db.create_enrollment(EnrollmentCreate(user_id=user.id, course_id=hot.id), waitlist=True)
+    db.delete_course(gone.id)
+    # Frees a seat: the head of the waitlist (user 3) is promoted
+    db.delete_enrollment(db.get_course_enrollments(hot.id)[0].id)
+    db.update_course(hot.id, CourseCreate(title="Hot (new)", code="HOT", capacity=2))
+    return hot
+
+def _crash(db):
+    # Stop the background threads without the shutdown snapshot
+    db._stop.set()
+    db._snapshotter.join()
+    db._wal.close()
+
+def test_log_replay_restores_state(tmp_path):
+    db = DurableMemoryDB(str(tmp_path))
+    hot = _populate(db)
+    before = _state(db)
+    _crash(db)
+
+    restored = DurableMemoryDB(str(tmp_path))
+    assert _state(restored) == before
+    assert [w.user_id for w in restored.get_course_waitlist(hot.id)] == [4, 5]
+    # Deleted IDs are not handed out again
+    course = restored.create_course(CourseCreate(title="New", code="NEW"))
+    assert course.id == 3
+    restored.close()
+
+def test_snapshot_plus_log_tail(tmp_path):
+    db = DurableMemoryDB(str(tmp_path))
+    hot = _populate(db)
+    db.snapshot()
+    assert os.path.exists(tmp_path / SNAPSHOT_NAME)
+    user = db.create_user(UserCreate(name="Late", email="late@example.com", role="student"))
+    db.create_enrollment(EnrollmentCreate(user_id=user.id, course_id=hot.id), waitlist=True)
+    db.delete_waitlist_entry(db.get_course_waitlist(hot.id)[0].id)
+    before = _state(db)
+    _crash(db)
+
+    restored = DurableMemoryDB(str(tmp_path))
+    assert _state(restored) == before
+    assert [w.user_id for w in restored.get_course_waitlist(hot.id)] == [5, user.id]
+    restored.close()
+
+def test_close_snapshots_and_drops_old_segments(tmp_path):
+    db = DurableMemoryDB(str(tmp_path))
+    _populate(db)
+    before = _state(db)
+    db.close()
+    assert sorted(os.listdir(tmp_path)) == [SNAPSHOT_NAME, "wal-00000002.log"]
+    assert os.path.getsize(tmp_path / "wal-00000002.log") == 0
+
+    restored = DurableMemoryDB(str(tmp_path))
+    assert _state(restored) == before
+    restored.close()
+
+def test_torn_tail_is_discarded(tmp_path):
+    db = DurableMemoryDB(str(tmp_path))
+    db.create_user(UserCreate(name="A", email="a@example.com", role="student"))
+    db.create_user(UserCreate(name="B", email="b@example.com", role="admin"))
+    _crash(db)
+    segment = tmp_path / "wal-00000001.log"
+    size = os.path.getsize(segment)
+    with open(segment, "ab") as f:
+        f.write(b"\x40\x00\x00\x00\x01\x02")
+
+    restored = DurableMemoryDB(str(tmp_path))
+    assert [u.name for u in restored.list_users()] == ["A", "B"]
+    assert os.path.getsize(segment) == size
+    assert restored.create_user(UserCreate(name="C", email="c@example.com", role="student")).id == 3
+    restored.close()
+
+def test_reset_is_logged(tmp_path):
+    db = DurableMemoryDB(str(tmp_path), sync_commit=False)
+    _populate(db)
+    db.reset()
+    db.create_user(UserCreate(name="A", email="a@example.com", role="student"))
+    _crash(db)
+
+    restored = DurableMemoryDB(str(tmp_path))
+    assert [(u.id, u.name) for u in restored.list_users()] == [(1, "A")]
+    assert restored.list_courses() == []
+    restored.close()
+
+def test_create_storage_uses_wal_dir(tmp_path):
+    db = create_storage(Settings(wal_dir=str(tmp_path), wal_sync="interval"))
+    assert isinstance(db, DurableMemoryDB)
+    assert not db.blocking
+    db.close()
+
+def test_corrupt_snapshot_is_refused(tmp_path):
+    db = DurableMemoryDB(str(tmp_path))
+    _populate(db)
+    db.close()
+    with open(tmp_path / SNAPSHOT_NAME, "r+b") as f:
+        f.seek(40)
+        f.write(b"\xff")
+    with pytest.raises(ValueError, match="checksum"):
+        DurableMemoryDB(str(tmp_path))
+
+def test_concurrent_writers_share_fsyncs(tmp_path):
+    db = DurableMemoryDB(str(tmp_path))
+    users = db.create_users([UserCreate(name=f"S{i}", email=f"s{i}@example.com", role="student") for i in range(200)])
+    course = db.create_course(CourseCreate(title="Hot", code="HOT", capacity=50))
+    syncs = db._wal.syncs
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(
+            lambda u: db.create_enrollment(EnrollmentCreate(user_id=u.id, course_id=course.id), waitlist=True), users
+        ))
+    assert db._wal.syncs - syncs < len(users)
+    before = _state(db)
+    _crash(db)
+
+    restored = DurableMemoryDB(str(tmp_path))
+    assert _state(restored) == before
+    queued = sorted((r for r in results if isinstance(r, WaitlistEntry)), key=lambda e: e.id)
+    assert [w.id for w in restored.get_course_waitlist(course.id)] == [w.id for w in queued]
+    restored.close()
@@ -85,3 +85,14 @@ def test_get_all_enrollments_admin(client):
     response = client.get("/enrollments", headers=admin_headers)
     assert response.status_code == 200
     assert len(response.json()) == 1
+
+def test_deregister_removes_from_student_and_course_views(client):
+    student_id, admin_id, course_id = setup_data(client)
+    student_headers = {"X-User-Role": "student", "X-User-Id": str(student_id)}
+    admin_headers = {"X-User-Role": "admin", "X-User-Id": str(admin_id)}
+
+    enroll_res = client.post("/enrollments", json={"user_id": student_id, "course_id": course_id}, headers=student_headers)
+    client.delete(f"/enrollments/{enroll_res.json()['id']}", headers=student_headers)
+
+    assert client.get(f"/students/{student_id}/enrollments", headers=student_headers).json() == []
+    assert client.get(f"/courses/{course_id}/enrollments", headers=admin_headers).json() == []
@@ -0,0 +1,59 @@
+import gzip
+import json
+
+def _seed(client, admin_headers):
+    for i in range(3):
+        client.post("/users", json={"name": f"User {i}", "email": f"user{i}@example.com", "role": "student"})
+        client.post("/courses", json={"title": f"Course {i}", "code": f"C{i}"}, headers=admin_headers)
+    for user_id in range(1, 4):
+        client.post("/enrollments", json={"user_id": user_id, "course_id": 1},
+                    headers={"X-User-Role": "student", "X-User-Id": str(user_id)})
+
+def _lines(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+def test_export_users_ndjson(client, admin_headers):
+    _seed(client, admin_headers)
+    response = client.get("/export/users", headers=admin_headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert _lines(response) == client.get("/users").json()
+
+def test_export_courses_reflects_updates(client, admin_headers):
+    _seed(client, admin_headers)
+    client.put("/courses/2", json={"title": "Renamed", "code": "C2-NEW"}, headers=admin_headers)
+    client.delete("/courses/3", headers=admin_headers)
+    rows = _lines(client.get("/export/courses", headers=admin_headers))
+    assert rows == [
+        {"id": 1, "title": "Course 0", "code": "C0", "capacity": None},
+        {"id": 2, "title": "Renamed", "code": "C2-NEW", "capacity": None},
+    ]
+
+def test_export_enrollments_gzip(client, admin_headers):
+    _seed(client, admin_headers)
+    response = client.get("/export/enrollments?gzip=true", headers=admin_headers)
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    # The client transparently decodes; the raw body must be valid gzip too
+    assert [row["user_id"] for row in _lines(response)] == [1, 2, 3]
+
+def test_export_large_table_streams_in_chunks(client, admin_headers):
+    for i in range(1200):
+        client.post("/users", json={"name": f"User {i}", "email": f"user{i}@example.com", "role": "student"})
+    with client.stream("GET", "/export/users?gzip=true", headers=admin_headers) as response:
+        raw = b"".join(response.iter_raw())
+    rows = [json.loads(line) for line in gzip.decompress(raw).splitlines()]
+    assert [row["id"] for row in rows] == list(range(1, 1201))
+
+def test_export_requires_admin(client, student_headers):
+    assert client.get("/export/users", headers=student_headers).status_code == 403
+    assert client.get("/export/enrollments").status_code == 401
+
+def test_export_snapshot_ignores_later_writes(client, admin_headers):
+    from app.db import db
+    _seed(client, admin_headers)
+    rows = db.export_courses()
+    first = next(rows)
+    client.post("/courses", json={"title": "Late", "code": "LATE"}, headers=admin_headers)
+    client.put("/courses/1", json={"title": "Changed", "code": "C0"}, headers=admin_headers)
+    assert [(c.id, c.title) for c in [first, *rows]] == [(1, "Course 0"), (2, "Course 1"), (3, "Course 2")]
@@ -0,0 +1,215 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.idempotency import IdempotencyStore, SharedIdempotencyStore, REPLAYED_HEADER
+from app.models import User
+from app.sqlite_db import SQLiteDB
+
+def _seed(client, admin_headers, capacity=None):
+    client.post("/users", json={"name": "A", "email": "a@example.com", "role": "student"})
+    client.post("/users", json={"name": "B", "email": "b@example.com", "role": "student"})
+    client.post("/courses", json={"title": "Math", "code": "MATH", "capacity": capacity}, headers=admin_headers)
+
+def test_enrollment_retry_replays_first_response(client, admin_headers, student_headers_for):
+    _seed(client, admin_headers)
+    body = {"user_id": 1, "course_id": 1}
+    first = client.post("/enrollments", json=body, headers=student_headers_for(1, "k1"))
+    assert first.status_code == 201
+    assert REPLAYED_HEADER not in first.headers
+    retry = client.post("/enrollments", json=body, headers=student_headers_for(1, "k1"))
+    assert retry.status_code == 201
+    assert retry.json() == first.json()
+    assert retry.headers[REPLAYED_HEADER] == "true"
+    # Without the key it really is a second attempt
+    assert client.post("/enrollments", json=body, headers=student_headers_for(1)).status_code == 400
+    assert len(client.get("/courses/1/enrollments", headers=admin_headers).json()) == 1
+
+def test_key_reused_with_other_request_is_rejected(client, admin_headers, student_headers_for):
+    _seed(client, admin_headers)
+    client.post("/courses", json={"title": "Art", "code": "ART"}, headers=admin_headers)
+    assert client.post("/enrollments", json={"user_id": 1, "course_id": 1}, headers=student_headers_for(1, "k")).status_code == 201
+    response = client.post("/enrollments", json={"user_id": 1, "course_id": 2}, headers=student_headers_for(1, "k"))
+    assert response.status_code == 422
+    response = client.post("/enrollments?waitlist=true", json={"user_id": 1, "course_id": 1}, headers=student_headers_for(1, "k"))
+    assert response.status_code == 422
+
+def test_keys_are_scoped_per_student(client, admin_headers, student_headers_for):
+    _seed(client, admin_headers)
+    assert client.post("/enrollments", json={"user_id": 1, "course_id": 1}, headers=student_headers_for(1, "k")).status_code == 201
+    response = client.post("/enrollments", json={"user_id": 2, "course_id": 1}, headers=student_headers_for(2, "k"))
+    assert response.status_code == 201
+    assert REPLAYED_HEADER not in response.headers
+
+def test_errors_and_waitlist_answers_are_replayed(client, admin_headers, student_headers_for):
+    _seed(client, admin_headers, capacity=1)
+    client.post("/enrollments", json={"user_id": 1, "course_id": 1}, headers=student_headers_for(1))
+    body = {"user_id": 2, "course_id": 1}
+    full = client.post("/enrollments", json=body, headers=student_headers_for(2, "full"))
+    assert full.status_code == 409
+    # The seat that frees up later does not change what this attempt answered
+    client.delete("/enrollments/1", headers=admin_headers)
+    replay = client.post("/enrollments", json=body, headers=student_headers_for(2, "full"))
+    assert (replay.status_code, replay.json()) == (409, full.json())
+    assert replay.headers[REPLAYED_HEADER] == "true"
+
+    client.post("/enrollments", json={"user_id": 1, "course_id": 1}, headers=student_headers_for(1))
+    client.post("/users", json={"name": "C", "email": "c@example.com", "role": "student"})
+    queued = client.post("/enrollments?waitlist=true", json={"user_id": 3, "course_id": 1}, headers=student_headers_for(3, "q"))
+    assert queued.status_code == 202
+    replay = client.post("/enrollments?waitlist=true", json={"user_id": 3, "course_id": 1}, headers=student_headers_for(3, "q"))
+    assert (replay.status_code, replay.json()) == (202, queued.json())
+
+def test_create_user_and_course_replay(client, admin_headers, student_headers_for):
+    body = {"name": "A", "email": "a@example.com", "role": "student"}
+    headers = {"Idempotency-Key": "u1"}
+    first = client.post("/users", json=body, headers=headers)
+    retry = client.post("/users", json=body, headers=headers)
+    assert first.status_code == retry.status_code == 201
+    assert retry.json() == first.json() == {"id": 1, **body}
+    assert client.post("/users", json=body).status_code == 400
+
+    course = {"title": "Math", "code": "MATH"}
+    first = client.post("/courses", json=course, headers={**admin_headers, "Idempotency-Key": "c1"})
+    retry = client.post("/courses", json=course, headers={**admin_headers, "Idempotency-Key": "c1"})
+    assert first.status_code == retry.status_code == 201
+    assert retry.json() == first.json()
+    assert len(client.get("/courses").json()) == 1
+    # Authorization is still checked before anything is replayed
+    assert client.post("/courses", json=course, headers=student_headers_for(2, "c1")).status_code == 403
+
+def test_key_length_is_bounded(client):
+    body = {"name": "A", "email": "a@example.com", "role": "student"}
+    assert client.post("/users", json=body, headers={"Idempotency-Key": "x" * 256}).status_code == 422
+
+def _user(user_id=1):
+    return User(id=user_id, name="A", email="a@example.com", role="student")
+
+def test_concurrent_duplicates_run_once():
+    store = IdempotencyStore(16, 60)
+    calls = []
+
+    async def execute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return _user()
+
+    async def main():
+        return await asyncio.gather(*(store.run(("k",), "f", execute, User, 201) for _ in range(10)))
+
+    responses = asyncio.run(main())
+    assert len(calls) == 1
+    assert {r.body for r in responses} == {responses[0].body}
+    assert sum(REPLAYED_HEADER.lower() in r.headers for r in responses) == 9
+
+def test_failed_run_is_not_stored():
+    store = IdempotencyStore(16, 60)
+    attempts = []
+
+    async def execute():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("storage down")
+        return _user()
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(store.run(("k",), "f", execute, User, 201))
+    assert asyncio.run(store.run(("k",), "f", execute, User, 201)).status_code == 201
+    assert len(attempts) == 2
+
+def test_outcomes_expire_and_are_bounded():
+    calls = []
+
+    async def execute():
+        calls.append(1)
+        raise HTTPException(status_code=400, detail="nope")
+
+    def run(store, key):
+        with pytest.raises(HTTPException):
+            asyncio.run(store.run((key,), "f", execute))
+
+    expiring = IdempotencyStore(16, 0)
+    run(expiring, "k")
+    run(expiring, "k")
+    assert len(calls) == 2
+
+    bounded = IdempotencyStore(2, 60)
+    for key in ("a", "b", "c", "a"):
+        run(bounded, key)
+    assert len(bounded) == 2
+    # "a" was evicted by "c", so it ran again
+    assert len(calls) == 6
+
+@pytest.fixture
+def shared(tmp_path):
+    # Two handles on one database file, as two worker processes would have
+    path = str(tmp_path / "shared.db")
+    storages = [SQLiteDB(path, pool_size=1), SQLiteDB(path, pool_size=1)]
+    yield storages
+    for storage in storages:
+        storage.close()
+
+@pytest.fixture
+def workers(shared):
+    return [SharedIdempotencyStore(storage, 60, poll_interval=0.001) for storage in shared]
+
+def test_shared_store_replays_across_workers(workers):
+    first, second = workers
+    calls = []
+
+    async def execute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return _user()
+
+    async def main():
+        # The copy on the second worker waits for the first one's outcome
+        return await asyncio.gather(
+            first.run(("users", "k"), "f", execute, User, 201),
+            second.run(("users", "k"), "f", execute, User, 201),
+        )
+
+    original, waited = asyncio.run(main())
+    assert len(calls) == 1
+    assert (waited.status_code, waited.body) == (original.status_code, original.body)
+    assert waited.headers[REPLAYED_HEADER] == "true"
+    replay = asyncio.run(second.run(("users", "k"), "f", execute, User, 201))
+    assert replay.body == original.body and len(calls) == 1
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(second.run(("users", "k"), "other", execute, User, 201))
+    assert error.value.status_code == 422
+    # Scoped: the same key on another route runs
+    asyncio.run(second.run(("courses", "k"), "f", execute, User, 201))
+    assert len(calls) == 2
+
+def test_shared_store_replays_errors_and_forgets_failures(workers):
+    first, second = workers
+    attempts = []
+
+    async def fail():
+        attempts.append(1)
+        raise RuntimeError("storage down")
+
+    async def reject():
+        attempts.append(1)
+        raise HTTPException(status_code=409, detail="Course is full", headers={"X-Reason": "full"})
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(first.run(("k",), "f", fail))
+    # The failed claim was released, so the retry runs
+    for store in (second, first):
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(store.run(("k",), "f", reject))
+        assert (error.value.status_code, error.value.detail) == (409, "Course is full")
+    assert error.value.headers == {"X-Reason": "full", REPLAYED_HEADER: "true"}
+    assert len(attempts) == 2
+
+def test_shared_store_takes_over_abandoned_claims(shared, workers):
+    # A worker died after claiming the key; its claim lapsed a second ago
+    now = time.time()
+    assert shared[0].claim_request("[]", "k", "f", now - 1, now - 2) is None
+    response = asyncio.run(workers[1].run(("k",), "f", lambda: asyncio.sleep(0, _user()), User, 201))
+    assert response.status_code == 201 and REPLAYED_HEADER not in response.headers
+
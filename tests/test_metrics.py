@@ -0,0 +1,73 @@
+import threading
+import time
+
+import pytest
+
+from app.metrics import Metrics, LATENCY_BUCKETS
+from app.profiler import sample_stacks
+
+def _samples(text):
+    return {line.rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1]) for line in text.splitlines() if not line.startswith("#")}
+
+def test_requests_are_labelled_by_route_template(client, admin_headers):
+    client.post("/courses", json={"title": "Algebra", "code": "MATH101"}, headers=admin_headers)
+    client.get("/courses/1")
+    client.get("/courses/1")
+    client.get("/courses/99")
+    client.get("/no/such/path")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    samples = _samples(response.text)
+    assert samples['http_requests_total{method="GET",route="/courses/{course_id}",status="200"}'] == 2
+    assert samples['http_requests_total{method="GET",route="/courses/{course_id}",status="404"}'] == 1
+    assert samples['http_requests_total{method="GET",route="<unmatched>",status="404"}'] == 1
+    assert samples['http_request_duration_seconds_count{method="GET",route="/courses/{course_id}"}'] == 3
+    assert samples['http_request_duration_seconds_bucket{method="GET",route="/courses/{course_id}",le="+Inf"}'] == 3
+    # One storage call for the create, one per uncached read
+    assert samples['storage_operation_duration_seconds_count{operation="create_course"}'] == 1
+    assert samples['storage_operation_duration_seconds_count{operation="get_course"}'] == 2
+    assert samples['storage_rows{table="courses"}'] == 1
+    assert samples['storage_rows{table="users"}'] == 0
+
+def test_histogram_buckets_are_cumulative():
+    metrics = Metrics()
+    for seconds in (0.000001, 0.0003, 0.0003, 10):
+        metrics.observe_storage("get_user", seconds)
+    metrics.observe_storage("create_user", 0.001, failed=True)
+    samples = _samples(metrics.render())
+    bucket = 'storage_operation_duration_seconds_bucket{operation="get_user",le="%s"}'
+    assert samples[bucket % LATENCY_BUCKETS[0]] == 1
+    assert samples[bucket % 0.00025] == 1
+    assert samples[bucket % 0.0005] == 3
+    assert samples[bucket % "+Inf"] == 4
+    assert samples['storage_operation_duration_seconds_sum{operation="get_user"}'] == pytest.approx(10.000601)
+    assert samples['storage_operation_errors_total{operation="create_user"}'] == 1
+
+def test_profile_is_admin_only(client, student_headers):
+    assert client.get("/admin/profile?seconds=0.01", headers=student_headers).status_code == 403
+
+def test_profile_returns_collapsed_stacks(client, admin_headers):
+    response = client.get("/admin/profile?seconds=0.05&interval_ms=1", headers=admin_headers)
+    assert response.status_code == 200
+    stack, count = response.text.splitlines()[0].rsplit(" ", 1)
+    assert int(count) >= 1
+    assert ";" in stack
+
+def test_sampler_sees_busy_threads():
+    stop = threading.Event()
+
+    def spin_in_storage_call():
+        while not stop.is_set():
+            time.sleep(0.0005)
+
+    worker = threading.Thread(target=spin_in_storage_call, name="busy-worker")
+    worker.start()
+    try:
+        stacks = sample_stacks(0.05, 0.002)
+    finally:
+        stop.set()
+        worker.join()
+    busy = [stack for stack in stacks if stack.startswith("busy-worker;")]
+    assert busy and all("spin_in_storage_call (tests/test_metrics.py:" in stack for stack in busy)
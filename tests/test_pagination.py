@@ -0,0 +1,116 @@
+import random
+
+from app.db import KeyOrder
+
+def _create_users(client, count):
+    for i in range(count):
+        client.post("/users", json={"name": f"User {i}", "email": f"user{i}@example.com", "role": "student"})
+
+def _collect(client, url, headers=None):
+    ids, cursor = [], None
+    while True:
+        sep = "&" if "?" in url else "?"
+        response = client.get(url + (f"{sep}cursor={cursor}" if cursor else ""), headers=headers)
+        ids += [row["id"] for row in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return ids
+
+def test_users_paginated(client):
+    _create_users(client, 5)
+    response = client.get("/users?limit=2")
+    assert [u["id"] for u in response.json()] == [1, 2]
+    assert response.headers["X-Next-Cursor"] == "2"
+
+    response = client.get("/users?limit=2&cursor=2")
+    assert [u["id"] for u in response.json()] == [3, 4]
+
+    response = client.get("/users?limit=2&cursor=4")
+    assert [u["id"] for u in response.json()] == [5]
+    assert "X-Next-Cursor" not in response.headers
+
+def test_last_full_page_has_no_cursor(client):
+    _create_users(client, 4)
+    response = client.get("/users?limit=2&cursor=2")
+    assert len(response.json()) == 2
+    assert "X-Next-Cursor" not in response.headers
+
+def test_cursor_stable_across_deletes_and_inserts(client, admin_headers):
+    for i in range(6):
+        client.post("/courses", json={"title": f"Course {i}", "code": f"C{i}"}, headers=admin_headers)
+    first_page = client.get("/courses?limit=3")
+    cursor = first_page.headers["X-Next-Cursor"]
+
+    # Delete a row already served and one not yet served, then insert a new one
+    client.delete("/courses/2", headers=admin_headers)
+    client.delete("/courses/5", headers=admin_headers)
+    client.post("/courses", json={"title": "Course new", "code": "CNEW"}, headers=admin_headers)
+
+    second_page = client.get(f"/courses?limit=3&cursor={cursor}")
+    assert [c["id"] for c in second_page.json()] == [4, 6, 7]
+
+def test_walk_all_pages(client):
+    _create_users(client, 25)
+    assert _collect(client, "/users?limit=7") == list(range(1, 26))
+
+def test_limit_bounds(client):
+    assert client.get("/users?limit=0").status_code == 422
+    assert client.get("/users?limit=1001").status_code == 422
+
+def test_field_projection(client):
+    _create_users(client, 3)
+    response = client.get("/users?fields=id,email&limit=2")
+    assert response.status_code == 200
+    assert response.json() == [{"id": 1, "email": "user0@example.com"}, {"id": 2, "email": "user1@example.com"}]
+    assert response.headers["X-Next-Cursor"] == "2"
+
+def test_field_projection_unknown_field(client):
+    _create_users(client, 1)
+    response = client.get("/users?fields=id,password")
+    assert response.status_code == 400
+
+def test_course_enrollments_paginated(client, admin_headers):
+    _create_users(client, 5)
+    client.post("/courses", json={"title": "Math 101", "code": "MATH101"}, headers=admin_headers)
+    for user_id in range(1, 6):
+        client.post("/enrollments", json={"user_id": user_id, "course_id": 1},
+                    headers={"X-User-Role": "student", "X-User-Id": str(user_id)})
+
+    assert _collect(client, "/courses/1/enrollments?limit=2", admin_headers) == [1, 2, 3, 4, 5]
+    response = client.get("/courses/1/enrollments?fields=user_id", headers=admin_headers)
+    assert response.json() == [{"user_id": i} for i in range(1, 6)]
+
+def test_student_enrollments_paginated(client, admin_headers):
+    _create_users(client, 1)
+    for i in range(3):
+        client.post("/courses", json={"title": f"Course {i}", "code": f"C{i}"}, headers=admin_headers)
+        client.post("/enrollments", json={"user_id": 1, "course_id": i + 1},
+                    headers={"X-User-Role": "student", "X-User-Id": "1"})
+
+    student_headers = {"X-User-Role": "student", "X-User-Id": "1"}
+    assert _collect(client, "/students/1/enrollments?limit=1", student_headers) == [1, 2, 3]
+    assert _collect(client, "/enrollments?limit=2", admin_headers) == [1, 2, 3]
+
+def test_key_order_across_blocks(monkeypatch):
+    monkeypatch.setattr(KeyOrder, "BLOCK", 4)
+    order = KeyOrder()
+    order.extend(list(range(1, 31)))
+    for key in (45, 31, 38):
+        order.add(key)
+    live = set(range(1, 31)) | {31, 38, 45}
+    rng = random.Random(7)
+    for key in rng.sample(sorted(live), 20) + [99]:
+        order.remove(key)
+        live.discard(key)
+    # Re-adding a key below the maximum lands inside a block
+    order.add(3)
+    live.add(3)
+    expected = sorted(live)
+    for after_id in (0, 3, 17, 44, 45):
+        for count in (None, 1, 5, 50):
+            above = [k for k in expected if k > after_id]
+            assert order.after(after_id, count) == (above if count is None else above[:count])
+    assert len(order) == len(expected)
+    assert [order.rank(k) for k in expected] == list(range(1, len(expected) + 1))
+    assert order.rank(99) == 0 and order.rank(0) == 0
+
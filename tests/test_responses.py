@@ -0,0 +1,36 @@
+import pytest
+
+from app.config import settings
+
+@pytest.fixture
+def fast_responses(monkeypatch):
+    monkeypatch.setattr(settings, "fast_responses", True)
+
+def _seed(client, admin_headers):
+    for i in range(3):
+        client.post("/users", json={"name": f"Zoë {i}", "email": f"user{i}@example.com", "role": "student"})
+        client.post("/courses", json={"title": f"Course {i}", "code": f"C{i}"}, headers=admin_headers)
+
+def _snapshot(client):
+    return [
+        client.get("/users"),
+        client.get("/users?limit=2"),
+        client.get("/users/2"),
+        client.get("/courses"),
+        client.get("/courses/1"),
+    ]
+
+def test_fast_responses_match_validated_responses(client, admin_headers, monkeypatch):
+    _seed(client, admin_headers)
+    regular = _snapshot(client)
+    monkeypatch.setattr(settings, "fast_responses", True)
+    fast = _snapshot(client)
+    for slow_response, fast_response in zip(regular, fast):
+        assert fast_response.status_code == slow_response.status_code
+        assert fast_response.content == slow_response.content
+        assert fast_response.headers["content-type"] == slow_response.headers["content-type"]
+        assert fast_response.headers.get("X-Next-Cursor") == slow_response.headers.get("X-Next-Cursor")
+
+def test_fast_responses_keep_errors(client, fast_responses):
+    assert client.get("/users/42").status_code == 404
+    assert client.get("/users?fields=nope").status_code == 400
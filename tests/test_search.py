@@ -0,0 +1,187 @@
+import random
+import sqlite3
+
+import pytest
+
+from app.db import InMemoryDB
+from app.models import UserCreate, CourseCreate
+from app.search import PrefixIndex, TokenIndex, token_match
+from app.sqlite_db import SQLiteDB
+
+def test_prefix_index_across_blocks(monkeypatch):
+    monkeypatch.setattr(PrefixIndex, "BLOCK", 4)
+    index = PrefixIndex()
+    keys = [f"{random.choice('abc')}{i}" for i in range(200)]
+    for row_id, key in enumerate(keys):
+        index.add(key.upper() if row_id % 2 else key, row_id)
+    for row_id in range(0, 200, 3):
+        index.remove(keys[row_id], row_id)
+    live = {row_id: key for row_id, key in enumerate(keys) if row_id % 3}
+    assert len(index) == len(live)
+    for prefix in ["a", "B1", "c19", "", "d"]:
+        expected = {row_id for row_id, key in live.items() if key.startswith(prefix.lower())}
+        assert index.match(prefix) == expected
+
+def test_token_index_matches_token_match():
+    titles = ["Linear Algebra", "Algorithms", "Abstract Algebra II", "Linguistics", "Data Structures"]
+    index = TokenIndex()
+    for row_id, title in enumerate(titles):
+        index.add(title, row_id)
+    index.remove("Linguistics", 3)
+    for query in ["alg", "LIN alg", "algebra ii", "struct data", "xyz", "a"]:
+        expected = {i for i, title in enumerate(titles) if i != 3 and token_match(title, query)}
+        assert index.match(query) == expected
+
+@pytest.fixture(params=["memory", "sqlite"])
+def storage(request, tmp_path):
+    if request.param == "memory":
+        yield InMemoryDB()
+    else:
+        sqlite = SQLiteDB(str(tmp_path / "enrollment.db"), pool_size=2)
+        yield sqlite
+        sqlite.close()
+
+def test_search_courses(storage):
+    for title, code in [("Linear Algebra", "MATH101"), ("Algorithms", "CS201"), ("Abstract Algebra", "MATH301")]:
+        storage.create_course(CourseCreate(title=title, code=code))
+    assert [c.id for c in storage.search_courses("alg")] == [1, 2, 3]
+    assert [c.id for c in storage.search_courses("lin ALG")] == [1]
+    assert [c.id for c in storage.search_courses("gebra")] == []
+    assert [c.id for c in storage.search_courses(code_prefix="math")] == [1, 3]
+    assert [c.id for c in storage.search_courses("algebra", code_prefix="MATH3")] == [3]
+    assert [c.id for c in storage.search_courses("alg", after_id=1, limit=1)] == [2]
+
+def test_course_indexes_follow_updates_and_deletes(storage):
+    storage.create_course(CourseCreate(title="Linear Algebra", code="MATH101"))
+    storage.create_course(CourseCreate(title="Algorithms", code="CS201"))
+    storage.update_course(1, CourseCreate(title="Calculus", code="CALC101"))
+    assert [c.id for c in storage.search_courses("alg")] == [2]
+    assert [c.id for c in storage.search_courses("calc")] == [1]
+    assert storage.search_courses(code_prefix="MATH") == []
+    storage.delete_course(2)
+    assert storage.search_courses("alg") == []
+    assert storage.search_courses(code_prefix="CS") == []
+
+def test_search_users(storage):
+    storage.create_users([
+        UserCreate(name="Ada Lovelace", email="ada@example.com", role="student"),
+        UserCreate(name="Alan Turing", email="alan@example.org", role="student"),
+        UserCreate(name="Grace Hopper", email="grace@example.com", role="student"),
+    ])
+    assert [u.id for u in storage.search_users(name_prefix="a")] == [1, 2]
+    assert [u.id for u in storage.search_users(email_prefix="GRACE@")] == [3]
+    assert [u.id for u in storage.search_users(name_prefix="a", email_prefix="ada")] == [1]
+    assert [u.id for u in storage.search_users(name_prefix="lovelace")] == []
+
+def test_search_folds_non_ascii_case(storage):
+    storage.create_user(UserCreate(name="Émile Zola", email="ÉMILE@example.com", role="student"))
+    storage.create_course(CourseCreate(title="Große Ökonomie", code="ÖKO-1"))
+    assert [u.id for u in storage.search_users(name_prefix="émile")] == [1]
+    assert [u.id for u in storage.search_users(email_prefix="émile@")] == [1]
+    assert [c.id for c in storage.search_courses(code_prefix="öko")] == [1]
+    # casefold() maps ß to ss, on both sides
+    assert [c.id for c in storage.search_courses("gross ÖKON")] == [1]
+    storage.update_course(1, CourseCreate(title="Ärztliche Ethik", code="ÄRZ-1"))
+    assert [c.id for c in storage.search_courses("ärzt", code_prefix="ärz")] == [1]
+    assert storage.search_courses(code_prefix="öko") == []
+
+def test_backends_split_words_alike(tmp_path):
+    titles = [
+        "intro_to_ml", "C++ & C#: a tour", "Rock'n'roll — 1950s", "e\u0301tudes (NFD)",
+        "Data-Driven Design", "数据 科学", "x86_64 Assembly", "Émile's ½-course", "naïve\u00a0Bayes",
+    ]
+    queries = ["ml", "to", "intro_to", "c", "tour", "roll", "1950", "étu", "e\u0301", "driven d", "数据", "64",
+               "x86_", "s", "½", "bayes", "naïve", "n'r"]
+    memory, sqlite = InMemoryDB(), SQLiteDB(str(tmp_path / "enrollment.db"), pool_size=1)
+    try:
+        for i, title in enumerate(titles):
+            for storage in (memory, sqlite):
+                storage.create_course(CourseCreate(title=title, code=f"C{i}"))
+        for query in queries:
+            found = [c.id for c in memory.search_courses(query)]
+            assert [c.id for c in sqlite.search_courses(query)] == found, query
+            assert found == [i + 1 for i, title in enumerate(titles) if token_match(title, query)], query
+        assert [c.id for c in memory.search_courses("ml")] == [1]
+    finally:
+        sqlite.close()
+
+def test_sqlite_reindexes_titles_split_by_fts(tmp_path):
+    # The previous index let FTS5's unicode61 tokenizer split folded titles
+    path = str(tmp_path / "enrollment.db")
+    storage = SQLiteDB(path, pool_size=1)
+    storage.create_course(CourseCreate(title="Intro_to_ML", code="ML1"))
+    with storage._pool.connection() as conn:
+        conn.execute("UPDATE courses SET title_key = casefold(title)")
+        conn.execute("DROP TABLE courses_fts")
+        conn.execute(
+            "CREATE VIRTUAL TABLE courses_fts USING fts5(title_key, content='courses', content_rowid='id', "
+            "tokenize='unicode61 remove_diacritics 0')"
+        )
+        conn.execute("INSERT INTO courses_fts(courses_fts) VALUES ('rebuild')")
+    storage.close()
+    reopened = SQLiteDB(path, pool_size=1)
+    assert [c.id for c in reopened.search_courses("intro ml")] == [1]
+    reopened.close()
+
+def test_sqlite_indexes_existing_courses(tmp_path):
+    path = str(tmp_path / "enrollment.db")
+    storage = SQLiteDB(path, pool_size=1)
+    storage.create_course(CourseCreate(title="Linear Algebra", code="MATH101"))
+    with storage._pool.connection() as conn:
+        conn.execute("DROP TABLE courses_fts")
+    storage.close()
+    reopened = SQLiteDB(path, pool_size=1)
+    assert [c.id for c in reopened.search_courses("algebra")] == [1]
+    reopened.close()
+
+def test_sqlite_upgrades_case_insensitive_indexes(tmp_path):
+    # A database from before the search keys: NOCASE indexes and a word index over the raw titles
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, email TEXT NOT NULL UNIQUE, role TEXT NOT NULL);
+        CREATE TABLE courses (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, code TEXT NOT NULL UNIQUE);
+        CREATE INDEX users_name_nocase ON users(name COLLATE NOCASE);
+        CREATE VIRTUAL TABLE courses_fts USING fts5(title, content='courses', content_rowid='id');
+        CREATE TRIGGER courses_fts_insert AFTER INSERT ON courses BEGIN
+            INSERT INTO courses_fts(rowid, title) VALUES (new.id, new.title);
+        END;
+        INSERT INTO users (name, email, role) VALUES ('Émile Zola', 'emile@example.com', 'student');
+        INSERT INTO courses (title, code) VALUES ('Große Ökonomie', 'ÖKO-1');
+    """)
+    conn.close()
+    storage = SQLiteDB(path, pool_size=1)
+    assert [u.id for u in storage.search_users(name_prefix="ÉMILE")] == [1]
+    assert [c.id for c in storage.search_courses("gross", code_prefix="öko")] == [1]
+    storage.create_course(CourseCreate(title="Ökologie", code="ÖKO-2"))
+    assert [c.id for c in storage.search_courses("ÖKO")] == [1, 2]
+    with storage._pool.connection() as conn:
+        assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'users_name_nocase'").fetchone() is None
+    storage.close()
+
+def test_search_routes(client, admin_headers):
+    client.post("/courses:batch", json=[
+        {"title": "Linear Algebra", "code": "MATH101"},
+        {"title": "Algorithms", "code": "CS201"},
+        {"title": "Abstract Algebra", "code": "MATH301"},
+    ], headers=admin_headers)
+    client.post("/users", json={"name": "Ada Lovelace", "email": "ada@example.com", "role": "student"})
+
+    response = client.get("/courses/search?q=alg&limit=2")
+    assert response.status_code == 200
+    assert [c["id"] for c in response.json()] == [1, 2]
+    assert response.headers["X-Next-Cursor"] == "2"
+    assert [c["id"] for c in client.get("/courses/search?q=algebra&code=math").json()] == [1, 3]
+    assert [u["id"] for u in client.get("/users/search?email=ADA").json()] == [1]
+
+    assert client.get("/courses/search").status_code == 400
+    assert client.get("/users/search").status_code == 400
+    assert client.get("/courses/search?q=").status_code == 422
+
+def test_search_route_sees_course_changes(client, admin_headers):
+    client.post("/courses", json={"title": "Linear Algebra", "code": "MATH101"}, headers=admin_headers)
+    assert len(client.get("/courses/search?q=algebra").json()) == 1
+    client.put("/courses/1", json={"title": "Calculus", "code": "MATH101"}, headers=admin_headers)
+    assert client.get("/courses/search?q=algebra").json() == []
+    client.delete("/courses/1", headers=admin_headers)
+    assert client.get("/courses/search?code=MATH").json() == []
@@ -0,0 +1,142 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.models import UserCreate, CourseCreate, EnrollmentCreate
+from app.sqlite_db import SQLiteDB
+from app.storage import CourseFullError, DuplicateError, NotFoundError
+
+@pytest.fixture
+def sqlite_db(tmp_path):
+    storage = SQLiteDB(str(tmp_path / "enrollment.db"), pool_size=4)
+    yield storage
+    storage.close()
+
+def _seed(storage):
+    student = storage.create_user(UserCreate(name="Student", email="student@example.com", role="student"))
+    course = storage.create_course(CourseCreate(title="Math 101", code="MATH101"))
+    return student, course
+
+def test_uses_wal_mode(sqlite_db):
+    with sqlite_db._pool.connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+def test_create_and_lookup(sqlite_db):
+    student, course = _seed(sqlite_db)
+    assert sqlite_db.get_user(student.id) == student
+    assert sqlite_db.get_user_by_email("student@example.com") == student
+    assert sqlite_db.get_course_by_code("MATH101") == course
+    assert sqlite_db.list_users() == [student]
+
+def test_uniqueness_rules(sqlite_db):
+    student, course = _seed(sqlite_db)
+    with pytest.raises(DuplicateError):
+        sqlite_db.create_user(UserCreate(name="Other", email="student@example.com", role="admin"))
+    with pytest.raises(DuplicateError):
+        sqlite_db.create_course(CourseCreate(title="Other", code="MATH101"))
+    sqlite_db.create_enrollment(EnrollmentCreate(user_id=student.id, course_id=course.id))
+    with pytest.raises(DuplicateError):
+        sqlite_db.create_enrollment(EnrollmentCreate(user_id=student.id, course_id=course.id))
+
+def test_enrollment_requires_user_and_course(sqlite_db):
+    student, course = _seed(sqlite_db)
+    with pytest.raises(NotFoundError) as exc:
+        sqlite_db.create_enrollment(EnrollmentCreate(user_id=99, course_id=course.id))
+    assert exc.value.entity == "user"
+    with pytest.raises(NotFoundError) as exc:
+        sqlite_db.create_enrollment(EnrollmentCreate(user_id=student.id, course_id=99))
+    assert exc.value.entity == "course"
+
+def test_update_course_code(sqlite_db):
+    _, course = _seed(sqlite_db)
+    other = sqlite_db.create_course(CourseCreate(title="History", code="HIST101"))
+    with pytest.raises(DuplicateError):
+        sqlite_db.update_course(other.id, CourseCreate(title="History", code="MATH101"))
+    updated = sqlite_db.update_course(course.id, CourseCreate(title="Math", code="MATH101-A"))
+    assert sqlite_db.get_course_by_code("MATH101-A") == updated
+    assert sqlite_db.get_course_by_code("MATH101") is None
+    with pytest.raises(NotFoundError):
+        sqlite_db.update_course(99, CourseCreate(title="Nope", code="NOPE"))
+
+def test_delete_course_cascades_and_ids_not_reused(sqlite_db):
+    student, course = _seed(sqlite_db)
+    sqlite_db.create_enrollment(EnrollmentCreate(user_id=student.id, course_id=course.id))
+    sqlite_db.delete_course(course.id)
+    assert sqlite_db.list_enrollments() == []
+    assert sqlite_db.get_student_enrollments(student.id) == []
+    replacement = sqlite_db.create_course(CourseCreate(title="Math 101", code="MATH101"))
+    assert replacement.id != course.id
+
+def test_shared_file_between_instances(tmp_path):
+    # Two storages on one file stand in for two worker processes
+    path = str(tmp_path / "shared.db")
+    first, second = SQLiteDB(path), SQLiteDB(path)
+    user = first.create_user(UserCreate(name="Alice", email="alice@example.com", role="student"))
+    assert second.get_user(user.id) == user
+    with pytest.raises(DuplicateError):
+        second.create_user(UserCreate(name="Alice", email="alice@example.com", role="student"))
+    first.close()
+    second.close()
+
+def test_concurrent_enrollments(sqlite_db):
+    _, course = _seed(sqlite_db)
+    users = [sqlite_db.create_user(UserCreate(name=f"U{i}", email=f"u{i}@example.com", role="student")) for i in range(100)]
+
+    def enroll(user):
+        try:
+            return sqlite_db.create_enrollment(EnrollmentCreate(user_id=user.id, course_id=course.id))
+        except DuplicateError:
+            return None
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(enroll, users * 2))
+    created = [r for r in results if r is not None]
+    assert len(created) == 100
+    assert len({e.id for e in created}) == 100
+
+def test_keyset_pagination(sqlite_db):
+    for i in range(5):
+        sqlite_db.create_user(UserCreate(name=f"U{i}", email=f"u{i}@example.com", role="student"))
+    assert [u.id for u in sqlite_db.list_users(limit=2)] == [1, 2]
+    assert [u.id for u in sqlite_db.list_users(after_id=2, limit=2)] == [3, 4]
+    assert [u.id for u in sqlite_db.list_users(after_id=4)] == [5]
+
+def test_migrates_databases_without_capacity(tmp_path):
+    import sqlite3
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, email TEXT NOT NULL UNIQUE, role TEXT NOT NULL);
+        CREATE TABLE courses (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, code TEXT NOT NULL UNIQUE);
+        CREATE TABLE enrollments (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, course_id INTEGER NOT NULL, UNIQUE (user_id, course_id));
+        INSERT INTO users (name, email, role) VALUES ('A', 'a@example.com', 'student'), ('B', 'b@example.com', 'student');
+        INSERT INTO courses (title, code) VALUES ('Math', 'MATH');
+        INSERT INTO enrollments (user_id, course_id) VALUES (1, 1);
+    """)
+    conn.close()
+
+    storage = SQLiteDB(path, pool_size=1)
+    try:
+        assert storage.get_course(1).capacity is None
+        storage.update_course(1, CourseCreate(title="Math", code="MATH", capacity=1))
+        # The backfilled seat count already includes the existing enrollment
+        with pytest.raises(CourseFullError):
+            storage.create_enrollment(EnrollmentCreate(user_id=2, course_id=1))
+    finally:
+        storage.close()
+
+def test_slow_exports_leave_the_pool_free(tmp_path):
+    storage = SQLiteDB(str(tmp_path / "enrollment.db"), pool_size=1)
+    student, _ = _seed(storage)
+    # More half-read exports than pooled connections, as from slow clients
+    exports = [storage.export_users() for _ in range(3)]
+    assert [next(export) for export in exports] == [student] * 3
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        assert pool.submit(storage.get_user, student.id).result(timeout=5) == student
+        # Each export keeps the snapshot it started from
+        pool.submit(storage.create_user, UserCreate(name="B", email="b@example.com", role="student")).result(timeout=5)
+    assert [list(export) for export in exports] == [[]] * 3
+    for export in exports:
+        export.close()
+    storage.close()
+
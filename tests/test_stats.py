@@ -0,0 +1,176 @@
+import asyncio
+import random
+import sqlite3
+from collections import Counter
+
+import pytest
+
+from app.db import InMemoryDB, db
+from app.durable_db import DurableMemoryDB
+from app.models import UserCreate, CourseCreate, EnrollmentCreate
+from app.sqlite_db import SQLiteDB
+from app.stats import RankedCounter
+
+def test_ranked_counter_matches_counter():
+    rng = random.Random(7)
+    ranked, reference = RankedCounter(), Counter()
+    for _ in range(2000):
+        key = rng.randrange(50)
+        delta = 1 if rng.random() < 0.7 or reference[key] == 0 else -1
+        ranked.add(key, delta)
+        reference[key] += delta
+    reference = +reference
+    assert ranked.as_dict() == dict(reference)
+    assert [count for _, count in ranked.top(10)] == sorted(reference.values(), reverse=True)[:10]
+    assert all(reference[key] == count for key, count in ranked.top(10))
+    assert ranked.histogram() == sorted(Counter(reference.values()).items())
+    assert ranked.top(0) == []
+
+@pytest.fixture(params=["memory", "sqlite", "durable"])
+def storage(request, tmp_path):
+    if request.param == "memory":
+        yield InMemoryDB()
+    elif request.param == "sqlite":
+        sqlite = SQLiteDB(str(tmp_path / "enrollment.db"), pool_size=2)
+        yield sqlite
+        sqlite.close()
+    else:
+        durable = DurableMemoryDB(str(tmp_path / "wal"))
+        yield durable
+        durable.close()
+
+def _populate(storage):
+    users = storage.create_users([UserCreate(name=f"S{i}", email=f"s{i}@example.com", role="student") for i in range(6)])
+    big = storage.create_course(CourseCreate(title="Big", code="BIG"))
+    small = storage.create_course(CourseCreate(title="Small", code="SMALL", capacity=2))
+    gone = storage.create_course(CourseCreate(title="Gone", code="GONE"))
+    storage.create_course(CourseCreate(title="Empty", code="EMPTY"))
+    storage.create_enrollments([EnrollmentCreate(user_id=u.id, course_id=big.id) for u in users])
+    for user in users[:3]:
+        storage.create_enrollment(EnrollmentCreate(user_id=user.id, course_id=small.id), waitlist=True)
+    storage.create_enrollment(EnrollmentCreate(user_id=users[0].id, course_id=gone.id))
+    # Deregistering from the full course promotes user 3 from its waitlist
+    storage.delete_enrollment(storage.get_course_enrollments(small.id)[0].id)
+    storage.delete_enrollment(storage.get_course_enrollments(big.id)[-1].id)
+    storage.delete_course(gone.id)
+
+def _dump(stats):
+    return stats.model_dump(exclude={"verified"})
+
+def test_counters_follow_every_write_path(storage):
+    _populate(storage)
+    stats = storage.enrollment_stats(top=3)
+    assert stats.enrollments == 7
+    assert stats.courses == 3
+    assert stats.students == 5
+    assert [(c.course_id, c.enrollments) for c in stats.top_courses] == [(1, 5), (2, 2)]
+    assert [(b.value, b.count) for b in stats.course_sizes] == [(0, 1), (2, 1), (5, 1)]
+    assert [(b.value, b.count) for b in stats.student_loads] == [(1, 3), (2, 2)]
+    assert stats.verified is None
+
+    recomputed = storage.enrollment_stats(top=3, verify=True)
+    assert recomputed.verified is True
+    assert _dump(recomputed) == _dump(stats)
+    assert storage.enrollment_stats(top=1).top_courses[0].course_id == 1
+
+def test_top_courses_break_ties_by_course_id(storage):
+    users = storage.create_users([UserCreate(name=f"S{i}", email=f"s{i}@example.com", role="student") for i in range(3)])
+    courses = storage.create_courses([CourseCreate(title=f"C{i}", code=f"C{i}") for i in range(5)])
+    # Courses reach their counts in an order unrelated to their ids
+    for course_id, students in [(4, 2), (2, 1), (5, 2), (1, 1), (3, 2)]:
+        for user in users[:students]:
+            storage.create_enrollment(EnrollmentCreate(user_id=user.id, course_id=courses[course_id - 1].id))
+    expected = [(3, 2), (4, 2), (5, 2), (1, 1)]
+    for verify in (False, True):
+        top = storage.enrollment_stats(top=4, verify=verify).top_courses
+        assert [(c.course_id, c.enrollments) for c in top] == expected
+    assert [(c.course_id, c.enrollments) for c in storage.enrollment_stats(top=2).top_courses] == expected[:2]
+
+def test_counters_reset(storage):
+    _populate(storage)
+    storage.reset()
+    stats = storage.enrollment_stats(verify=True)
+    assert (stats.enrollments, stats.courses, stats.students, stats.verified) == (0, 0, 0, True)
+    assert stats.course_sizes == [] and stats.student_loads == []
+
+def test_verify_detects_drift(tmp_path):
+    storage = SQLiteDB(str(tmp_path / "enrollment.db"), pool_size=1)
+    _populate(storage)
+    with storage._pool.connection() as conn:
+        conn.execute("UPDATE users SET enrolled = enrolled + 1 WHERE id = 1")
+    assert storage.enrollment_stats(verify=True).verified is False
+    storage.close()
+
+def test_durable_counters_survive_restart(tmp_path):
+    directory = str(tmp_path / "wal")
+    durable = DurableMemoryDB(directory)
+    _populate(durable)
+    expected = _dump(durable.enrollment_stats())
+    durable.close()
+    # close() wrote a snapshot; the enrollments below only exist in the log
+    reopened = DurableMemoryDB(directory)
+    assert _dump(reopened.enrollment_stats()) == expected
+    reopened.create_enrollment(EnrollmentCreate(user_id=6, course_id=4))
+    # Stop without the shutdown snapshot, as in a crash
+    reopened._stop.set()
+    reopened._snapshotter.join()
+    reopened._wal.close()
+    again = DurableMemoryDB(directory)
+    stats = again.enrollment_stats(verify=True)
+    assert stats.verified is True
+    assert stats.enrollments == 8
+    again.close()
+
+def test_sqlite_backfills_student_counters(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, email TEXT NOT NULL UNIQUE, role TEXT NOT NULL);
+        CREATE TABLE courses (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, code TEXT NOT NULL UNIQUE);
+        CREATE TABLE enrollments (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, course_id INTEGER NOT NULL, UNIQUE (user_id, course_id));
+        INSERT INTO users (name, email, role) VALUES ('A', 'a@example.com', 'student');
+        INSERT INTO courses (title, code) VALUES ('Math', 'MATH'), ('Art', 'ART');
+        INSERT INTO enrollments (user_id, course_id) VALUES (1, 1), (1, 2);
+    """)
+    conn.close()
+    storage = SQLiteDB(path, pool_size=1)
+    stats = storage.enrollment_stats(verify=True)
+    assert stats.verified is True
+    assert [(b.value, b.count) for b in stats.student_loads] == [(2, 1)]
+    storage.close()
+
+def test_stats_route(client, admin_headers, student_headers):
+    client.post("/users", json={"name": "A", "email": "a@example.com", "role": "student"})
+    client.post("/courses", json={"title": "Math", "code": "MATH"}, headers=admin_headers)
+    client.post("/courses", json={"title": "Art", "code": "ART"}, headers=admin_headers)
+    client.post("/enrollments", json={"user_id": 1, "course_id": 2}, headers={"X-User-Role": "student", "X-User-Id": "1"})
+
+    assert client.get("/admin/stats", headers=student_headers).status_code == 403
+    response = client.get("/admin/stats?top=5", headers=admin_headers)
+    assert response.status_code == 200
+    assert response.json() == {
+        "enrollments": 1,
+        "courses": 2,
+        "students": 1,
+        "top_courses": [{"course_id": 2, "enrollments": 1}],
+        "course_sizes": [{"value": 0, "count": 1}, {"value": 1, "count": 1}],
+        "student_loads": [{"value": 1, "count": 1}],
+        "verified": None,
+    }
+    verified = client.get("/admin/stats?verify=true", headers=admin_headers).json()
+    assert verified["verified"] is True
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+def test_stats_verify_runs_off_the_event_loop(client, admin_headers, monkeypatch):
+    seen = []
+    real = db.enrollment_stats
+    monkeypatch.setattr(db, "enrollment_stats", lambda top, verify: seen.append(_on_event_loop()) or real(top, verify))
+    client.get("/admin/stats", headers=admin_headers)
+    client.get("/admin/stats?verify=true", headers=admin_headers)
+    assert seen[-1] is False
@@ -0,0 +1,110 @@
+import os
+import random
+import subprocess
+import sys
+
+import httpx
+import pytest
+from starlette.requests import Request
+
+from app.cache import ResponseCache
+from app.config import Settings
+from app.db import create_storage
+from app.models import Course, CourseCreate, CourseUpdate, UserCreate, EnrollmentCreate
+from app.sqlite_db import SQLiteDB
+
+def test_memory_backends_refuse_several_workers(tmp_path):
+    with pytest.raises(ValueError):
+        create_storage(Settings(workers=2))
+    with pytest.raises(ValueError):
+        create_storage(Settings(workers=2, wal_dir=str(tmp_path / "wal")))
+    storage = create_storage(Settings(workers=2, storage_backend="sqlite", sqlite_path=str(tmp_path / "shared.db")))
+    assert storage.shared
+    storage.close()
+
+def test_workers_default_to_web_concurrency(monkeypatch):
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    assert Settings.from_env().workers == 4
+    monkeypatch.setenv("APP_WORKERS", "2")
+    assert Settings.from_env().workers == 2
+
+def test_catalog_version_follows_other_connections(tmp_path):
+    path = str(tmp_path / "shared.db")
+    reader, writer = SQLiteDB(path, pool_size=1), SQLiteDB(path, pool_size=1)
+    try:
+        seen = reader.catalog_version()
+        assert reader.catalog_version() == seen
+        writer.create_course(CourseCreate(title="Math", code="MATH"))
+        assert reader.catalog_version() != seen
+        seen = reader.catalog_version()
+        # Enrollments do not change what the catalog shows
+        writer.create_user(UserCreate(name="A", email="a@example.com", role="student"))
+        writer.create_enrollment(EnrollmentCreate(user_id=1, course_id=1))
+        assert reader.catalog_version() == seen
+        writer.update_course(1, CourseCreate(title="Maths", code="MATH"))
+        assert reader.catalog_version() != seen
+    finally:
+        reader.close()
+        writer.close()
+
+def test_catalog_version_ignores_own_writes(tmp_path):
+    path = str(tmp_path / "shared.db")
+    local, other = SQLiteDB(path, pool_size=1), SQLiteDB(path, pool_size=1)
+    try:
+        seen = local.catalog_version()
+        # The writing process invalidates its own cache entries by tag
+        local.create_course(CourseCreate(title="Math", code="MATH"))
+        local.update_course(1, CourseUpdate(title="Maths", code="MATH"))
+        assert local.catalog_version() == seen
+        # A foreign write between two of our own still counts
+        local.create_course(CourseCreate(title="Art", code="ART"))
+        other.create_course(CourseCreate(title="Music", code="MUS"))
+        local.delete_course(2)
+        assert local.catalog_version() != seen
+        seen = local.catalog_version()
+        local.reset()
+        assert local.catalog_version() != seen
+    finally:
+        local.close()
+        other.close()
+
+def test_watched_cache_clears_when_source_moves():
+    version = [0]
+    cache = ResponseCache(16)
+    cache.watch(lambda: version[0])
+    request = Request({"type": "http", "method": "GET", "path": "/courses", "query_string": b"", "headers": []})
+    cache.store(request, cache.version, [Course(id=1, title="Math", code="MATH")], Course, ["courses"])
+    assert cache.lookup(request) is not None
+    version[0] += 1
+    assert cache.lookup(request) is None
+    assert len(cache) == 0
+
+def test_workers_share_writes_and_catalog_invalidation(tmp_path):
+    from benchmarks.load_test import start_server
+
+    port = random.randint(20000, 40000)
+    server = start_server(port, "auto", "sqlite", str(tmp_path / "shared.db"), workers=2)
+    admin = {"X-User-Role": "admin", "X-User-Id": "1"}
+    base = f"http://127.0.0.1:{port}"
+    try:
+        assert httpx.post(f"{base}/courses", json={"title": "Math", "code": "MATH"}, headers=admin).status_code == 201
+        # A fresh connection per request, so both workers answer (and cache) some
+        titles = {httpx.get(f"{base}/courses").json()[0]["title"] for _ in range(20)}
+        assert titles == {"Math"}
+        assert httpx.put(f"{base}/courses/1", json={"title": "Maths", "code": "MATH"}, headers=admin).status_code == 200
+        titles = {httpx.get(f"{base}/courses").json()[0]["title"] for _ in range(20)}
+        assert titles == {"Maths"}
+    finally:
+        server.terminate()
+        server.wait()
+
+def test_uvicorn_workers_flag_refuses_memory_store():
+    # --workers is not visible to the app's settings; the workers detect each other
+    env = {k: v for k, v in os.environ.items() if k not in ("WEB_CONCURRENCY", "APP_WORKERS", "APP_WAL_DIR")}
+    env["APP_STORAGE_BACKEND"] = "memory"
+    result = subprocess.run(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--workers", "2",
+         "--port", str(random.randint(20000, 40000)), "--log-level", "warning"],
+        env=env, capture_output=True, text=True, timeout=60,
+    )
+    assert "already serves a memory store" in result.stderr